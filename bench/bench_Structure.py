@@ -0,0 +1,96 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compares the compiled Codec path of Structure against the original
+# per-field bitstring path on a 20 byte IPv4 header, and eager decoding
+# against lazy views for a filter that reads two fields.
+#
+#   python bench/bench_Structure.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import timeit
+
+from net.ip.v4.Packet import Packet
+
+HEADER = b'\x45\x00\x01\x94\x4f\x92\x00\x00\x80\x11\x77\xcc\xac\x16\xb2\xea\x0a\x0a\x08\xf0'
+PACKET = HEADER + bytes(1480)
+
+def run(label, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    ns = best / number * 1e9
+    print('%-28s %10.0f ns/op %12.0f ops/s' % (label, ns, 1e9 / ns))
+    return ns
+
+def main(number=20000):
+    pkt = Packet.from_bytes(HEADER)
+
+    slow = run('decode (bitstring)', lambda: Packet._from_bytes_bitstring(HEADER), number // 10)
+    fast = run('decode (codec)', lambda: super(Packet, Packet).from_bytes(HEADER), number)
+    print('decode speedup: %.1fx' % (slow / fast))
+    fast_decode = fast
+
+    def filter_view():
+        pkt = Packet.view(PACKET)
+        return pkt.protocol == 17 and pkt.destination
+    slow = run('from_bytes + 2 fields', lambda: Packet.from_bytes(PACKET).protocol, number)
+    fast = run('view + 2 fields', filter_view, number)
+    print('filter speedup: %.1fx' % (slow / fast))
+
+    slow = run('encode (bitstring)', pkt._to_bytes_bitstring, number // 10)
+    fast = run('encode (codec)', lambda: super(Packet, pkt).to_bytes(), number)
+    print('encode speedup: %.1fx' % (slow / fast))
+
+    out = bytearray(len(PACKET))
+    def rewrite(pkt):
+        pkt.time_to_live = 63
+        pkt.destination = 0xc0a80001
+    def rewrite_to_bytes():
+        pkt = Packet.from_bytes(PACKET)
+        rewrite(pkt)
+        return pkt.to_bytes()
+    def rewrite_pack_into():
+        pkt = Packet.view(PACKET)
+        rewrite(pkt)
+        return pkt.pack_into(out)
+    slow = run('rewrite: decode + to_bytes', rewrite_to_bytes, number)
+    fast = run('rewrite: view + pack_into', rewrite_pack_into, number)
+    print('rewrite speedup: %.1fx' % (slow / fast))
+
+    pooled = Packet.acquire()
+    view = memoryview(PACKET)
+    slow = run('from_bytes', lambda: Packet.from_bytes(PACKET), number)
+    fast = run('from_bytes_into (pooled)', lambda: Packet.from_bytes_into(pooled, view), number)
+    print('reuse speedup: %.1fx' % (slow / fast))
+
+    try:
+        import numpy
+    except ImportError:
+        return
+    buf = PACKET * 10000
+    offsets = numpy.arange(0, len(buf), len(PACKET))
+    batch = run('decode_batch (10000 packets)', lambda: Packet.decode_batch(buf, offsets), 5) / 10000
+    print('decode_batch: %.0f ns/packet, %.1fx vs from_bytes' % (batch, fast_decode / batch))
+
+    import net.ip
+    single = run('net.ip.checksum (1 header)', lambda: net.ip.checksum(HEADER), number)
+    batch = run('verify_checksums (10000)', lambda: Packet.verify_checksums(buf, offsets), 5) / 10000
+    print('verify_checksums: %.0f ns/packet, %.1fx vs net.ip.checksum' % (batch, single / batch))
+
+if __name__ == '__main__':
+    main()
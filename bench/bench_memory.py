@@ -0,0 +1,50 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+# Measures the memory held per decoded IPv4 Packet.
+#
+#   python bench/bench_memory.py
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import gc
+import tracemalloc
+
+from net.ip.v4.Packet import Packet
+from tests.packets import ipv4
+
+def headers(count):
+    for i in range(count):
+        yield ipv4(i & 0xffff, source=0x0a000000 | i, destination='192.168.0.1', data=b'')
+
+def measure(decode, count):
+    bufs = list(headers(count))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    pkts = [decode(buf) for buf in bufs]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # don't count the list holding the packets
+    return (after - before - sys.getsizeof(pkts)) / count
+
+def main(count=100000):
+    print('%-20s %8.1f bytes/packet' % ('Packet.from_bytes', measure(Packet.from_bytes, count)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+# Throughput of net.pcap.Reader over a generated capture of Ethernet/IPv4/UDP
+# frames.
+#
+#   python bench/bench_pcap.py [packet count]
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import struct
+import tempfile
+import time
+
+from net.pcap.Reader import Reader
+from tests.packets import ipv4
+
+def generate(path, count, size=512):
+    payload = bytes(size - 14 - 20)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, Reader.LINKTYPE_ETHERNET))
+        for i in range(count):
+            frame = bytes(12) + b'\x08\x00' \
+                + ipv4(i & 0xffff, source=0x0a000000 | (i & 0xffffff), destination='192.168.0.1', data=payload)
+            f.write(struct.pack('<IIII', i, 0, len(frame), len(frame)))
+            f.write(frame)
+
+def run(label, path, iterate):
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    with Reader(path) as reader:
+        count = 0
+        for record in iterate(reader):
+            count += 1
+            del record
+    elapsed = time.perf_counter() - start
+    print('%-24s %10.0f packets/s %8.1f MB/s' % (label, count / elapsed, size / elapsed / 1e6))
+
+def main(count=200000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.pcap')
+        generate(path, count)
+        print('%d packets, %.1f MB' % (count, os.path.getsize(path) / 1e6))
+        run('records', path, lambda reader: reader.records())
+        run('packets (lazy views)', path, lambda reader: reader.packets(lazy=True))
+        run('packets (from_bytes)', path, lambda reader: reader.packets())
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,343 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+# Benchmark suite over generated traffic, reporting ns/packet, packets/s and
+# the bytes and memory blocks each decoded packet holds, with saved baselines
+# to catch regressions:
+#
+#   python bench/bench_suite.py                  run every case
+#   python bench/bench_suite.py ipv4 ndr         run the cases matching either
+#   python bench/bench_suite.py --save           save results as the baseline
+#   python bench/bench_suite.py --check          fail on a regression against it
+#
+# A case regresses when its ns/packet, or its bytes/packet beyond a few bytes
+# of noise, grow by more than --threshold (a fraction, 0.25 by default) over
+# the baseline. Baselines only compare runs on the same machine, so the file
+# isn't checked in.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import argparse
+import gc
+import json
+import multiprocessing
+import struct
+import tempfile
+import timeit
+import tracemalloc
+
+import net.ip
+from net.dcerpc.ndr.Boolean import Boolean
+from net.dcerpc.ndr.Character import Character
+from net.dcerpc.ndr.FormatLabel import FormatLabel
+from net.ip.FlowTable import FlowTable
+from net.ip.ParallelDecoder import ParallelDecoder
+from net.ip.v4.Packet import Packet
+from net.pcap.Reader import Reader
+from tests import packets
+
+from bench_pcap import generate
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# bytes/packet differences this small are allocator noise
+ALLOCATION_SLACK = 8
+
+def ipv4(i, options=b'', size=512, protocol=17):
+    length = size - 20 - len(options)
+    return packets.ipv4(i & 0xffff, protocol, 0x0a000000 | (i & 0xffffff), '192.168.0.1',
+        struct.pack('>HHHH', 1024 + (i & 0x7fff), 53, length, 0) + bytes(length - 8), options=options, checksum=True)
+
+def ipv6(i, size=512):
+    return struct.pack('>IHBB', 0x60000000 | (i & 0xfffff), size - 40, 17, 64) + (0x20010db8 << 96 | i).to_bytes(16, 'big') + (0x20010db8 << 96 | 1).to_bytes(16, 'big') \
+        + struct.pack('>HHHH', 1024 + (i & 0x7fff), 53, size - 40, 0) + bytes(size - 48)
+
+# record route with room for two addresses and a no-op, 12 bytes
+OPTIONS = b'\x07\x0b\x04' + bytes(8) + b'\x01'
+
+# name -> (setup, packets): setup() returns the function to time, which
+# handles packets packets per call and returns what it decoded
+CASES = {}
+
+def case(name, packets=1):
+    def decorator(setup):
+        CASES[name] = (setup, packets)
+        return setup
+    return decorator
+
+@case('structure.from_bytes')
+def _():
+    header = ipv4(1)[:20]
+    return lambda: super(Packet, Packet).from_bytes(header)
+
+@case('structure.to_bytes')
+def _():
+    pkt = Packet()
+    for name, value in zip(Packet._CODEC.names, Packet._CODEC.unpack(ipv4(1))):
+        setattr(pkt, name, value)
+    return lambda: super(Packet, pkt).to_bytes()
+
+@case('ipv4.from_bytes')
+def _():
+    buf = ipv4(1)
+    return lambda: net.ip.from_bytes(buf)
+
+@case('ipv4.from_bytes options')
+def _():
+    buf = ipv4(1, OPTIONS)
+    return lambda: net.ip.from_bytes(buf)
+
+@case('ipv4.from_bytes fields')
+def _():
+    buf = ipv4(1)
+    return lambda: net.ip.from_bytes(buf, fields=('protocol', 'destination'))
+
+@case('ipv4.view')
+def _():
+    buf = ipv4(1)
+    return lambda: net.ip.view(buf)
+
+@case('ipv4.from_bytes_into pooled')
+def _():
+    buf = memoryview(ipv4(1))
+    pkt = Packet.acquire()
+    return lambda: Packet.from_bytes_into(pkt, buf)
+
+@case('ipv4.to_bytes')
+def _():
+    pkt = Packet.from_bytes(ipv4(1, OPTIONS))
+    pkt.time_to_live = 63
+    return pkt.to_bytes
+
+@case('ipv4.payload')
+def _():
+    buf = ipv4(1)
+    return lambda: net.ip.from_bytes(buf).payload
+
+@case('ipv4.filter')
+def _():
+    buf = ipv4(1)
+    match = net.ip.compile_filter('proto == 17 and dst in 192.168.0.0/16')
+    return lambda: match(buf)
+
+@case('ipv6.from_bytes')
+def _():
+    buf = ipv6(1)
+    return lambda: net.ip.from_bytes(buf)
+
+@case('ndr.boolean')
+def _():
+    return lambda: Boolean.from_bytes(b'\x01')
+
+@case('ndr.character')
+def _():
+    return lambda: Character.from_bytes(b'A')
+
+@case('ndr.format_label')
+def _():
+    return lambda: FormatLabel.from_bytes(b'\x10\x00\x00\x00')
+
+@case('ndr.format_label.to_bytes')
+def _():
+    lbl = FormatLabel.from_bytes(b'\x10\x00\x00\x00')
+    lbl.int_repr = 0
+    return lbl.to_bytes
+
+@case('flow_table.add', 1000)
+def _():
+    pkts = [Packet.from_bytes(ipv4(i % 100, protocol=6 if i % 2 else 17)) for i in range(1000)]
+    def add():
+        table = FlowTable()
+        for pkt in pkts:
+            table.add(pkt, 0.0)
+        return table
+    return add
+
+@case('batch.decode_batch', 10000)
+def _():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    buf = ipv4(1) * 10000
+    offsets = numpy.arange(0, len(buf), 512)
+    return lambda: Packet.decode_batch(buf, offsets)
+
+@case('batch.verify_checksums', 10000)
+def _():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    buf = ipv4(1) * 10000
+    offsets = numpy.arange(0, len(buf), 512)
+    return lambda: Packet.verify_checksums(buf, offsets)
+
+_TMP = tempfile.TemporaryDirectory()
+
+def _capture(count=10000):
+    path = os.path.join(_TMP.name, 'bench.pcap')
+    if not os.path.exists(path):
+        generate(path, count)
+    return path
+
+@case('pcap.packets lazy', 10000)
+def _():
+    path = _capture()
+    def packets():
+        with Reader(path) as reader:
+            return list(reader.packets(lazy=True))
+    return packets
+
+@case('pcap.packets', 10000)
+def _():
+    path = _capture()
+    def packets():
+        with Reader(path) as reader:
+            return list(reader.packets())
+    return packets
+
+def count_packets(packets):
+    return sum(1 for key, pkt in packets)
+
+@case('parallel.last shard', 10000 // 32)
+def _():
+    # reading the last of many shards costs the same as reading the first; a
+    # shard that reads through the records before it shows up as a slowdown
+    # of the number of shards
+    path = _capture()
+    with Reader(path) as reader:
+        position, count = reader.split(32)[-1]
+    def packets():
+        with Reader(path) as reader:
+            return list(reader.packets(True, 0, count, position))
+    return packets
+
+@case('parallel.map 1 process', 10000)
+def _():
+    path = _capture()
+    return lambda: ParallelDecoder(1).map(count_packets, path)
+
+@case('parallel.map all processes', 10000)
+def _():
+    path = _capture()
+    return lambda: ParallelDecoder().map(count_packets, path)
+
+def time_case(func, packets):
+    # best of five runs of at least 0.2s each
+    timer = timeit.Timer(func)
+    number = timer.autorange()[0]
+    best = min(timer.repeat(5, number))
+    return best / number / packets * 1e9
+
+def allocations(func, packets, calls=None):
+    # bytes and blocks left allocated per packet by keeping what calls calls
+    # of func return
+    if calls is None:
+        calls = max(1, 1000 // packets)
+    func()
+    results = [None] * calls
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(calls):
+        results[i] = func()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    return max(0.0, size / calls / packets), max(0.0, blocks / calls / packets)
+
+def run(names):
+    results = {}
+    print('%-30s %10s %12s %10s %10s' % ('case', 'ns/packet', 'packets/s', 'bytes', 'blocks'))
+    for name in names:
+        setup, packets = CASES[name]
+        func = setup()
+        if func is None:
+            print('%-30s skipped' % name)
+            continue
+        ns = time_case(func, packets)
+        size, blocks = allocations(func, packets)
+        results[name] = {'ns': ns, 'bytes': size, 'blocks': blocks}
+        print('%-30s %10.0f %12.0f %10.1f %10.2f' % (name, ns, 1e9 / ns, size, blocks))
+
+    parallel = [name for name in results if name.startswith('parallel.map ')]
+    if len(parallel) == 2:
+        print('parallel.map speedup with %d processes: %.1fx' % (multiprocessing.cpu_count(),
+            results[parallel[0]]['ns'] / results[parallel[1]]['ns']))
+    return results
+
+def compare(baseline, results, threshold):
+    # names of the cases in both that regressed past threshold, printing how
+    # each changed
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        ns = result['ns'] / base['ns'] - 1
+        regressed = ns > threshold
+        if result['bytes'] - base['bytes'] > max(ALLOCATION_SLACK, base['bytes'] * threshold):
+            regressed = True
+        print('%-30s %+9.1f%% ns %+9.1f bytes%s' % (name, ns * 100, result['bytes'] - base['bytes'], '  REGRESSED' if regressed else ''))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks NetPy encoding and decoding')
+    parser.add_argument('patterns', nargs='*', help='run only the cases with names containing one of these')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file, default ' + BASELINE)
+    parser.add_argument('--save', action='store_true', help='save the results to the baseline file')
+    parser.add_argument('--check', action='store_true', help='exit with 1 if a case regressed against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='fraction a case may slow down or grow by')
+    parser.add_argument('--list', action='store_true', help='list the cases')
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if not args.patterns or any(p in name for p in args.patterns)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    results = run(names)
+
+    status = 0
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print('%d regressed: %s' % (len(regressions), ', '.join(regressions)))
+            status = 1
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,440 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+# A Codec is a Structure _FORMAT compiled into a single struct.Struct plus a
+# list of shift/mask steps. Fields are grouped into chunks that start and end
+# on byte boundaries; each chunk is read with one struct code and the sub-byte
+# fields inside it are pulled out with shifts and masks.
+class Codec():
+    KIND_UINT = 0
+    KIND_BOOL = 1
+    KIND_BYTES = 2
+    KIND_PAD = 3
+
+    _INT_CODES = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+    # functions used by the code returned by expression()
+    EXPRESSION_NAMESPACE = {'unpack_' + c: struct.Struct('>' + c).unpack_from for c in 'HIQ'}
+
+    def __init__(self, fmt):
+        if not isinstance(fmt, tuple):
+            raise ValueError('Format must be a tuple of (name, token) pairs')
+
+        # (name, kind, bit offset, bit width) for every field
+        self.fields = []
+        bit = 0
+        for name, token in fmt:
+            kind, width = Codec._parse_token(token)
+            if kind == Codec.KIND_BYTES and bit % 8 != 0:
+                raise ValueError('Unaligned bytes field: ' + name)
+            self.fields.append((name, kind, bit, width))
+            bit += width
+        if bit % 8 != 0:
+            raise ValueError('Format is not a whole number of bytes: ' + str(bit) + ' bits')
+
+        self.names = tuple(f[0] for f in self.fields)
+        self.size = bit // 8
+
+        # struct codes, and per chunk: (byte offset, byte length, is int chunk
+        # that struct can't read natively)
+        codes = ['>']
+        self.chunks = []
+        # (name, kind, chunk index, shift, mask) for every field
+        self.steps = []
+        members = []
+        start = 0
+        for name, kind, offset, width in self.fields:
+            members.append((name, kind, offset, width))
+            end = offset + width
+            if end % 8 != 0:
+                continue
+
+            nbytes = (end - start) // 8
+            if all(m[1] == Codec.KIND_PAD for m in members):
+                codes.append(str(nbytes) + 'x')
+                for m in members:
+                    self.steps.append((m[0], Codec.KIND_PAD, None, 0, 0))
+            elif members[0][1] == Codec.KIND_BYTES:
+                codes.append(str(nbytes) + 's')
+                self.steps.append((name, Codec.KIND_BYTES, len(self.chunks), 0, nbytes))
+                self.chunks.append((start // 8, nbytes, False))
+            else:
+                if nbytes in Codec._INT_CODES:
+                    codes.append(Codec._INT_CODES[nbytes])
+                    self.chunks.append((start // 8, nbytes, False))
+                else:
+                    codes.append(str(nbytes) + 's')
+                    self.chunks.append((start // 8, nbytes, True))
+                for m_name, m_kind, m_offset, m_width in members:
+                    shift = end - (m_offset + m_width)
+                    if m_kind == Codec.KIND_PAD:
+                        self.steps.append((m_name, m_kind, None, 0, 0))
+                    else:
+                        self.steps.append((m_name, m_kind, len(self.chunks) - 1, shift, (1 << m_width) - 1))
+
+            members = []
+            start = end
+
+        self.struct = struct.Struct(''.join(codes))
+        # step of every non-pad field, for re-encoding single fields
+        self.step_of = {}
+        for step in self.steps:
+            if step[1] != Codec.KIND_PAD:
+                self.step_of[step[0]] = step
+        self.chunk_structs = [struct.Struct('>' + c) for c in codes[1:] if not c.endswith('x')]
+        self.unpack = self._compile_unpack()
+        self.pack = self._compile_pack('pack(values)', 'struct_pack({})')
+        self.pack_into = self._compile_pack('pack_into(buf, offset, values)', 'struct_pack_into(buf, offset, {})')
+        # functions decoding a subset of the fields, by field names
+        self._unpackers = {}
+        # per field functions that decode just that field, for lazy views
+        self.getters = {}
+        for step in self.steps:
+            self.getters[step[0]] = self._compile_getter(step)
+        # functions returning the non-pad fields of a decoded object, and
+        # setting them back from what to_tuple returned
+        self.to_dict, self.to_tuple, self.set_tuple = self._compile_exports()
+
+    @staticmethod
+    def _parse_token(token):
+        kind, sep, length = token.partition(':')
+        kind = kind.strip()
+        if kind == 'bool' and length in ('', '1'):
+            return Codec.KIND_BOOL, 1
+        if not length.strip().isdigit() or int(length) <= 0:
+            raise ValueError('Unsupported format token: ' + token)
+        length = int(length)
+        if kind == 'uint':
+            return Codec.KIND_UINT, length
+        elif kind == 'bytes':
+            return Codec.KIND_BYTES, length * 8
+        elif kind == 'pad':
+            return Codec.KIND_PAD, length
+        raise ValueError('Unsupported format token: ' + token)
+
+    @staticmethod
+    def compile(fmt):
+        try:
+            return Codec(fmt)
+        except ValueError as e:
+            logger.debug('Not compiling format: %s', e)
+            return None
+
+    def _compile(self, name, lines):
+        namespace = {
+            'unpack_from': self.struct.unpack_from,
+            'struct_pack': self.struct.pack,
+            'struct_pack_into': self.struct.pack_into,
+            'struct_error': struct.error,
+        }
+        exec('\n'.join(lines), namespace)
+        return namespace[name]
+
+    def _compile_unpack(self):
+        # generates e.g. for the IPv4 header:
+        #   (c0, c1, ...) = unpack_from(buf, offset)
+        #   return [c0 >> 4, c0 & 15, c1 >> 2, c1 & 3, c2, ...]
+        chunks = ['c' + str(i) for i in range(len(self.chunks))]
+        lines = [
+            'def unpack(buf, offset=0):',
+            '    try:',
+            '        (' + ''.join(c + ', ' for c in chunks) + ') = unpack_from(buf, offset)',
+            '    except struct_error as e:',
+            '        raise IndexError(str(e))',
+        ]
+        for i, (offset, length, wide) in enumerate(self.chunks):
+            if wide:
+                lines.append('    ' + chunks[i] + ' = int.from_bytes(' + chunks[i] + ", 'big')")
+
+        values = [self._extract(chunks, step) for step in self.steps]
+        lines.append('    return [' + ', '.join(values) + ']')
+
+        return self._compile('unpack', lines)
+
+    def unpacker(self, names):
+        # function decoding just the named fields, in that order, into a list;
+        # compiled on first use for each set of names
+        names = tuple(names)
+        unpack = self._unpackers.get(names)
+        if unpack is None:
+            unpack = self._compile_unpack_fields(names)
+            self._unpackers[names] = unpack
+        return unpack
+
+    def _compile_unpack_fields(self, names):
+        # generates e.g. for the IPv4 protocol and destination fields:
+        #   (c9, c13) = unpack_from(buf, offset)
+        #   return [c9, c13]
+        # with unpack_from reading a struct such as '>9xB6xI' that skips
+        # over every chunk not holding one of the fields, and pads to the full
+        # size so a short buffer is still an error
+        for name in names:
+            if name not in self.step_of:
+                raise ValueError('No field named ' + name)
+        steps = [self.step_of[name] for name in names]
+        indexes = sorted(set(step[2] for step in steps))
+        raw = set(step[2] for step in steps if step[1] == Codec.KIND_BYTES)
+
+        codes = ['>']
+        position = 0
+        for index in indexes:
+            offset, length, wide = self.chunks[index]
+            if offset > position:
+                codes.append(str(offset - position) + 'x')
+            if index not in raw and not wide:
+                codes.append(Codec._INT_CODES[length])
+            else:
+                codes.append(str(length) + 's')
+            position = offset + length
+        if self.size > position:
+            codes.append(str(self.size - position) + 'x')
+
+        chunks = ['c' + str(i) for i in range(len(self.chunks))]
+        lines = [
+            'def unpack(buf, offset=0):',
+            '    try:',
+            '        (' + ''.join(chunks[i] + ', ' for i in indexes) + ') = unpack_from(buf, offset)',
+            '    except struct_error as e:',
+            '        raise IndexError(str(e))',
+        ]
+        for i in indexes:
+            if self.chunks[i][2]:
+                lines.append('    ' + chunks[i] + ' = int.from_bytes(' + chunks[i] + ", 'big')")
+        lines.append('    return [' + ', '.join(self._extract(chunks, step) for step in steps) + ']')
+
+        namespace = {
+            'unpack_from': struct.Struct(''.join(codes)).unpack_from,
+            'struct_error': struct.error,
+        }
+        exec('\n'.join(lines), namespace)
+        return namespace['unpack']
+
+    def _compile_exports(self):
+        # generates e.g. for the IPv4 header:
+        #   def to_dict(obj):
+        #       return {'version': obj.version, 'ihl': obj.ihl, ...}
+        #   def to_tuple(obj):
+        #       return (obj.version, obj.ihl, ...)
+        #   def set_tuple(obj, values):
+        #       (obj.version, obj.ihl, ...) = values
+        names = [name for name in self.names if name in self.step_of]
+        lines = [
+            'def to_dict(obj):',
+            '    return {' + ', '.join(repr(name) + ': obj.' + name for name in names) + '}',
+            'def to_tuple(obj):',
+            '    return (' + ''.join('obj.' + name + ', ' for name in names) + ')',
+            'def set_tuple(obj, values):',
+            '    (' + ''.join('obj.' + name + ', ' for name in names) + ') = values',
+        ]
+        namespace = {}
+        exec('\n'.join(lines), namespace)
+        return namespace['to_dict'], namespace['to_tuple'], namespace['set_tuple']
+
+    def pack_field_into(self, buf, offset, name, value):
+        # re-encodes a single field in place in buf, where a structure is
+        # encoded at offset, leaving every other bit as it is
+        name, kind, index, shift, mask = self.step_of[name]
+        start, length, wide = self.chunks[index]
+        packer = self.chunk_structs[index]
+        if kind == Codec.KIND_BYTES:
+            if len(value) != mask:
+                raise ValueError('bytes field ' + name + ' must be ' + str(mask) + ' bytes long')
+            packer.pack_into(buf, offset + start, bytes(value))
+            return
+
+        if kind == Codec.KIND_BOOL:
+            if value not in (True, False):
+                raise ValueError('bool field ' + name + ' can only be True or False')
+            value = int(value)
+        elif not 0 <= value <= mask:
+            raise ValueError(str(value) + ' is out of range for field ' + name)
+        (chunk,) = packer.unpack_from(buf, offset + start)
+        if wide:
+            chunk = int.from_bytes(chunk, 'big')
+        chunk = (chunk & ~(mask << shift)) | (value << shift)
+        if wide:
+            chunk = chunk.to_bytes(length, 'big')
+        packer.pack_into(buf, offset + start, chunk)
+
+    def dtype(self):
+        # numpy structured dtype with a column for every non-pad field; fields
+        # wider than 64 bits become raw byte columns
+        import numpy
+
+        columns = []
+        for name, kind, offset, width in self.fields:
+            if kind == Codec.KIND_PAD:
+                continue
+            elif kind == Codec.KIND_BOOL:
+                columns.append((name, numpy.bool_))
+            elif kind == Codec.KIND_BYTES or width > 64 or (offset + width - 1) // 8 - offset // 8 >= 8:
+                columns.append((name, numpy.uint8, ((offset + width + 7) // 8 - offset // 8,)))
+            else:
+                columns.append((name, 'u' + str(1 << ((width - 1) // 8).bit_length())))
+        return numpy.dtype(columns)
+
+    def gather(self, buffers, offsets=None):
+        # returns a (count, size) uint8 matrix holding the first size bytes of
+        # each buffer, or of buffers[offset:] for each offset if offsets is given
+        import numpy
+
+        if offsets is not None:
+            data = numpy.frombuffer(buffers, dtype=numpy.uint8)
+            offsets = numpy.asarray(offsets, dtype=numpy.int64)
+            if len(offsets) and (offsets.min() < 0 or offsets.max() + self.size > len(data)):
+                raise IndexError('Offsets out of range for a ' + str(self.size) + ' byte structure')
+            return data[offsets[:, None] + numpy.arange(self.size)]
+
+        buffers = [memoryview(b) for b in buffers]
+        if buffers and min(b.nbytes for b in buffers) < self.size:
+            raise IndexError('Buffer shorter than ' + str(self.size) + ' bytes')
+        joined = b''.join([b.cast('B')[:self.size] for b in buffers])
+        return numpy.frombuffer(joined, dtype=numpy.uint8).reshape(len(buffers), self.size)
+
+    def unpack_batch(self, rows):
+        # vectorized unpack of a (count, size) uint8 matrix into a structured array
+        import numpy
+
+        dtype = self.dtype()
+        out = numpy.empty(len(rows), dtype=dtype)
+        for name, kind, offset, width in self.fields:
+            if kind == Codec.KIND_PAD:
+                continue
+            first = offset // 8
+            last = (offset + width - 1) // 8
+            if dtype[name].subdtype is not None:
+                out[name] = rows[:, first:last + 1]
+                continue
+
+            value = rows[:, first].astype(numpy.uint64)
+            for i in range(first + 1, last + 1):
+                value = (value << numpy.uint64(8)) | rows[:, i]
+            shift = (last + 1) * 8 - (offset + width)
+            if shift:
+                value >>= numpy.uint64(shift)
+            if width < 64:
+                value &= numpy.uint64((1 << width) - 1)
+            out[name] = value
+        return out
+
+    def _compile_getter(self, step):
+        # generates e.g. for the IPv4 protocol field:
+        #   (c9,) = unpack_from(buf, offset + 9)
+        #   return c9
+        name, kind, index, shift, mask = step
+        if kind == Codec.KIND_PAD:
+            return lambda buf, offset=0: None
+
+        offset, length, wide = self.chunks[index]
+        if kind == Codec.KIND_BYTES or wide:
+            code = '>' + str(length) + 's'
+        else:
+            code = '>' + Codec._INT_CODES[length]
+        chunks = ['c' + str(i) for i in range(len(self.chunks))]
+        lines = [
+            'def get(buf, offset=0):',
+            '    (' + chunks[index] + ',) = unpack_from(buf, offset + ' + str(offset) + ')',
+        ]
+        if wide:
+            lines.append('    ' + chunks[index] + ' = int.from_bytes(' + chunks[index] + ", 'big')")
+        lines.append('    return ' + self._extract(chunks, step))
+
+        namespace = {'unpack_from': struct.Struct(code).unpack_from}
+        exec('\n'.join(lines), namespace)
+        return namespace['get']
+
+    def _extract(self, chunks, step):
+        # python expression pulling a single field out of its chunk variable
+        name, kind, index, shift, mask = step
+        if kind == Codec.KIND_PAD:
+            return 'None'
+        chunk = chunks[index]
+        bits = self.chunks[index][1] * 8
+        if kind == Codec.KIND_BYTES:
+            return chunk
+        elif kind == Codec.KIND_BOOL:
+            return 'bool(' + chunk + ' >> ' + str(shift) + ' & 1)'
+        elif shift == 0 and mask.bit_length() == bits:
+            return chunk
+        elif shift == 0:
+            return chunk + ' & ' + str(mask)
+        elif shift + mask.bit_length() == bits:
+            return chunk + ' >> ' + str(shift)
+        return '(' + chunk + ' >> ' + str(shift) + ') & ' + str(mask)
+
+    def expression(self, name, buf='buf', offset='offset'):
+        # python expression decoding just the field name straight out of buf,
+        # where the structure is encoded at offset, for code generated
+        # elsewhere, e.g. for the IPv4 protocol field:
+        #   buf[offset + 9]
+        # it must be run with EXPRESSION_NAMESPACE as its globals
+        step = self.step_of[name]
+        index = step[2]
+        start, length, wide = self.chunks[index]
+        at = offset + ' + ' + str(start)
+        if step[1] == Codec.KIND_BYTES:
+            read = 'bytes(' + buf + '[' + at + ':' + at + ' + ' + str(length) + '])'
+        elif wide:
+            read = 'int.from_bytes(' + buf + '[' + at + ':' + at + ' + ' + str(length) + "], 'big')"
+        elif length == 1:
+            read = buf + '[' + at + ']'
+        else:
+            read = 'unpack_' + Codec._INT_CODES[length] + '(' + buf + ', ' + at + ')[0]'
+        reads = [None] * len(self.chunks)
+        reads[index] = read
+        return self._extract(reads, step)
+
+    def _compile_pack(self, signature, call):
+        # generates e.g. for the IPv4 header and
+        # call = 'struct_pack({})':
+        #   (v0, v1, ...) = values
+        #   if not 0 <= v0 <= 15: raise ValueError(...)
+        #   return struct_pack(v0 << 4 | v1, v2 << 2 | v3, v4, ...)
+        args = ['v' + str(i) for i in range(len(self.steps))]
+        lines = [
+            'def ' + signature + ':',
+            '    (' + ''.join(a + ', ' for a in args) + ') = values',
+        ]
+        parts = [[] for c in self.chunks]
+        for arg, (name, kind, index, shift, mask) in zip(args, self.steps):
+            if kind == Codec.KIND_UINT:
+                lines.append('    if not 0 <= ' + arg + ' <= ' + str(mask) + ':')
+                lines.append('        raise ValueError(str(' + arg + ') + ' + repr(' is out of range for field ' + name) + ')')
+                parts[index].append(arg + ' << ' + str(shift) if shift else arg)
+            elif kind == Codec.KIND_BOOL:
+                lines.append('    if ' + arg + ' not in (True, False):')
+                lines.append('        raise ValueError(' + repr('bool field ' + name + ' can only be True or False') + ')')
+                parts[index].append('(' + str(1 << shift) + ' if ' + arg + ' else 0)')
+            elif kind == Codec.KIND_BYTES:
+                lines.append('    if len(' + arg + ') != ' + str(mask) + ':')
+                lines.append('        raise ValueError(' + repr('bytes field ' + name + ' must be ' + str(mask) + ' bytes long') + ')')
+                parts[index].append('bytes(' + arg + ')')
+
+        chunks = []
+        for (offset, length, wide), part in zip(self.chunks, parts):
+            expr = ' | '.join(part)
+            if wide:
+                expr = '(' + expr + ').to_bytes(' + str(length) + ", 'big')"
+            chunks.append(expr)
+        lines.append('    return ' + call.format(''.join(c + ', ' for c in chunks)))
+
+        return self._compile(signature[:signature.index('(')], lines)
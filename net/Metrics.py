@@ -0,0 +1,182 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Opt-in counts, errors and latencies of decoding and encoding Structures.
+# instrument() replaces the from_bytes, view and to_bytes methods of a class
+# with wrappers that record each call, and uninstrument() puts the originals
+# back, so classes that aren't instrumented run exactly the code they would
+# without this module. enable() instruments the classes registered with
+# net.ip and registers them again so its dispatch tables use the wrappers.
+#
+# Latencies are kept in histograms of power of two buckets of nanoseconds:
+# bucket i counts the calls taking from 2**(i-1) up to 2**i ns.
+class Metrics():
+    BUCKETS = 40
+
+    # operation recorded for each method replaced by instrument()
+    METHODS = (
+        ('from_bytes', 'decode'),
+        ('view', 'view'),
+        ('to_bytes', 'encode'),
+    )
+
+    # the Metrics instrumenting each class
+    _INSTRUMENTED = {}
+
+    def __init__(self):
+        # (cls, operation) -> histogram of the latencies of successful calls
+        self.latencies = {}
+        # (cls, operation, exception class name) -> count of failed calls
+        self.errors = collections.Counter()
+        self._originals = {}
+        self._enabled = False
+
+    def instrument(self, cls):
+        owner = Metrics._INSTRUMENTED.get(cls)
+        if owner is self:
+            return
+        if owner is not None:
+            raise RuntimeError('Class is already instrumented: ' + cls.__name__)
+
+        originals = {}
+        for name, operation in Metrics.METHODS:
+            if not hasattr(cls, name):
+                continue
+            originals[name] = cls.__dict__.get(name)
+            if name == 'to_bytes':
+                setattr(cls, name, self._wrap(cls, operation, getattr(cls, name)))
+            else:
+                # the bound classmethod already carries cls
+                setattr(cls, name, staticmethod(self._wrap(cls, operation, getattr(cls, name))))
+        self._originals[cls] = originals
+        Metrics._INSTRUMENTED[cls] = self
+
+    def uninstrument(self, cls):
+        originals = self._originals.pop(cls)
+        for name, original in originals.items():
+            if original is None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, original)
+        del Metrics._INSTRUMENTED[cls]
+
+    def _wrap(self, cls, operation, method):
+        key = (cls, operation)
+        histogram = self.latencies.setdefault(key, [0] * Metrics.BUCKETS)
+        last = Metrics.BUCKETS - 1
+        errors = self.errors
+        perf_counter_ns = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                errors[key + (e.__class__.__name__,)] += 1
+                raise
+            bucket = (perf_counter_ns() - start).bit_length()
+            histogram[bucket if bucket < last else last] += 1
+            return result
+
+        wrapper.__name__ = method.__name__
+        wrapper.__wrapped__ = method
+        return wrapper
+
+    def enable(self):
+        # instruments the packet and payload classes registered with net.ip
+        import net.ip
+        if self._enabled:
+            return
+        for version, cls in list(net.ip.DECODERS.items()):
+            self.instrument(cls)
+            net.ip.register(version, cls)
+        for protocol, cls in list(net.ip.PROTOCOL_DECODERS.items()):
+            self.instrument(cls)
+            net.ip.register_protocol(protocol, cls)
+        self._enabled = True
+
+    def disable(self):
+        # puts back the original methods of every class instrumented
+        import net.ip
+        for cls in list(self._originals):
+            self.uninstrument(cls)
+        for version, cls in list(net.ip.DECODERS.items()):
+            net.ip.register(version, cls)
+        for protocol, cls in list(net.ip.PROTOCOL_DECODERS.items()):
+            net.ip.register_protocol(protocol, cls)
+        self._enabled = False
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    def count(self, cls, operation):
+        # number of successful calls of operation on cls
+        histogram = self.latencies.get((cls, operation))
+        return 0 if histogram is None else sum(histogram)
+
+    def error_count(self, cls, operation, reason=None):
+        # number of failed calls of operation on cls, raising an exception of
+        # the class named reason, or any exception when reason is None
+        return sum(n for (c, o, r), n in self.errors.items()
+            if c is cls and o == operation and (reason is None or r == reason))
+
+    def percentile(self, cls, operation, p):
+        # upper bound, in ns, of the bucket holding the pth percentile latency
+        # of operation on cls; None before any calls
+        histogram = self.latencies.get((cls, operation))
+        total = 0 if histogram is None else sum(histogram)
+        if total == 0:
+            return None
+        rank = total * p / 100.0
+        seen = 0
+        for bucket, n in enumerate(histogram):
+            seen += n
+            if n and seen >= rank:
+                return 1 << bucket
+        return 1 << (Metrics.BUCKETS - 1)
+
+    def reset(self):
+        for histogram in self.latencies.values():
+            histogram[:] = [0] * Metrics.BUCKETS
+        self.errors.clear()
+
+    def report(self):
+        # one line per class and operation with calls or errors
+        keys = set(key for key, histogram in self.latencies.items() if any(histogram))
+        keys.update((c, o) for c, o, r in self.errors)
+        lines = []
+        for cls, operation in sorted(keys, key=lambda k: (k[0].__module__, k[0].__name__, k[1])):
+            count = self.count(cls, operation)
+            line = cls.__module__ + '.' + cls.__name__ + ' ' + operation + ': ' + str(count) + ' calls'
+            if count:
+                line += ', p50 <= ' + str(self.percentile(cls, operation, 50)) + ' ns' \
+                    + ', p99 <= ' + str(self.percentile(cls, operation, 99)) + ' ns'
+            for (c, o, reason), n in sorted(self.errors.items(), key=lambda e: e[0][2]):
+                if c is cls and o == operation:
+                    line += ', ' + str(n) + ' ' + reason
+            lines.append(line)
+        return lines
@@ -17,15 +17,207 @@
 
 import bitstring
 from bitstring import BitStream
-import inspect
 import logging
 
+from net.Codec import Codec
+
 logger = logging.getLogger(__name__)
-class Structure():
+
+# _buf of a structure between release() and the acquire() handing it out again
+_RELEASED = object()
+
+def _snapshot(buf, size):
+    # the first size bytes of buf as bytes, so a decoded structure neither
+    # sees later changes to a reused buffer nor keeps a larger one alive
+    if type(buf) is bytes and len(buf) == size:
+        return buf
+    return bytes(buf[:size])
+
+# Generates __slots__ for Structure subclasses from the names in their own
+# _FORMAT plus any extra attribute names listed in _SLOTS, so instances don't
+# carry a __dict__. A class that defines __slots__ itself is left alone; adding
+# '__dict__' to _SLOTS allows arbitrary attributes again.
+class StructureType(type):
+    def __new__(mcls, name, bases, namespace, **kwargs):
+        if '__slots__' not in namespace:
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(klass.__dict__.get('__slots__', ()))
+
+            names = []
+            fmt = namespace.get('_FORMAT', ())
+            if isinstance(fmt, tuple):
+                names.extend(field[0] for field in fmt)
+            names.extend(namespace.get('_SLOTS', ()))
+
+            slots = []
+            for n in names:
+                if n not in inherited and n not in namespace and n not in slots:
+                    slots.append(n)
+            namespace['__slots__'] = tuple(slots)
+
+        return super().__new__(mcls, name, bases, namespace, **kwargs)
+
+# Non-data descriptor installed by view classes for every compiled field.
+# View instances keep decoded values in their __dict__, which takes precedence,
+# so this is only reached for fields that haven't been read yet; it decodes the
+# field from the underlying buffer and caches it on the instance.
+class LazyField():
+    def __init__(self, name, getter):
+        self.name = name
+        self.getter = getter
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        obj._set_field_value(self.name, self.getter(obj._buf, obj._offset))
+        return obj.__dict__[self.name]
+
+class Structure(metaclass=StructureType):
+    # buffer and offset of the encoding the structure was decoded from, set by
+    # from_bytes() and view(); left unset on structures built by hand.
+    # from_bytes() keeps a bytes copy of just the encoding, while a view
+    # refers to the buffer it was given.
+    __slots__ = ('_buf', '_offset')
+
+    # compiled form of _FORMAT, set for each subclass when it is defined; None
+    # when the format can't be compiled and the bitstring path is used instead
+    _CODEC = None
+
+    # True for the view classes made by view()
+    _LAZY = False
+
+    # most instances each class keeps for reuse by acquire()
+    _POOL_SIZE = 256
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_FORMAT' in cls.__dict__:
+            cls._CODEC = Codec.compile(cls._FORMAT)
+        # each class gets its own view class, built on first use, and its own
+        # pool of released instances
+        cls._VIEW = None
+        cls._POOL = []
+
+    @classmethod
+    def _view_class(cls):
+        # views are short lived, so they trade the compact slots of regular
+        # instances for a __dict__ that lets decoded fields shadow LazyField
+        namespace = {
+            '__slots__': ('__dict__',),
+            '__module__': cls.__module__,
+            '__qualname__': cls.__qualname__,
+            '_LAZY': True,
+        }
+        for name, getter in cls._CODEC.getters.items():
+            namespace[name] = LazyField(name, getter)
+        return type(cls)(cls.__name__, (cls,), namespace)
+
     @classmethod
-    def from_bytes(cls, buf):
+    def from_bytes(cls, buf, fields=None):
+        # fields, if given, names the only fields to decode up front; they are
+        # read with one struct call that skips the rest, and any other field is
+        # decoded when first read, as for view()
+        codec = cls._CODEC
+        if codec is None:
+            return cls._from_bytes_bitstring(buf)
+        if fields is not None:
+            if cls._VIEW is None:
+                cls._VIEW = cls._view_class()
+            obj = cls._VIEW()
+            for name, value in zip(fields, codec.unpacker(fields)(buf)):
+                obj._set_field_value(name, value)
+            obj._buf = _snapshot(buf, codec.size)
+            obj._offset = 0
+            return obj
+
+        obj = cls()
+        for name, value in zip(codec.names, codec.unpack(buf)):
+            obj._set_field_value(name, value)
+        obj._buf = _snapshot(buf, codec.size)
+        obj._offset = 0
+
+        return obj
+
+    @classmethod
+    def from_bytes_into(cls, obj, buf):
+        # like from_bytes(), but decodes into obj, an existing instance of cls,
+        # e.g. one from acquire(), rather than allocating a new one
+        codec = cls._CODEC
+        if codec is None:
+            raise NotImplementedError('from_bytes_into() has not been implemented in subclass: ' + cls.__name__)
+
+        for name, value in zip(codec.names, codec.unpack(buf)):
+            obj._set_field_value(name, value)
+        obj._buf = _snapshot(buf, codec.size)
+        obj._offset = 0
+
+        return obj
+
+    @classmethod
+    def acquire(cls):
+        # an instance released earlier, or a new one if there are none; its
+        # fields are only meaningful once something is decoded into it
+        pool = cls._POOL
+        if pool:
+            obj = pool.pop()
+            obj._buf = None
+            return obj
+        return cls()
+
+    def release(self):
+        # returns the structure to its class's pool for acquire() to hand out
+        # again; it must not be used after this
+        if getattr(self, '_buf', None) is _RELEASED:
+            raise RuntimeError('Structure released twice: ' + self.__class__.__name__)
+        self._clear()
+        self._buf = _RELEASED
+        pool = self.__class__._POOL
+        if len(pool) < self.__class__._POOL_SIZE:
+            pool.append(self)
+
+    def _clear(self):
+        # drops references to the buffer the structure was decoded from, so a
+        # pooled instance doesn't keep it alive
+        self._buf = None
+        if self._LAZY:
+            self.__dict__.clear()
+
+    @classmethod
+    def view(cls, buf, offset=0):
+        # header fields are decoded on first access; subclasses slice whatever
+        # follows the header out of buf rather than copying it
+        codec = cls._CODEC
+        if codec is None:
+            raise NotImplementedError('view() has not been implemented in subclass: ' + cls.__name__)
+        if len(buf) - offset < codec.size:
+            raise IndexError('Buffer too short for ' + cls.__name__ + ': ' + str(len(buf) - offset) + ' < ' + str(codec.size) + ' bytes')
+
+        if cls._VIEW is None:
+            cls._VIEW = cls._view_class()
+        obj = cls._VIEW()
+        obj._buf = buf
+        obj._offset = offset
+
+        return obj
+
+    @classmethod
+    def decode_batch(cls, buffers, offsets=None):
+        # decodes many structures at once into a numpy structured array with a
+        # column per field; buffers is either a sequence of buffers, or a
+        # single buffer with the structures at the given offsets
+        codec = cls._CODEC
+        if codec is None:
+            raise NotImplementedError('decode_batch() has not been implemented in subclass: ' + cls.__name__)
+
+        return codec.unpack_batch(codec.gather(buffers, offsets))
+
+    @classmethod
+    def _from_bytes_bitstring(cls, buf):
         if not hasattr(cls, '_FORMAT') or not isinstance(cls._FORMAT, tuple):
-            raise NotImplementedError(inspect.stack()[0][3] + '() has not been implemented in subclass: ' + cls.__name__)
+            raise NotImplementedError('from_bytes() has not been implemented in subclass: ' + cls.__name__)
 
         bs = BitStream(bytes=buf)
         obj = cls()
@@ -41,9 +233,90 @@ class Structure():
     def _get_field_value(self, name):
         return getattr(self, name)
 
+    def dirty_fields(self):
+        # names of the fields whose values differ from the encoding the
+        # structure was decoded from; every field for one built by hand
+        codec = self.__class__._CODEC
+        if codec is None:
+            return [name for name, fmt in self.__class__._FORMAT if not fmt.startswith('pad')]
+        buf = getattr(self, '_buf', None)
+        if buf is None:
+            return list(codec.step_of)
+
+        if self._LAZY:
+            # fields of a view that haven't been read can't have changed
+            dirty = []
+            for name in codec.names:
+                if name in self.__dict__ and name in codec.step_of \
+                        and self._get_field_value(name) != codec.getters[name](buf, self._offset):
+                    dirty.append(name)
+            return dirty
+
+        dirty = []
+        for name, value in zip(codec.names, codec.unpack(buf, self._offset)):
+            if value is not None and self._get_field_value(name) != value:
+                dirty.append(name)
+        return dirty
+
+    def pack_into(self, buf, offset=0):
+        # writes the encoded structure into the writable buffer buf at offset
+        # and returns the number of bytes written. A structure decoded from a
+        # buffer copies its original encoding and re-encodes only the chunks
+        # holding fields that changed, which also keeps any reserved bits.
+        codec = self.__class__._CODEC
+        if codec is None:
+            encoded = self._to_bytes_bitstring()
+            size = len(encoded)
+        else:
+            size = codec.size
+        if len(buf) - offset < size:
+            raise IndexError('Buffer too short for ' + self.__class__.__name__ + ': ' + str(len(buf) - offset) + ' < ' + str(size) + ' bytes')
+
+        if codec is None:
+            memoryview(buf)[offset:offset + size] = encoded
+            return size
+
+        original = getattr(self, '_buf', None)
+        if original is None:
+            codec.pack_into(buf, offset, [self._get_field_value(name) for name in codec.names])
+            return size
+
+        dirty = self.dirty_fields()
+        memoryview(buf)[offset:offset + size] = memoryview(original)[self._offset:self._offset + size]
+        for name in dirty:
+            codec.pack_field_into(buf, offset, name, self._get_field_value(name))
+        return size
+
     def to_bytes(self):
+        codec = self.__class__._CODEC
+        if codec is None:
+            return self._to_bytes_bitstring()
+
+        if getattr(self, '_buf', None) is None:
+            return codec.pack([self._get_field_value(name) for name in codec.names])
+
+        # subclasses extend pack_into() with what follows the fields
+        buf = bytearray(codec.size)
+        Structure.pack_into(self, buf)
+        return bytes(buf)
+
+    def to_dict(self):
+        # the values of the fields, by name, without the pad fields
+        codec = self.__class__._CODEC
+        if codec is None:
+            return {name: getattr(self, name) for name, fmt in self.__class__._FORMAT if not fmt.startswith('pad')}
+        return codec.to_dict(self)
+
+    def to_tuple(self):
+        # the values of the fields in _FORMAT order, without the pad fields
+        codec = self.__class__._CODEC
+        if codec is None:
+            return tuple(getattr(self, name) for name, fmt in self.__class__._FORMAT if not fmt.startswith('pad'))
+        return codec.to_tuple(self)
+
+    def _to_bytes_bitstring(self):
         if not hasattr(self.__class__, '_FORMAT') or not isinstance(self.__class__._FORMAT, tuple):
-            raise NotImplementedError(inspect.stack()[0][3] + '() has not been implemented in subclass: ' + self.__class__.__name__)
+            raise NotImplementedError('to_bytes() has not been implemented in subclass: ' + self.__class__.__name__)
 
         fmts = []
         values = {}
@@ -51,7 +324,6 @@ class Structure():
             name, fmt = field
             fmts.append(fmt + '=' + name)
             values[name] = self._get_field_value(name)
-            logger.debug('Packing ' + str(values[name]) + ' for ' + name + ' field as ' + fmt)
 
         bs = bitstring.pack(','.join(fmts), **values)
 
@@ -0,0 +1,73 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Writes Structures as JSON Lines, one object of their to_dict() fields per
+# line. Lines are encoded by the json module's C encoder and written to the
+# file in chunks.
+class JsonLinesWriter():
+    def __init__(self, path, chunk_size=1024):
+        # path is a file name, or a text file opened for writing
+        if isinstance(path, str):
+            self.file = open(path, 'w')
+            self._close_file = True
+        else:
+            self.file = path
+            self._close_file = False
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._lines = []
+        self._encode = json.JSONEncoder(separators=(',', ':'), default=JsonLinesWriter._default).encode
+
+    @staticmethod
+    def _default(value):
+        # bytes fields are written as hex strings
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex()
+        raise TypeError('Object of type ' + value.__class__.__name__ + ' is not JSON serializable')
+
+    def write(self, obj):
+        self._lines.append(self._encode(obj.to_dict()))
+        if len(self._lines) >= self.chunk_size:
+            self.flush()
+
+    def write_all(self, objs):
+        for obj in objs:
+            self.write(obj)
+
+    def flush(self):
+        if self._lines:
+            self._lines.append('')
+            self.file.write('\n'.join(self._lines))
+            self.count += len(self._lines) - 1
+            self._lines = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self._close_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,115 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from net.Structure import Structure
+
+logger = logging.getLogger(__name__)
+
+# Streams the fields of many Structures of one class to a NumPy .npy file of
+# a structured array, with the columns of Codec.dtype(). Rows are decoded a
+# chunk at a time by the vectorized Codec.unpack_batch() and appended to the
+# file, so memory use doesn't grow with the row count; the row count in the
+# header is filled in by close().
+class NpyWriter():
+    MAGIC = b'\x93NUMPY\x01\x00'
+
+    # digits reserved in the header for the row count
+    COUNT_DIGITS = 20
+
+    def __init__(self, path, cls, chunk_size=65536):
+        import numpy
+
+        self.codec = cls._CODEC
+        if self.codec is None:
+            raise NotImplementedError('NpyWriter needs a compiled format, not available for: ' + cls.__name__)
+        self.dtype = self.codec.dtype()
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._pending = []
+
+        # with only scalar columns rows can be built from field values without
+        # encoding them first
+        self._scalar = all(self.dtype[name].subdtype is None for name in self.dtype.names)
+        self._descr = numpy.lib.format.dtype_to_descr(self.dtype)
+        self.file = open(path, 'wb')
+        self.file.write(self._header(0))
+
+    def _header(self, count):
+        # version 1.0 header, padded to the same length whatever the count so
+        # close() can write over it
+        header = "{'descr': " + repr(self._descr) + ", 'fortran_order': False, 'shape': (" + str(count) + ",), }"
+        length = len(NpyWriter.MAGIC) + 2 + len(header) - len(str(count)) + NpyWriter.COUNT_DIGITS + 1
+        padded = (length + 63) // 64 * 64
+        header = header.ljust(padded - len(NpyWriter.MAGIC) - 2 - 1) + '\n'
+        if len(header) > 0xffff:
+            raise ValueError('Format too large for an npy header: ' + str(len(header)) + ' bytes')
+        return NpyWriter.MAGIC + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+    def write(self, obj):
+        # adds a decoded or built structure
+        if self._scalar:
+            self._pending.append(self.codec.to_tuple(obj))
+        else:
+            self._pending.append(Structure.to_bytes(obj))
+        if len(self._pending) >= self.chunk_size:
+            self._write_pending()
+
+    def write_all(self, objs):
+        for obj in objs:
+            self.write(obj)
+
+    def write_buffers(self, buffers, offsets=None):
+        # adds structures straight from their encodings, as taken by
+        # Structure.decode_batch(), without building objects for them
+        self._write_pending()
+        self.write_array(self.codec.unpack_batch(self.codec.gather(buffers, offsets)))
+
+    def write_array(self, rows):
+        # adds a structured array of rows, e.g. from Structure.decode_batch()
+        if rows.dtype != self.dtype:
+            raise ValueError('Rows have dtype ' + str(rows.dtype) + ', not ' + str(self.dtype))
+        self._write_pending()
+        self.file.write(rows.tobytes())
+        self.count += len(rows)
+
+    def _write_pending(self):
+        import numpy
+
+        if self._pending:
+            if self._scalar:
+                rows = numpy.array(self._pending, dtype=self.dtype)
+            else:
+                rows = self.codec.unpack_batch(self.codec.gather(self._pending))
+            self._pending = []
+            self.file.write(rows.tobytes())
+            self.count += len(rows)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self._write_pending()
+        self.file.seek(0)
+        self.file.write(self._header(self.count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
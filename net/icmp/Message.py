@@ -0,0 +1,69 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from net.Structure import Structure
+
+logger = logging.getLogger(__name__)
+class Message(Structure):
+    _FORMAT = (
+        ('type', 'uint:8'),
+        ('code', 'uint:8'),
+        ('checksum', 'uint:16'),
+        ('rest_of_header', 'bytes:4'),
+    )
+    _SLOTS = ('data',)
+
+    TYPE_ECHO_REPLY = 0
+    TYPE_DESTINATION_UNREACHABLE = 3
+    TYPE_REDIRECT = 5
+    TYPE_ECHO_REQUEST = 8
+    TYPE_TIME_EXCEEDED = 11
+    TYPE_PARAMETER_PROBLEM = 12
+
+    @classmethod
+    def from_bytes(cls, buf, fields=None):
+        msg = super(cls, cls).from_bytes(buf, fields)
+        msg.data = buf[8:]
+        return msg
+
+    @classmethod
+    def view(cls, buf, offset=0):
+        buf = memoryview(buf)
+        msg = super(cls, cls).view(buf, offset)
+        msg.data = buf[(offset + 8):]
+        return msg
+
+    def pack_into(self, buf, offset=0):
+        length = self.__class__._CODEC.size + len(self.data)
+        if len(buf) - offset < length:
+            raise IndexError('Buffer too short for message: ' + str(len(buf) - offset) + ' < ' + str(length) + ' bytes')
+
+        super().pack_into(buf, offset)
+        memoryview(buf)[(offset + 8):(offset + length)] = self.data
+        return length
+
+    def to_bytes(self):
+        buf = bytearray(self.__class__._CODEC.size + len(self.data))
+        self.pack_into(buf)
+        return bytes(buf)
+
+    def __str__(self):
+        return 'ICMP Message Type: ' + str(self.type) \
+            + ', Code: ' + str(self.code) \
+            + ', Checksum: ' + hex(self.checksum)
@@ -0,0 +1,81 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import ipaddress
+import logging
+
+import net.ip
+
+logger = logging.getLogger(__name__)
+
+# Classifies addresses by the blocks containing them. The blocks' ranges are
+# cut into sorted, non-overlapping elementary intervals, each labelled with
+# the tuple of blocks that cover it, so a lookup is a single binary search
+# however the blocks nest or overlap.
+class Classifier():
+    _DEFAULT = None
+
+    def __init__(self, blocks):
+        networks = [(block, ipaddress.ip_network(block)) for block in blocks]
+
+        bounds = set([0])
+        for block, network in networks:
+            bounds.add(int(network.network_address))
+            bounds.add(int(network.broadcast_address) + 1)
+        # start of each interval, and the blocks covering it
+        self.starts = sorted(bounds)
+        self.labels = []
+        for start in self.starts:
+            self.labels.append(tuple(block for block, network in networks
+                if int(network.network_address) <= start <= int(network.broadcast_address)))
+
+        # numpy array of starts, and the label indexes of each block, made on
+        # first use by classify_batch() and contains_batch()
+        self._starts_array = None
+        self._codes = {}
+
+    @classmethod
+    def default(cls):
+        # classifier for the IPV4_BLOCK_* special purpose blocks of net.ip
+        if cls._DEFAULT is None:
+            cls._DEFAULT = cls([value for name, value in vars(net.ip).items() if name.startswith('IPV4_BLOCK_')])
+        return cls._DEFAULT
+
+    def classify(self, address):
+        # the blocks containing address, an int or IPv4Address; empty if none
+        return self.labels[bisect.bisect_right(self.starts, int(address)) - 1]
+
+    def classify_batch(self, addresses):
+        # indexes into labels for a whole column of addresses, as a numpy
+        # array
+        import numpy
+
+        if self._starts_array is None:
+            self._starts_array = numpy.asarray(self.starts, dtype=numpy.uint64)
+        addresses = numpy.asarray(addresses, dtype=numpy.uint64)
+        return numpy.searchsorted(self._starts_array, addresses, side='right') - 1
+
+    def contains_batch(self, addresses, block):
+        # numpy mask of the addresses within block
+        import numpy
+
+        codes = self._codes.get(block)
+        if codes is None:
+            codes = numpy.array([i for i, label in enumerate(self.labels) if block in label], dtype=numpy.intp)
+            self._codes[block] = codes
+        return numpy.isin(self.classify_batch(addresses), codes)
@@ -0,0 +1,165 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import ipaddress
+import logging
+import re
+
+from net.Codec import Codec
+
+logger = logging.getLogger(__name__)
+
+# Compiles filter expressions such as
+#   protocol == 17 and destination in 10.0.0.0/8 and ttl < 5
+# into a python function match(buf, offset=0) that reads the fields it needs
+# straight from the raw header at their fixed offsets, so packets can be
+# rejected before anything is decoded. Expressions combine comparisons
+# (== != < <= > >=) of header fields with numbers or addresses, 'in' and
+# 'not in' tests against networks, bare fields as truth values, and, or, not
+# and parentheses.
+class Filter():
+    ALIASES = {
+        'ttl': 'time_to_live',
+        'src': 'source',
+        'dst': 'destination',
+        'proto': 'protocol',
+        'id': 'ident',
+    }
+
+    _TOKEN = re.compile(r'\s*(?:'
+        r'([0-9A-Fa-f]*[.:][0-9A-Fa-f.:]*(?:/\d+)?)'    # address or network
+        r'|(0[xX][0-9A-Fa-f]+|\d+)'                     # number
+        r'|([A-Za-z_]\w*)'                              # field or keyword
+        r'|(==|!=|<=|>=|<|>|\(|\))'                     # operator
+        r')')
+    _COMPARISONS = ('==', '!=', '<=', '>=', '<', '>')
+
+    def __init__(self, expression, cls, version):
+        self.expression = expression
+        self.cls = cls
+        self.codec = cls._CODEC
+        if self.codec is None:
+            raise ValueError('Can\'t filter ' + cls.__name__ + ' without a compiled format')
+
+        self.tokens = Filter._tokenize(expression)
+        self.position = 0
+        body = self._parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError('Unexpected ' + repr(self.tokens[self.position]) + ' in filter: ' + expression)
+
+        # anything too short for the header, or another IP version, doesn't match
+        guard = 'len(buf) - offset >= ' + str(self.codec.size)
+        if 'version' in self.codec.step_of:
+            guard += ' and ' + self.codec.expression('version') + ' == ' + str(version)
+        self.code = '\n'.join([
+            'def match(buf, offset=0):',
+            '    return ' + guard + ' and ' + body,
+        ])
+        namespace = dict(Codec.EXPRESSION_NAMESPACE)
+        exec(self.code, namespace)
+        self.match = namespace['match']
+
+    @staticmethod
+    def _tokenize(expression):
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            m = Filter._TOKEN.match(expression, position)
+            if m is None or m.end() == position:
+                raise ValueError('Invalid filter at ' + str(position) + ': ' + expression)
+            tokens.append(m.group(m.lastindex))
+            position = m.end()
+        return tokens
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError('Unexpected end of filter: ' + self.expression)
+        self.position += 1
+        return token
+
+    def _parse_or(self):
+        terms = [self._parse_and()]
+        while self._peek() == 'or':
+            self._next()
+            terms.append(self._parse_and())
+        return terms[0] if len(terms) == 1 else '(' + ' or '.join(terms) + ')'
+
+    def _parse_and(self):
+        terms = [self._parse_not()]
+        while self._peek() == 'and':
+            self._next()
+            terms.append(self._parse_not())
+        return terms[0] if len(terms) == 1 else '(' + ' and '.join(terms) + ')'
+
+    def _parse_not(self):
+        if self._peek() == 'not':
+            self._next()
+            return '(not ' + self._parse_not() + ')'
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        token = self._next()
+        if token == '(':
+            term = self._parse_or()
+            if self._next() != ')':
+                raise ValueError('Expected ) in filter: ' + self.expression)
+            return term
+
+        name = Filter.ALIASES.get(token, token)
+        if name not in self.codec.step_of:
+            raise ValueError('Unknown field ' + repr(token) + ' in filter: ' + self.expression)
+        field = '(' + self.codec.expression(name) + ')'
+
+        op = self._peek()
+        if op in Filter._COMPARISONS:
+            self._next()
+            return '(' + field + ' ' + op + ' ' + str(self._value()) + ')'
+        elif op == 'in' or op == 'not':
+            self._next()
+            if op == 'not' and self._next() != 'in':
+                raise ValueError('Expected in after not in filter: ' + self.expression)
+            network, netmask = self._network()
+            return '(' + field + ' & ' + str(netmask) + (' == ' if op == 'in' else ' != ') + str(network) + ')'
+        return field
+
+    def _value(self):
+        token = self._next()
+        if token in ('true', 'True'):
+            return 1
+        elif token in ('false', 'False'):
+            return 0
+        try:
+            if '.' in token or ':' in token:
+                return int(ipaddress.ip_address(token))
+            return int(token, 0)
+        except ValueError:
+            raise ValueError('Invalid value ' + repr(token) + ' in filter: ' + self.expression)
+
+    def _network(self):
+        token = self._next()
+        try:
+            network = ipaddress.ip_network(token, strict=False)
+        except ValueError:
+            raise ValueError('Invalid network ' + repr(token) + ' in filter: ' + self.expression)
+        return int(network.network_address), int(network.netmask)
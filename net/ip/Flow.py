@@ -0,0 +1,55 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import ipaddress
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Counters for one direction of a conversation, identified by its addresses,
+# protocol and, for TCP and UDP, ports
+class Flow():
+    __slots__ = ('source', 'destination', 'protocol', 'source_port', 'destination_port',
+        'packets', 'bytes', 'first_seen', 'last_seen')
+
+    FIELDS = __slots__
+
+    def __init__(self, source, destination, protocol, source_port=None, destination_port=None, now=0.0):
+        self.source = source
+        self.destination = destination
+        self.protocol = protocol
+        self.source_port = source_port
+        self.destination_port = destination_port
+        self.packets = 0
+        self.bytes = 0
+        self.first_seen = now
+        self.last_seen = now
+
+    @property
+    def key(self):
+        return (self.source, self.destination, self.protocol, self.source_port, self.destination_port)
+
+    def to_tuple(self):
+        return (self.source, self.destination, self.protocol, self.source_port, self.destination_port,
+            self.packets, self.bytes, self.first_seen, self.last_seen)
+
+    def __str__(self):
+        return 'Flow ' + str(ipaddress.ip_address(self.source)) + (':' + str(self.source_port) if self.source_port is not None else '') \
+            + ' -> ' + str(ipaddress.ip_address(self.destination)) + (':' + str(self.destination_port) if self.destination_port is not None else '') \
+            + ', Protocol: ' + str(self.protocol) \
+            + ', Packets: ' + str(self.packets) \
+            + ', Bytes: ' + str(self.bytes)
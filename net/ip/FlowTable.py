@@ -0,0 +1,110 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+import time
+
+from net.ip.Flow import Flow
+
+logger = logging.getLogger(__name__)
+
+# Aggregates decoded IPv4 and IPv6 packets into Flows. Flows are kept in an
+# OrderedDict, a hash table keyed by the flow's 5-tuple, ordered by last
+# activity so idle flows can be expired from the front without a scan.
+class FlowTable():
+    # protocols whose header starts with 16 bit source and destination ports
+    PORT_PROTOCOLS = frozenset((6, 17, 33, 132, 136))
+
+    def __init__(self, timeout=60.0, max_flows=None):
+        self.timeout = timeout
+        self.max_flows = max_flows
+        self._flows = collections.OrderedDict()
+        self.expired = []
+
+    def __len__(self):
+        return len(self._flows)
+
+    def __iter__(self):
+        return iter(self._flows.values())
+
+    def __contains__(self, key):
+        return key in self._flows
+
+    def __getitem__(self, key):
+        return self._flows[key]
+
+    def add(self, pkt, now=None):
+        # counts pkt against its flow and returns the flow
+        if now is None:
+            now = time.monotonic()
+
+        if pkt.version == 4:
+            length = pkt.total_length
+            first = pkt.fragment_offset == 0
+        else:
+            length = 40 + pkt.payload_length
+            fragment = pkt.extension_header(44)
+            first = fragment is None or (fragment[2] << 8 | fragment[3]) >> 3 == 0
+
+        protocol = pkt.protocol
+        data = pkt.data
+        if first and protocol in FlowTable.PORT_PROTOCOLS and len(data) >= 4:
+            key = (pkt.source, pkt.destination, protocol, data[0] << 8 | data[1], data[2] << 8 | data[3])
+        else:
+            key = (pkt.source, pkt.destination, protocol, None, None)
+
+        flows = self._flows
+        flow = flows.get(key)
+        if flow is None:
+            if self.max_flows is not None and len(flows) >= self.max_flows:
+                self.expired.append(flows.popitem(last=False)[1])
+            flow = Flow(*key, now=now)
+            flows[key] = flow
+        else:
+            flows.move_to_end(key)
+        flow.packets += 1
+        flow.bytes += length
+        flow.last_seen = now
+
+        return flow
+
+    def expire(self, now=None):
+        # moves flows idle for timeout seconds or more to expired and returns
+        # them
+        if now is None:
+            now = time.monotonic()
+        flows = self._flows
+        expired = []
+        while flows:
+            flow = next(iter(flows.values()))
+            if now - flow.last_seen < self.timeout:
+                break
+            expired.append(flows.popitem(last=False)[1])
+        self.expired.extend(expired)
+        return expired
+
+    def export(self, active=True):
+        # returns and forgets the expired flows, plus the active ones if active
+        # is True, as tuples of Flow.FIELDS
+        flows = self.expired
+        self.expired = []
+        rows = [flow.to_tuple() for flow in flows]
+        if active:
+            rows.extend([flow.to_tuple() for flow in self._flows.values()])
+            self._flows.clear()
+        return rows
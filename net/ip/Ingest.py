@@ -0,0 +1,128 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+
+import net.ip
+
+logger = logging.getLogger(__name__)
+
+# Receives raw IP packets, decodes them in batches and hands the decoded
+# packets to async consumers through a bounded queue of batches. As an
+# asyncio.DatagramProtocol it takes packets from a datagram endpoint, e.g.
+#   await loop.create_datagram_endpoint(lambda: ingest, local_addr=...)
+# and datagrams arriving in the same event loop iteration are decoded as one
+# batch; datagrams can't be pushed back on, so when the queue is full the
+# batch is dropped and counted. feed_from() reads any async iterable of
+# packet buffers instead and waits for room in the queue.
+class Ingest(asyncio.DatagramProtocol):
+    def __init__(self, queue_size=64, batch_size=256, lazy=False):
+        # queue_size is in batches of up to batch_size packets; lazy decodes
+        # with net.ip.view rather than net.ip.from_bytes
+        self.queue = asyncio.Queue(queue_size)
+        self.batch_size = batch_size
+        self._decode = net.ip.view if lazy else net.ip.from_bytes
+        self._pending = []
+        self._flush_scheduled = False
+        self.transport = None
+        self._closing = None
+        self._closed = False
+
+        self.received = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        self._pending.append(data)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def error_received(self, exc):
+        logger.debug('Datagram endpoint error: %s', exc)
+
+    def connection_lost(self, exc):
+        self.close()
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        if self.queue.full():
+            # don't spend time decoding what there's no room for
+            self.dropped += len(pending)
+            return
+        self.queue.put_nowait(self._decode_batch(pending))
+
+    def _decode_batch(self, bufs):
+        decode = self._decode
+        batch = []
+        for buf in bufs:
+            try:
+                batch.append(decode(buf))
+            except (RuntimeError, NotImplementedError, IndexError) as e:
+                logger.debug('Skipping undecodable packet: %s', e)
+                self.errors += 1
+        return batch
+
+    async def feed_from(self, source):
+        # decodes the packet buffers of an async iterable, waiting for
+        # consumers whenever the queue is full
+        bufs = []
+        async for buf in source:
+            self.received += 1
+            bufs.append(buf)
+            if len(bufs) >= self.batch_size:
+                await self.queue.put(self._decode_batch(bufs))
+                bufs = []
+        if bufs:
+            await self.queue.put(self._decode_batch(bufs))
+
+    def close(self):
+        # decodes what is pending and then ends packets() and batches() once
+        # the batches already queued have been consumed
+        if self._closed:
+            return
+        self._closed = True
+        self._flush()
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self._closing = asyncio.ensure_future(self.queue.put(None))
+
+    async def batches(self):
+        # yields lists of decoded packets until close()
+        while True:
+            batch = await self.queue.get()
+            if batch is None:
+                return
+            yield batch
+
+    async def packets(self):
+        # yields decoded packets until close()
+        async for batch in self.batches():
+            for pkt in batch:
+                yield pkt
@@ -0,0 +1,83 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+import net.ip
+from net.Structure import Structure
+
+logger = logging.getLogger(__name__)
+
+# _payload of a packet whose payload hasn't been decoded yet
+UNDECODED = object()
+
+# What the IPv4 and IPv6 packet classes share: the data following the header,
+# the payload decoded from it, and the source and destination fields.
+class Packet(Structure):
+    _SLOTS = ('data', '_payload')
+
+    # ipaddress class of the source and destination addresses
+    _ADDRESS = None
+
+    def _clear(self):
+        super()._clear()
+        self.data = None
+        self._payload = UNDECODED
+
+    def _first_fragment(self):
+        # whether data starts with the upper layer header
+        raise NotImplementedError('_first_fragment() has not been implemented in subclass: ' + self.__class__.__name__)
+
+    @property
+    def payload(self):
+        # the upper layer header data starts with, e.g. a net.udp.Datagram,
+        # decoded on first access as a view of data by the decoder registered
+        # for protocol in net.ip; None if there is no decoder or this is not
+        # the first fragment
+        payload = getattr(self, '_payload', UNDECODED)
+        if payload is UNDECODED:
+            if self._first_fragment():
+                payload = net.ip.decode_payload(self.protocol, self.data, lazy=True)
+            else:
+                payload = None
+            self._payload = payload
+        return payload
+
+    # source and destination are kept as ints, which is all hashing,
+    # comparing and masking need; these build the address objects on demand
+    @property
+    def source_address(self):
+        return self._ADDRESS(self.source)
+
+    @source_address.setter
+    def source_address(self, address):
+        self.source = int(self._ADDRESS(address))
+
+    @property
+    def destination_address(self):
+        return self._ADDRESS(self.destination)
+
+    @destination_address.setter
+    def destination_address(self, address):
+        self.destination = int(self._ADDRESS(address))
+
+    def _get_field_value(self, name):
+        # address objects may still be assigned to source and destination
+        if name == 'source' or name == 'destination':
+            return int(getattr(self, name))
+        else:
+            return super()._get_field_value(name)
@@ -0,0 +1,149 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import array
+import functools
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+
+import net.ip
+from net.pcap.Reader import Reader
+
+logger = logging.getLogger(__name__)
+
+# Decodes large sets of IP packets in a pool of worker processes. The input
+# is split into shards of consecutive packets; each worker decodes its shard
+# and passes the packets to func, and only what func returns is sent back.
+# Workers read the packets themselves, from the capture file or from a
+# multiprocessing.shared_memory block, so no packet bytes are pickled.
+#
+# func is called as func(packets) with an iterator of (key, packet) pairs,
+# where key is the record timestamp for captures and the packet's index for
+# buffers, and must be picklable, e.g. a module level function.
+class ParallelDecoder():
+    def __init__(self, processes=None, shards_per_process=4, lazy=True):
+        # lazy decodes with net.ip.view rather than net.ip.from_bytes
+        self.processes = processes or multiprocessing.cpu_count()
+        self.shards_per_process = shards_per_process
+        self.lazy = lazy
+
+        # frames without an IP packet and IP packets that failed to decode
+        self.skipped = 0
+        self.errors = 0
+
+    def map(self, func, source, offsets=None, lengths=None):
+        # returns the results of func for each shard, in input order. source is
+        # a capture file path, a sequence of packet buffers, or a SharedMemory
+        # block holding packets at offsets with lengths
+        if isinstance(source, str):
+            return self._run(self._file_tasks(func, source))
+        elif isinstance(source, shared_memory.SharedMemory):
+            if offsets is None or lengths is None or len(offsets) != len(lengths):
+                raise ValueError('Packets in shared memory need offsets and lengths of the same length')
+            return self._run(self._shared_memory_tasks(func, source.name, offsets, lengths))
+
+        lengths = array.array('q', [len(buf) for buf in source])
+        offsets = array.array('q', [0])
+        for length in lengths[:-1]:
+            offsets.append(offsets[-1] + length)
+        block = shared_memory.SharedMemory(create=True, size=max(sum(lengths), 1))
+        try:
+            view = block.buf
+            for offset, length, buf in zip(offsets, lengths, source):
+                view[offset:offset + length] = buf
+            del view
+            return self._run(self._shared_memory_tasks(func, block.name, offsets, lengths))
+        finally:
+            try:
+                block.close()
+            except BufferError:
+                logger.debug('Leaving shared memory mapped while packets refer to it')
+            block.unlink()
+
+    def reduce(self, func, merge, source, offsets=None, lengths=None, initial=None):
+        # merges the results of func for each shard with merge, e.g. to add up
+        # per shard counters
+        results = self.map(func, source, offsets, lengths)
+        if initial is not None:
+            return functools.reduce(merge, results, initial)
+        return functools.reduce(merge, results)
+
+    def _bounds(self, count):
+        shards = max(1, min(count, self.processes * self.shards_per_process))
+        return [(count * i // shards, count * (i + 1) // shards) for i in range(shards)]
+
+    def _file_tasks(self, func, path):
+        # workers start reading at the position of their first record rather
+        # than reading through the records before it
+        with Reader(path) as reader:
+            shards = reader.split(self.processes * self.shards_per_process)
+        return [(func, self.lazy, 'file', path, position, count) for position, count in shards]
+
+    def _shared_memory_tasks(self, func, name, offsets, lengths):
+        offsets = array.array('q', offsets)
+        lengths = array.array('q', lengths)
+        return [(func, self.lazy, 'shared_memory', name, offsets[start:stop], lengths[start:stop], start)
+            for start, stop in self._bounds(len(offsets))]
+
+    def _run(self, tasks):
+        if self.processes == 1 or len(tasks) == 1:
+            outcomes = [_decode_shard(task) for task in tasks]
+        else:
+            with multiprocessing.Pool(min(self.processes, len(tasks))) as pool:
+                outcomes = pool.map(_decode_shard, tasks)
+
+        results = []
+        for result, skipped, errors in outcomes:
+            results.append(result)
+            self.skipped += skipped
+            self.errors += errors
+        return results
+
+def _decode_shard(task):
+    # runs in a worker: decodes one shard and returns (func's result, skipped
+    # frames, decoding errors)
+    func, lazy, kind = task[:3]
+    if kind == 'file':
+        path, position, count = task[3:]
+        with Reader(path) as reader:
+            result = func(reader.packets(lazy, 0, count, position))
+            return result, reader.skipped, reader.errors
+
+    name, offsets, lengths, first = task[3:]
+    block = shared_memory.SharedMemory(name=name)
+    counts = [0]
+    try:
+        result = func(_shared_memory_packets(block.buf, offsets, lengths, first, lazy, counts))
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            # packets still refer to the block; it's unmapped when they're gone
+            logger.debug('Leaving shared memory mapped while packets refer to it')
+    return result, 0, counts[0]
+
+def _shared_memory_packets(buf, offsets, lengths, first, lazy, counts):
+    decode = net.ip.view if lazy else net.ip.from_bytes
+    for i, (offset, length) in enumerate(zip(offsets, lengths)):
+        try:
+            pkt = decode(buf[offset:offset + length])
+        except (RuntimeError, NotImplementedError, IndexError) as e:
+            logger.debug('Skipping undecodable packet: %s', e)
+            counts[0] += 1
+            continue
+        yield first + i, pkt
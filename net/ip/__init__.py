@@ -15,8 +15,9 @@
 # You should have received a copy of the GNU General Public License
 # along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
 
+import functools
+import ipaddress
 import logging
-import struct
 
 logger = logging.getLogger(__name__)
 
@@ -190,16 +191,166 @@ PROTOCOLS = {
 for i in range(143,252+1):
     PROTOCOLS[i] = 'UNASSIGNED'
 
-def from_bytes(buf):
-    # parse the version
-    (version,) = struct.unpack_from('>B', buf)
-    version = version >> 4
-    logger.debug('Parsing IP packet version: ' + str(version))
-    if version == 4:
-        from net.ip.v4.Packet import Packet as IPv4Packet
-        return IPv4Packet.from_bytes(buf)
-    elif version == 6:
-        from net.ip.v6.Packet import Packet as IPv6Packet
-        return IPv6Packet.from_bytes(buf)
-    else:
+def checksum(buf):
+    # The checksum field is the 16 bit one's complement of the one's complement
+    # sum of all 16 bit words in the header.  Since 2**16 == 1 mod 0xffff, the
+    # one's complement sum of the words is the whole buffer as one big integer
+    # mod 0xffff, which int.from_bytes lets us compute without a python loop.
+    # A buffer whose checksum field is correct checksums to 0.
+    total = int.from_bytes(buf, 'big')
+    if len(buf) % 2:
+        total <<= 8
+    s = total % 0xffff
+    if s == 0 and total != 0:
+        # one's complement sums are never +0 once anything has been added
+        s = 0xffff
+    return 0xffff - s
+
+def checksum_update(checksum, old, new, bits=16):
+    # RFC 1624 incremental update of checksum, HC' = ~(~HC + ~m + m'), when
+    # the 16 bit aligned value old (bits long, a multiple of 16) changes to new
+    s = ~checksum & 0xffff
+    while bits > 0:
+        s += (~old & 0xffff) + (new & 0xffff)
+        old >>= 16
+        new >>= 16
+        bits -= 16
+    while s >> 16:
+        s = (s & 0xffff) + (s >> 16)
+    return ~s & 0xffff
+
+# int helpers for the source and destination fields of decoded packets, which
+# are kept as ints rather than ipaddress objects
+
+def address_to_int(address):
+    # int value of an address given as an int, string or ipaddress object
+    if isinstance(address, int):
+        return address
+    if isinstance(address, str):
+        return int(ipaddress.ip_address(address))
+    return int(address)
+
+@functools.lru_cache(maxsize=1024)
+def network_mask(block):
+    # (network, netmask) ints of a block such as IPV4_BLOCK_LOOPBACK, so that
+    # address & netmask == network for the addresses within it
+    network = ipaddress.ip_network(block)
+    return int(network.network_address), int(network.netmask)
+
+def in_network(address, block):
+    # whether the int address is within block
+    network, netmask = network_mask(block)
+    return address & netmask == network
+
+# Structure classes decoding IP packets by version, and decoding what IP
+# packets carry by protocol number; add to them with register() and
+# register_protocol(), and remove from them with unregister() and
+# unregister_protocol()
+DECODERS = {}
+PROTOCOL_DECODERS = {}
+
+# flat dispatch tables of the bound decode methods of the classes above,
+# indexed by version or protocol number
+_FROM_BYTES = [None] * 16
+_VIEW = [None] * 16
+_PROTOCOL_FROM_BYTES = [None] * 256
+_PROTOCOL_VIEW = [None] * 256
+
+def register(version, cls):
+    # makes from_bytes() and view() decode IP packets of version with cls, a
+    # Structure subclass with from_bytes(buf) and view(buf, offset) methods
+    if not 0 <= version <= 15:
+        raise ValueError('Invalid IP version: ' + str(version))
+    DECODERS[version] = cls
+    _FROM_BYTES[version] = cls.from_bytes
+    _VIEW[version] = cls.view
+
+def unregister(version):
+    # undoes register() for version and returns the class it had registered
+    cls = DECODERS.pop(version, None)
+    if cls is None:
+        raise ValueError('No decoder registered for IP version: ' + str(version))
+    _FROM_BYTES[version] = None
+    _VIEW[version] = None
+    return cls
+
+def register_protocol(protocol, cls):
+    # makes cls, a Structure subclass, the decoder for the payload of IP
+    # packets with protocol, a number from PROTOCOLS
+    if protocol not in PROTOCOLS:
+        raise ValueError('Unknown IP protocol: ' + str(protocol))
+    PROTOCOL_DECODERS[protocol] = cls
+    _PROTOCOL_FROM_BYTES[protocol] = cls.from_bytes
+    _PROTOCOL_VIEW[protocol] = cls.view
+
+def unregister_protocol(protocol):
+    # undoes register_protocol() for protocol and returns the class it had
+    # registered
+    cls = PROTOCOL_DECODERS.pop(protocol, None)
+    if cls is None:
+        raise ValueError('No decoder registered for IP protocol: ' + str(protocol))
+    _PROTOCOL_FROM_BYTES[protocol] = None
+    _PROTOCOL_VIEW[protocol] = None
+    return cls
+
+def from_bytes(buf, fields=None):
+    version = buf[0] >> 4
+    decode = _FROM_BYTES[version]
+    if decode is None:
+        raise NotImplementedError("IP version " + str(version) + ' has not been implemented')
+    if fields is None:
+        return decode(buf)
+    return decode(buf, fields=fields)
+
+def view(buf, offset=0):
+    # like from_bytes, but header fields are decoded lazily and the payload is
+    # not copied out of buf
+    decode = _VIEW[buf[offset] >> 4]
+    if decode is None:
+        raise NotImplementedError("IP version " + str(buf[offset] >> 4) + ' has not been implemented')
+    return decode(buf, offset)
+
+def decode_payload(protocol, buf, offset=0, lazy=False):
+    # decodes the payload of an IP packet, in buf at offset, with the decoder
+    # registered for protocol; None if there isn't one
+    if lazy:
+        decode = _PROTOCOL_VIEW[protocol]
+        return None if decode is None else decode(buf, offset)
+    decode = _PROTOCOL_FROM_BYTES[protocol]
+    if decode is None:
+        return None
+    return decode(buf[offset:] if offset else buf)
+
+# Classifier.default().classify, resolved on the first call of classify()
+_CLASSIFY = None
+
+def classify(address):
+    # the IPV4_BLOCK_* blocks containing address, an int or IPv4Address
+    global _CLASSIFY
+    if _CLASSIFY is None:
+        from net.ip.Classifier import Classifier
+        _CLASSIFY = Classifier.default().classify
+    return _CLASSIFY(address)
+
+def compile_filter(expression, version=4):
+    # compiles a filter expression on the header fields of IP packets of the
+    # given version into a function match(buf, offset=0) that tests the raw
+    # bytes of a packet without decoding it; see net.ip.Filter
+    from net.ip.Filter import Filter
+    if version not in DECODERS:
         raise NotImplementedError("IP version " + str(version) + ' has not been implemented')
+    return Filter(expression, DECODERS[version], version).match
+
+# the packet modules import this one, so they are registered once everything
+# they use from it is defined
+from net.ip.v4.Packet import Packet as _IPv4Packet
+from net.ip.v6.Packet import Packet as _IPv6Packet
+register(4, _IPv4Packet)
+register(6, _IPv6Packet)
+
+from net.icmp.Message import Message as _ICMPMessage
+from net.tcp.Segment import Segment as _TCPSegment
+from net.udp.Datagram import Datagram as _UDPDatagram
+register_protocol(1, _ICMPMessage)
+register_protocol(6, _TCPSegment)
+register_protocol(17, _UDPDatagram)
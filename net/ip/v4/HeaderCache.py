@@ -0,0 +1,70 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Size bounded LRU cache of decoded IPv4 headers for Packet.from_bytes, see
+# Packet.enable_cache(). Headers are keyed on their bytes other than the
+# identification and checksum fields, which change from packet to packet of
+# an otherwise unchanging stream, so those two are decoded on every hit.
+class HeaderCache():
+    def __init__(self, max_size=1024):
+        if max_size < 1:
+            raise ValueError('Invalid cache size: ' + str(max_size))
+        self.max_size = max_size
+
+        # key -> (Codec.to_tuple of the header fields, options), least
+        # recently used first
+        self._entries = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(buf):
+        # the header of the packet in buf without identification and checksum;
+        # a truncated header gives a shorter key than any whole one with the
+        # same ihl, so it never matches an entry
+        header = buf[:((buf[0] & 0xf) * 4)]
+        if not isinstance(header, bytes):
+            header = bytes(header)
+        return header[:4] + header[6:10] + header[12:]
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -15,15 +15,17 @@
 # You should have received a copy of the GNU General Public License
 # along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
 
-import bitstring
-from bitstring import BitStream
 import logging
-import ipaddress
 
-from net.ip.IPPacket import IPPacket
+from net.Structure import Structure
 
 logger = logging.getLogger(__name__)
 class Option(Structure):
+    _FORMAT = (
+        ('type', 'uint:8'),
+    )
+    _SLOTS = ('data',)
+
     CLASS_CONTROL = 0
     # (reserved) = 1
     CLASS_DEBUG_MEASURE = 2
@@ -37,159 +39,127 @@ class Option(Structure):
     NUMBER_RECORD_ROUTE = 7
     NUMBER_STREAM_ID = 8
     NUMBER_STRICT_SOURCE_ROUTING = 9
+    NUMBER_ROUTER_ALERT = 20
 
     # CLASS_DEBUG_MEASURE
     NUMBER_INTERNET_TIMESTAMP = 4
 
+    # whole type octets: copied flag, class and number
+    TYPE_END_OF_OPTION_LIST = 0x00
+    TYPE_NO_OPERATION = 0x01
+    TYPE_SECURITY = 0x82
+    TYPE_LOOSE_SOURCE_ROUTING = 0x83
+    TYPE_RECORD_ROUTE = 0x07
+    TYPE_STREAM_ID = 0x88
+    TYPE_STRICT_SOURCE_ROUTING = 0x89
+    TYPE_INTERNET_TIMESTAMP = 0x44
+    TYPE_ROUTER_ALERT = 0x94
+
+    # type octet -> (name, length); a length of 1 is a single octet option,
+    # None is variable length
+    TYPES = {
+        TYPE_END_OF_OPTION_LIST: ('End of Option List', 1),         # RFC 791
+        TYPE_NO_OPERATION: ('No Operation', 1),                     # RFC 791
+        TYPE_SECURITY: ('Security', 11),                            # RFC 791
+        TYPE_LOOSE_SOURCE_ROUTING: ('Loose Source Routing', None),  # RFC 791
+        TYPE_RECORD_ROUTE: ('Record Route', None),                  # RFC 791
+        TYPE_STREAM_ID: ('Stream ID', 4),                           # RFC 791
+        TYPE_STRICT_SOURCE_ROUTING: ('Strict Source Routing', None),# RFC 791
+        TYPE_INTERNET_TIMESTAMP: ('Internet Timestamp', None),      # RFC 791
+        TYPE_ROUTER_ALERT: ('Router Alert', 4),                     # RFC 2113
+    }
+
+    # dispatch table indexed by type octet: 1 for single octet options, the
+    # required length for fixed length options, 0 for any other type, which
+    # are all type-length-value
+    _LENGTHS = [0] * 256
+    for t, (n, l) in TYPES.items():
+        _LENGTHS[t] = l or 0
+    del t, n, l
+
+    def __init__(self, type=None, data=b''):
+        if type is not None:
+            self.type = type
+            self.data = data
+
+    @property
+    def copied(self):
+        return bool(self.type & 0x80)
+
+    @property
+    def option_class(self):
+        return (self.type >> 5) & 0x03
+
+    @property
+    def number(self):
+        return self.type & 0x1f
+
+    @property
+    def name(self):
+        if self.type in Option.TYPES:
+            return Option.TYPES[self.type][0]
+        return 'Unknown'
+
     @staticmethod
-    def from_bytes(buf):
-        bs = BitStream(bytes=buf)
-        pkt = IPv4Packet()
-
-        pkt.version = bs.read('uint:4')
-        pkt.ihl = bs.read('uint:4')
-        pkt.dscp = bs.read('uint:6')
-        pkt.ecn = bs.read('uint:2')
-        pkt.total_length = bs.read('uint:16')
-        pkt.ident = bs.read('uint:16')
-        pkt.flag_reserved = bs.read('bool')
-        pkt.flag_dont_fragment = bs.read('bool')
-        pkt.flag_more_fragments = bs.read('bool')
-        pkt.fragment_offset = bs.read('uint:13')
-        pkt.time_to_live = bs.read('uint:8')
-        pkt.protocol = bs.read('uint:8')
-        # TODO The checksum field is the 16 bit one's complement of the one's
-        # complement sum of all 16 bit words in the header.  For purposes of
-        # computing the checksum, the value of the checksum field is zero.
-        pkt.header_checksum = bs.read('uint:16')
-        pkt.source = ipaddress.IPv4Address(bs.read('uint:32'))
-        pkt.destination = ipaddress.IPv4Address(bs.read('uint:32'))
-
-        if pkt.ihl == 5:
-            pkt.options = None
-        elif pkt.ihl >= 6 and pkt.ihl <= 15:
-            pkt.options = []
-            while(True):
-                if bs.bytepos >= pkt.ihl * 4:
+    def decode_all(buf):
+        # decodes the options area of a header; the padding after an end of
+        # option list option is dropped
+        return Option.decode_area(buf)[0]
+
+    @staticmethod
+    def decode_area(buf):
+        # decodes the options area of a header into the options and the bytes
+        # of padding after an end of option list option
+        lengths = Option._LENGTHS
+        options = []
+        offset = 0
+        end = len(buf)
+        while offset < end:
+            t = buf[offset]
+            if lengths[t] == 1:
+                options.append(Option(t))
+                offset += 1
+                if t == Option.TYPE_END_OF_OPTION_LIST:
                     break
-                #TODO padding (always ends on 32 bit boundary; implicit end of list)
-                option = {}
-                option['copy'] = bs.read('bool')
-                option['class'] = bs.read('uint:2')
-                option['number'] = bs.read('uint:5')
-
-                if option['class'] == IPv4Packet.CLASS_CONTROL:
-                    if option['number'] == IPv4Packet.NUMBER_END_OF_OPTION_LIST:
-                        # end of options list
-                        # no length or data
-                        break
-                    elif option['number'] == IPv4Packet.NUMBER_NO_OPERATION:
-                        # no operation
-                        # no length or data
-                        pass
-                    elif option['number'] == IPv4Packet.NUMBER_SECURITY:
-                        # Security RFC 791
-                        # 11 octet length
-                        option['length'] = bs.unpack('uint:8')
-                        if option['length'] != 11:
-                            raise RuntimeError('Security IP Option with length other than 11')
-                        option['data'] = bs.unpack('bytes:' + str(option['length'] - 2))
-                    elif option['number'] == IPv4Packet.NUMBER_LOOSE_SOURCE_ROUTING:
-                        # Loose Source Routing
-                        # var octet length
-                        option['length'] = bs.unpack('uint:8')
-                        option['data'] = bs.unpack('bytes:' + str(option['length'] - 2))
-                    elif option['number'] == IPv4Packet.NUMBER_RECORD_ROUTE:
-                        # Record Route
-                        # var octet length
-                        option['length'] = bs.unpack('uint:8')
-                        option['data'] = bs.unpack('bytes:' + str(option['length'] - 2))
-                    elif option['number'] == IPv4Packet.NUMBER_STREAM_ID:
-                        # Stream ID
-                        # 4 octet length
-                        option['length'] = bs.unpack('uint:8')
-                        if option['length'] != 4:
-                            raise RuntimeError('Stream ID IP Option with length other than 4')
-                        option['data'] = bs.unpack('bytes:' + str(option['length'] - 2))
-                    elif option['number'] == IPv4Packet.NUMBER_STRICT_SOURCE_ROUTING:
-                        # Strict Source Routing
-                        # var octet length
-                        option['length'] = bs.unpack('uint:8')
-                        option['data'] = bs.unpack('bytes:' + str(option['length'] - 2))
-                    else:
-                        raise RuntimeError('Unknown IP option: ' \
-                            + 'class: ' + str(option['class'] \
-                            + ', number: ' + str(option['number'])))
-                elif option['class'] == IPv4Packet.CLASS_DEBUG_MEASURE:
-                    if option['number'] == IPv4Packet.NUMBER_INTERNET_TIMESTAMP:
-                        # Internet Timestamp
-                        # var octet length
-                        option['length'] = bs.unpack('uint:8')
-                        option['data'] = bs.unpack('bytes:' + str(option['length'] - 2))
-                    else:
-                        raise RuntimeError('Unknown IP option: ' \
-                            + 'class: ' + str(option['class'] \
-                            + ', number: ' + str(option['number'])))
-                else:
-                    raise RuntimeError('Unknown IP option class: ' + str(option['class']))
-
-        else:
-            raise RuntimeError('Invalid IHL value for packet: ' + str(pkt.ihl))
-
-        pkt.data = buf[(pkt.ihl * 4):]
-
-        return pkt
+                continue
+
+            if offset + 1 >= end:
+                raise RuntimeError('Truncated IP option: ' + str(t))
+            length = buf[offset + 1]
+            if length < 2 or offset + length > end:
+                raise RuntimeError('Invalid length ' + str(length) + ' for IP option: ' + str(t))
+            if lengths[t] and length != lengths[t]:
+                raise RuntimeError(Option.TYPES[t][0] + ' IP Option with length other than ' + str(lengths[t]))
+            options.append(Option(t, bytes(buf[offset + 2:offset + length])))
+            offset += length
+
+        return options, bytes(buf[offset:])
+
+    @staticmethod
+    def encode_all(options, padding=b''):
+        # encodes a list of options followed by padding, padded with zeros to a
+        # 32 bit boundary
+        buf = b''.join([option.to_bytes() for option in options]) + padding
+        return buf + bytes(-len(buf) % 4)
+
+    @classmethod
+    def from_bytes(cls, buf):
+        options = Option.decode_all(buf)
+        if not options:
+            raise RuntimeError('No IP option in buffer')
+        return options[0]
 
     def to_bytes(self):
-        
-        bs = bitstring.pack(\
-            'uint:4, \
-            uint:4, \
-            uint:6, \
-            uint:2, \
-            uint:16, \
-            uint:16, \
-            bool, \
-            bool, \
-            bool, \
-            uint:8, \
-            uint:8, \
-            uint:16, \
-            uint:32, \
-            uint:32', \
-            self.version, \
-            self.ihl, \
-            self.dscp, \
-            self.ecn, \
-            self.total_length, \
-            self.ident, \
-            self.flag_reserved, \
-            self.flag_dont_fragment, \
-            self.flag_more_fragments, \
-            self.fragment_offset, \
-            self.time_to_live, \
-            self.protocol, \
-            self.header_checksum, \
-            int(self.source), \
-            int(self.destination))
-        # TODO ip options
-        return bs.tobytes()
+        if Option._LENGTHS[self.type] == 1:
+            return bytes((self.type,))
+        return bytes((self.type, len(self.data) + 2)) + self.data
+
+    def __eq__(self, other):
+        return isinstance(other, Option) and self.type == other.type and self.data == other.data
+
+    def __repr__(self):
+        return 'Option(' + str(self.type) + (', ' + repr(self.data) if self.data else '') + ')'
 
     def __str__(self):
-        return 'IP Packet Version: ' + str(self.version) \
-            + ', IHL: ' + str(self.ihl) \
-            + ', DSCP: ' + str(self.dscp) \
-            + ', ECN: ' + str(self.ecn) \
-            + ', Total Length: ' + str(self.total_length) \
-            + ', Flags: [' \
-            +   ('RESERVED,' if self.flag_reserved else 'Reserved,') \
-            +   ('Don\'t Fragment,' if self.flag_dont_fragment else 'May Fragment,') \
-            +   ('More Fragments]' if self.flag_more_fragments else 'Last Fragment]') \
-            + ', Identification: ' + str(self.ident) \
-            + ', Fragment Offset: ' + str(self.fragment_offset) \
-            + ', Time To Live: ' + str(self.time_to_live) \
-            + ', Protocol: ' + str(self.protocol) \
-            + ', Header Checksum: ' + self.header_checksum.hex \
-            + ', Source IP Address: ' + self.source \
-            + ', Destination IP Address: ' + self.destination \
-            + (', Options: ' + str(self.options) if self.ihl > 5 else '')
+        return 'IP Option ' + self.name + ' (' + str(self.type) + ')' \
+            + (', Data: ' + self.data.hex() if self.data else '')
@@ -19,11 +19,19 @@ import bitstring
 from bitstring import BitStream
 import logging
 import ipaddress
+import struct
 
-from net.Structure import Structure
+import net.ip
+from net.ip.Packet import Packet as BasePacket, UNDECODED
+from net.ip.v4.HeaderCache import HeaderCache
+from net.ip.v4.Option import Option
 
 logger = logging.getLogger(__name__)
-class Packet(Structure):
+
+# identification and header checksum fields, decoded on HeaderCache hits
+_IDENT_CHECKSUM = struct.Struct('>4xH4xH')
+
+class Packet(BasePacket):
     _FORMAT = (
         ('version', 'uint:4'),
         ('ihl', 'uint:4'),
@@ -41,42 +49,263 @@ class Packet(Structure):
         ('source', 'uint:32'),
         ('destination', 'uint:32'),
     )
+    _SLOTS = ('options', '_options_padding')
+    _ADDRESS = ipaddress.IPv4Address
+
+    # HeaderCache used by from_bytes(), set by enable_cache()
+    _CACHE = None
 
     @classmethod
-    def from_bytes(cls, buf):
-        pkt = super(cls, cls).from_bytes(buf)
-
-        # TODO The checksum field is the 16 bit one's complement of the one's
-        # complement sum of all 16 bit words in the header.  For purposes of
-        # computing the checksum, the value of the checksum field is zero.
-
-        if pkt.ihl == 5:
-            pkt.options = None
-        elif pkt.ihl >= 6 and pkt.ihl <= 15:
-            pkt.options = []
-            # TODO
-        else:
-            raise RuntimeError('Invalid IHL value for packet: ' + str(pkt.ihl))
+    def from_bytes(cls, buf, verify_checksum=False, fields=None):
+        if cls._CACHE is not None and fields is None:
+            return cls._from_bytes_cached(buf, verify_checksum)
+        pkt = super(cls, cls).from_bytes(buf, fields)
+        pkt._decode_payload(buf, verify_checksum)
+        return pkt
+
+    @classmethod
+    def enable_cache(cls, max_size=1024):
+        # makes from_bytes() look decoded headers up in a new HeaderCache of up
+        # to max_size entries, which it returns for its hit, miss and eviction
+        # counts. The cache keeps the options as (type, data) pairs, and every
+        # packet gets a list of Option instances of its own.
+        cls._CACHE = HeaderCache(max_size)
+        return cls._CACHE
+
+    @classmethod
+    def disable_cache(cls):
+        cls._CACHE = None
 
-        pkt.data = buf[(pkt.ihl * 4):]
+    @classmethod
+    def _from_bytes_cached(cls, buf, verify_checksum):
+        cache = cls._CACHE
+        key = HeaderCache.key(buf)
+        entry = cache.get(key)
+        if entry is None:
+            pkt = super(cls, cls).from_bytes(buf)
+            pkt._decode_payload(buf, verify_checksum)
+            options = None
+            if pkt.options is not None:
+                options = tuple((option.type, bytes(option.data)) for option in pkt.options)
+            cache.put(key, (cls._CODEC.to_tuple(pkt), options, pkt._options_padding))
+            return pkt
+
+        values, options, padding = entry
+        pkt = cls()
+        cls._CODEC.set_tuple(pkt, values)
+        pkt.ident, pkt.header_checksum = _IDENT_CHECKSUM.unpack_from(buf)
+        if options is not None:
+            options = [Option(type, data) for type, data in options]
+        pkt.options = options
+        pkt._options_padding = padding
+        if verify_checksum:
+            pkt._verify_checksum(buf)
 
+        size = pkt.ihl * 4
+        pkt._buf = bytes(buf[:size])
+        pkt._offset = 0
+        pkt.data = buf[size:]
+        pkt._payload = UNDECODED
         return pkt
 
-    def _set_field_value(self, name, value):
-        if name == 'source' or name == 'destination':
-            setattr(self, name, ipaddress.IPv4Address(value))
+    @classmethod
+    def from_bytes_into(cls, pkt, buf, verify_checksum=False):
+        # data is a copy of the payload as with from_bytes(); pass a memoryview
+        # as buf to make it a slice instead
+        super(cls, cls).from_bytes_into(pkt, buf)
+        pkt._decode_payload(buf, verify_checksum)
+        return pkt
+
+    def _decode_payload(self, buf, verify_checksum):
+        # decodes what follows the fixed header fields
+        self._decode_options(buf)
+        if verify_checksum:
+            self._verify_checksum(buf)
+
+        # keep only the header as the original encoding so that the payload of
+        # a bytes buffer isn't held twice
+        self._buf = bytes(buf[:(self.ihl * 4)])
+        self.data = buf[(self.ihl * 4):]
+        self._payload = UNDECODED
+
+    @classmethod
+    def view(cls, buf, offset=0, verify_checksum=False):
+        buf = memoryview(buf)
+        pkt = super(cls, cls).view(buf, offset)
+        pkt._decode_options(buf[offset:])
+        if verify_checksum:
+            pkt._verify_checksum(buf[offset:])
+
+        pkt.data = buf[(offset + pkt.ihl * 4):]
+
+        return pkt
+
+    def _decode_options(self, buf):
+        # the padding after an end of option list option is kept so that the
+        # options area is written back as it was
+        if self.ihl == 5:
+            self.options = None
+            self._options_padding = b''
+        elif self.ihl >= 6 and self.ihl <= 15:
+            if len(buf) < self.ihl * 4:
+                raise IndexError('Buffer too short for packet options: ' + str(len(buf)) + ' < ' + str(self.ihl * 4) + ' bytes')
+            self.options, self._options_padding = Option.decode_area(buf[self.__class__._CODEC.size:(self.ihl * 4)])
         else:
-            return super()._set_field_value(name, value)
+            raise RuntimeError('Invalid IHL value for packet: ' + str(self.ihl))
+
+    def _clear(self):
+        super()._clear()
+        self.options = None
+        self._options_padding = b''
+
+    def _first_fragment(self):
+        return self.fragment_offset == 0
 
-    def _get_field_value(self, name):
-        if name == 'source' or name == 'destination':
-            return int(getattr(self, name))
+    def _verify_checksum(self, buf):
+        header = buf[:(self.ihl * 4)]
+        if len(header) < self.ihl * 4 or net.ip.checksum(header) != 0:
+            raise RuntimeError('Invalid header checksum for packet: ' + hex(self.header_checksum))
+
+    def compute_checksum(self):
+        # checksum of the header as it would be encoded now, computed with the
+        # checksum field as zero
+        checksum = self.header_checksum
+        self.header_checksum = 0
+        try:
+            return net.ip.checksum(self._header_bytes())
+        finally:
+            self.header_checksum = checksum
+
+    def verify_checksum(self):
+        return self.header_checksum == self.compute_checksum()
+
+    def update_field(self, name, value):
+        # sets a header field and updates header_checksum incrementally (RFC
+        # 1624) instead of summing the whole header again, e.g. when
+        # decrementing time_to_live while forwarding
+        for field, kind, offset, width in self.__class__._CODEC.fields:
+            if field == name:
+                break
         else:
-            return super()._get_field_value(name)
+            raise AttributeError('No header field named ' + name)
+        if name == 'header_checksum':
+            setattr(self, name, value)
+            return
+
+        old = int(self._get_field_value(name))
+        setattr(self, name, value)
+        new = int(self._get_field_value(name))
+
+        # align the field to the end of the last 16 bit word it touches
+        shift = -(offset + width) % 16
+        bits = (offset + width + shift) - (offset - offset % 16)
+        self.header_checksum = net.ip.checksum_update(self.header_checksum, old << shift, new << shift, bits)
+
+    @classmethod
+    def _header_sums(cls, buffers, offsets=None):
+        # 32 bit sums of the 16 bit words of many headers, the checksum field
+        # of each, and a mask of headers that are truncated or not IPv4. The
+        # fixed 20 bytes are summed for all headers at once; only the rows with
+        # options get a second pass.
+        import numpy
+
+        if offsets is not None:
+            data = numpy.frombuffer(buffers, dtype=numpy.uint8)
+            offsets = numpy.asarray(offsets, dtype=numpy.int64)
+            if len(offsets) and (offsets.min() < 0 or offsets.max() >= len(data)):
+                raise IndexError('Offsets out of range for buffer of ' + str(len(data)) + ' bytes')
+            available = len(data) - offsets
+            short = available < 20
+            rows = data[numpy.where(short, 0, offsets)[:, None] + numpy.arange(20)]
+        else:
+            buffers = [memoryview(b).cast('B') for b in buffers]
+            available = numpy.fromiter((b.nbytes for b in buffers), dtype=numpy.int64, count=len(buffers))
+            short = available < 20
+            rows = numpy.frombuffer(b''.join([bytes(b[:20]).ljust(20, b'\x00') for b in buffers]),
+                dtype=numpy.uint8).reshape(len(buffers), 20)
+
+        words = rows.view('>u2')
+        sums = words.sum(axis=1, dtype=numpy.uint32)
+        lengths = (rows[:, 0] & 0x0f).astype(numpy.int64) * 4
+        invalid = short | ((rows[:, 0] >> 4) != 4) | (lengths < 20) | (lengths > available)
+
+        (options,) = numpy.nonzero((lengths > 20) & ~invalid)
+        if len(options):
+            if offsets is not None:
+                extra = data[offsets[options][:, None] + 20 + numpy.arange(40) % (lengths[options, None] - 20)]
+            else:
+                extra = numpy.frombuffer(b''.join([bytes(buffers[i][20:lengths[i]]).ljust(40, b'\x00') for i in options]),
+                    dtype=numpy.uint8).reshape(len(options), 40)
+            extra = numpy.where(numpy.arange(40) < lengths[options, None] - 20, extra, 0).astype(numpy.uint8)
+            sums[options] += extra.view('>u2').sum(axis=1, dtype=numpy.uint32)
+
+        return sums, words[:, 5], invalid
+
+    @staticmethod
+    def _fold(sums):
+        sums = (sums & 0xffff) + (sums >> 16)
+        return (sums & 0xffff) + (sums >> 16)
+
+    @classmethod
+    def compute_checksums(cls, buffers, offsets=None):
+        # vectorized header checksums for many packets; buffers is either a
+        # sequence of buffers, or one buffer with packets at the given offsets
+        sums, checksums, invalid = cls._header_sums(buffers, offsets)
+        return (0xffff - cls._fold(sums - checksums)).astype('u2')
+
+    @classmethod
+    def verify_checksums(cls, buffers, offsets=None):
+        # vectorized checksum verification; returns a boolean mask of the
+        # headers that are bad, i.e. have a wrong checksum, aren't IPv4 or are
+        # truncated
+        sums, checksums, invalid = cls._header_sums(buffers, offsets)
+        return invalid | (cls._fold(sums) != 0xffff)
+
+    def _options_bytes(self):
+        options = getattr(self, 'options', None)
+        if not options:
+            return b''
+        if options[-1].type == Option.TYPE_END_OF_OPTION_LIST:
+            padded = Option.encode_all(options, getattr(self, '_options_padding', b''))
+            if len(padded) <= 40:
+                return padded
+        return Option.encode_all(options)
+
+    def _header_bytes(self):
+        return super().to_bytes() + self._options_bytes()
+
+    def pack_into(self, buf, offset=0, update_checksum=True):
+        # writes the whole packet into the writable buffer buf at offset and
+        # returns its length. Only the header fields that changed since the
+        # packet was decoded are re-encoded; see Structure.pack_into.
+        options = self._options_bytes()
+        header_length = self.__class__._CODEC.size + len(options)
+        length = header_length + len(self.data)
+        if len(buf) - offset < length:
+            raise IndexError('Buffer too short for packet: ' + str(len(buf) - offset) + ' < ' + str(length) + ' bytes')
+        if header_length > 60:
+            raise ValueError('Options too long for packet: ' + str(len(options)) + ' > 40 bytes')
+        # keep ihl in step with the options actually written, and total_length
+        # with the header growing or shrinking
+        if self.ihl != header_length // 4:
+            self.total_length += header_length - self.ihl * 4
+            self.ihl = header_length // 4
+
+        super().pack_into(buf, offset)
+        view = memoryview(buf)
+        view[(offset + self.__class__._CODEC.size):(offset + header_length)] = options
+        if update_checksum:
+            view[(offset + 10):(offset + 12)] = b'\x00\x00'
+            self.header_checksum = net.ip.checksum(view[offset:(offset + header_length)])
+            view[(offset + 10):(offset + 12)] = self.header_checksum.to_bytes(2, 'big')
+        view[(offset + header_length):(offset + length)] = self.data
+
+        return length
 
-    def to_bytes(self):
-        # # TODO ip options
-        return super().to_bytes() + self.data
+    def to_bytes(self, update_checksum=True):
+        buf = bytearray(self.__class__._CODEC.size + len(self._options_bytes()) + len(self.data))
+        self.pack_into(buf, 0, update_checksum)
+        return bytes(buf)
 
     def __str__(self):
         return 'IP Packet Version: ' + str(self.version) \
@@ -92,7 +321,7 @@ class Packet(Structure):
             + ', Fragment Offset: ' + str(self.fragment_offset) \
             + ', Time To Live: ' + str(self.time_to_live) \
             + ', Protocol: ' + str(self.protocol) \
-            + ', Header Checksum: ' + self.header_checksum.hex \
-            + ', Source IP Address: ' + self.source \
-            + ', Destination IP Address: ' + self.destination \
+            + ', Header Checksum: ' + hex(self.header_checksum) \
+            + ', Source IP Address: ' + str(self.source_address) \
+            + ', Destination IP Address: ' + str(self.destination_address) \
             + (', Options: ' + str(self.options) if self.ihl > 5 else '')
@@ -0,0 +1,192 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+import time
+
+from net.ip.v4.Packet import Packet
+
+logger = logging.getLogger(__name__)
+
+# Partly reassembled datagram. holes is the RFC 815 hole descriptor list of
+# [first, last) byte ranges of data still missing; total is the data length,
+# known once the last fragment arrives.
+class _Datagram():
+    __slots__ = ('header', 'buf', 'holes', 'total', 'last_seen')
+
+    def __init__(self, now):
+        self.header = None
+        self.buf = bytearray()
+        self.holes = [(0, Reassembler.MAX_DATA)]
+        self.total = None
+        self.last_seen = now
+
+class Reassembler():
+    # largest amount of data a datagram can carry after the minimum header
+    MAX_DATA = 65535 - 20
+
+    def __init__(self, max_bytes=4 * 1024 * 1024, max_datagrams=1024, max_holes=64, timeout=30.0):
+        # max_bytes bounds the buffered data of all datagrams together;
+        # datagrams idle for longer than timeout seconds are dropped
+        self.max_bytes = max_bytes
+        self.max_datagrams = max_datagrams
+        self.max_holes = max_holes
+        self.timeout = timeout
+
+        # (source, destination, protocol, ident) -> _Datagram, least recently
+        # used first
+        self._datagrams = collections.OrderedDict()
+        self.bytes = 0
+
+        self.reassembled = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.timed_out = 0
+
+    def __len__(self):
+        return len(self._datagrams)
+
+    def add(self, pkt, now=None):
+        # adds a fragment and returns the reassembled Packet if it completed a
+        # datagram, None otherwise; packets that aren't fragments are returned
+        # as they are
+        more_fragments = pkt.flag_more_fragments
+        start = pkt.fragment_offset * 8
+        if not more_fragments and start == 0:
+            return pkt
+
+        if now is None:
+            now = time.monotonic()
+        self.expire(now)
+
+        # the data ends where total_length says, before any link layer padding
+        length = pkt.total_length - pkt.ihl * 4
+        if length < 0 or length > len(pkt.data):
+            logger.debug('Dropping fragment with invalid total length %d', pkt.total_length)
+            self.dropped += 1
+            return None
+        data = pkt.data[:length]
+        end = start + length
+        if end > Reassembler.MAX_DATA or (more_fragments and length % 8) or end == start:
+            logger.debug('Dropping invalid fragment of %d bytes at %d', length, start)
+            self.dropped += 1
+            return None
+
+        key = (pkt.source, pkt.destination, pkt.protocol, pkt.ident)
+        datagram = self._datagrams.get(key)
+        if datagram is None:
+            if len(self._datagrams) >= self.max_datagrams:
+                self._evict()
+            datagram = _Datagram(now)
+            self._datagrams[key] = datagram
+        else:
+            self._datagrams.move_to_end(key)
+            datagram.last_seen = now
+
+        if more_fragments:
+            invalid = datagram.total is not None and end > datagram.total
+        else:
+            invalid = datagram.total is not None and end != datagram.total or len(datagram.buf) > end
+        if invalid:
+            # disagrees with where an earlier fragment put the end of the data
+            self._drop(key)
+            self.dropped += 1
+            return None
+        if not more_fragments:
+            datagram.total = end
+
+        # grow the buffer in place, to its final size once that is known
+        size = datagram.total if datagram.total is not None else end
+        if size > len(datagram.buf):
+            grow = size - len(datagram.buf)
+            if self.bytes + grow > self.max_bytes:
+                self._make_room(grow)
+                if self.bytes + grow > self.max_bytes:
+                    self._drop(key)
+                    self.dropped += 1
+                    return None
+            datagram.buf.extend(bytes(grow))
+            self.bytes += grow
+        datagram.buf[start:end] = data
+        if start == 0:
+            datagram.header = pkt._header_bytes()
+
+        holes = []
+        for first, last in datagram.holes:
+            if end <= first or start >= last:
+                holes.append((first, last))
+                continue
+            if start > first:
+                holes.append((first, start))
+            if end < last and more_fragments:
+                holes.append((end, last))
+        if datagram.total is not None:
+            # nothing is missing past the end of the data, once that is known
+            total = datagram.total
+            holes = [(first, min(last, total)) for first, last in holes if first < total]
+        if len(holes) > self.max_holes:
+            self._drop(key)
+            self.dropped += 1
+            return None
+        datagram.holes = holes
+
+        if holes:
+            return None
+        self._drop(key)
+        self.reassembled += 1
+        return self._packet(datagram)
+
+    def _packet(self, datagram):
+        pkt = Packet.from_bytes(datagram.header + datagram.buf)
+        pkt.flag_more_fragments = False
+        pkt.fragment_offset = 0
+        pkt.total_length = len(datagram.header) + len(datagram.buf)
+        pkt.header_checksum = pkt.compute_checksum()
+        return pkt
+
+    def expire(self, now=None):
+        # drops datagrams that haven't had a fragment for timeout seconds
+        if now is None:
+            now = time.monotonic()
+        datagrams = self._datagrams
+        while datagrams:
+            key, datagram = next(iter(datagrams.items()))
+            if now - datagram.last_seen < self.timeout:
+                break
+            self._drop(key)
+            self.timed_out += 1
+
+    def _evict(self):
+        key = next(iter(self._datagrams))
+        logger.debug('Evicting datagram %s', key)
+        self._drop(key)
+        self.evicted += 1
+
+    def _make_room(self, size):
+        # evicts least recently used datagrams until size more bytes fit under
+        # max_bytes; the datagram being added to is the most recently used
+        while self.bytes + size > self.max_bytes and len(self._datagrams) > 1:
+            self._evict()
+
+    def _drop(self, key):
+        datagram = self._datagrams.pop(key)
+        self.bytes -= len(datagram.buf)
+
+    def clear(self):
+        self._datagrams.clear()
+        self.bytes = 0
@@ -15,7 +15,148 @@
 # You should have received a copy of the GNU General Public License
 # along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
 
-from net.Structure import Structure
+import logging
+import ipaddress
 
-class Packet(Structure):
-    pass
+from net.ip.Packet import Packet as BasePacket, UNDECODED
+
+logger = logging.getLogger(__name__)
+
+class Packet(BasePacket):
+    _FORMAT = (
+        ('version', 'uint:4'),
+        ('traffic_class', 'uint:8'),
+        ('flow_label', 'uint:20'),
+        ('payload_length', 'uint:16'),
+        ('next_header', 'uint:8'),
+        ('hop_limit', 'uint:8'),
+        ('source', 'uint:128'),
+        ('destination', 'uint:128'),
+    )
+    # protocol and payload_offset are those of the upper layer header found
+    # at the end of the extension header chain
+    _SLOTS = ('extension_headers', 'protocol', 'payload_offset')
+    _ADDRESS = ipaddress.IPv6Address
+
+    # next header value -> (multiplier, addend) giving the length in bytes of
+    # the extension header from its second octet
+    EXTENSION_HEADERS = {
+        0:      (8, 8),     # Hop-by-Hop Options, RFC 8200
+        43:     (8, 8),     # Routing, RFC 8200
+        44:     (0, 8),     # Fragment, RFC 8200
+        51:     (4, 8),     # Authentication Header, RFC 4302
+        60:     (8, 8),     # Destination Options, RFC 8200
+        135:    (8, 8),     # Mobility, RFC 6275
+        139:    (8, 8),     # Host Identity Protocol, RFC 7401
+        140:    (8, 8),     # Shim6, RFC 5533
+    }
+
+    @staticmethod
+    def walk(buf, offset=0):
+        # follows the extension header chain of the packet at offset in buf
+        # without decoding it and returns the upper layer protocol and the
+        # offset of its header from the start of the packet
+        lengths = Packet.EXTENSION_HEADERS
+        end = len(buf)
+        if end - offset < 40:
+            raise IndexError('Buffer too short for IPv6 packet: ' + str(end - offset) + ' < 40 bytes')
+
+        next_header = buf[offset + 6]
+        pos = offset + 40
+        length = lengths.get(next_header)
+        while length is not None:
+            if pos + 8 > end:
+                raise IndexError('Truncated IPv6 extension header: ' + str(next_header))
+            next_header, pos = buf[pos], pos + buf[pos + 1] * length[0] + length[1]
+            length = lengths.get(next_header)
+        if pos > end:
+            raise IndexError('Truncated IPv6 extension header before: ' + str(next_header))
+
+        return next_header, pos - offset
+
+    @classmethod
+    def from_bytes(cls, buf, fields=None):
+        pkt = super(cls, cls).from_bytes(buf, fields)
+        pkt._decode_payload(buf)
+        return pkt
+
+    @classmethod
+    def from_bytes_into(cls, pkt, buf):
+        super(cls, cls).from_bytes_into(pkt, buf)
+        pkt._decode_payload(buf)
+        return pkt
+
+    def _decode_payload(self, buf):
+        self.protocol, self.payload_offset = Packet.walk(buf)
+
+        # keep only the fixed header in _buf so a bytes buffer isn't held twice
+        self._buf = bytes(buf[:40])
+        self.extension_headers = buf[40:self.payload_offset]
+        self.data = buf[self.payload_offset:]
+        self._payload = UNDECODED
+
+    def _clear(self):
+        super()._clear()
+        self.extension_headers = None
+
+    def _first_fragment(self):
+        fragment = self.extension_header(44)
+        return fragment is None or (fragment[2] << 8 | fragment[3]) >> 3 == 0
+
+    @classmethod
+    def view(cls, buf, offset=0):
+        buf = memoryview(buf)
+        pkt = super(cls, cls).view(buf, offset)
+        pkt.protocol, pkt.payload_offset = Packet.walk(buf, offset)
+
+        pkt.extension_headers = buf[(offset + 40):(offset + pkt.payload_offset)]
+        pkt.data = buf[(offset + pkt.payload_offset):]
+
+        return pkt
+
+    def extension_header(self, next_header):
+        # the first extension header of the given type, including its next
+        # header and length octets, or None if the chain doesn't have one
+        lengths = Packet.EXTENSION_HEADERS
+        buf = self.extension_headers
+        t = self.next_header
+        pos = 0
+        while t in lengths and pos < len(buf):
+            length = buf[pos + 1] * lengths[t][0] + lengths[t][1]
+            if t == next_header:
+                return buf[pos:(pos + length)]
+            t = buf[pos]
+            pos += length
+        return None
+
+    def pack_into(self, buf, offset=0):
+        # writes the whole packet into the writable buffer buf at offset and
+        # returns its length
+        extension_headers = getattr(self, 'extension_headers', b'')
+        header_length = self.__class__._CODEC.size + len(extension_headers)
+        length = header_length + len(self.data)
+        if len(buf) - offset < length:
+            raise IndexError('Buffer too short for packet: ' + str(len(buf) - offset) + ' < ' + str(length) + ' bytes')
+
+        super().pack_into(buf, offset)
+        view = memoryview(buf)
+        view[(offset + self.__class__._CODEC.size):(offset + header_length)] = extension_headers
+        view[(offset + header_length):(offset + length)] = self.data
+
+        return length
+
+    def to_bytes(self):
+        buf = bytearray(self.__class__._CODEC.size + len(getattr(self, 'extension_headers', b'')) + len(self.data))
+        self.pack_into(buf, 0)
+        return bytes(buf)
+
+    def __str__(self):
+        return 'IPv6 Packet Version: ' + str(self.version) \
+            + ', Traffic Class: ' + str(self.traffic_class) \
+            + ', Flow Label: ' + str(self.flow_label) \
+            + ', Payload Length: ' + str(self.payload_length) \
+            + ', Next Header: ' + str(self.next_header) \
+            + ', Hop Limit: ' + str(self.hop_limit) \
+            + ', Source IP Address: ' + str(self.source_address) \
+            + ', Destination IP Address: ' + str(self.destination_address) \
+            + ', Protocol: ' + str(self.protocol)
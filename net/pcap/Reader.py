@@ -0,0 +1,383 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import array
+import bisect
+import itertools
+import logging
+import mmap
+import struct
+
+import net.ip
+
+logger = logging.getLogger(__name__)
+
+# Reads pcap and pcapng capture files through a read-only memory map. Records
+# are yielded as memoryview slices of the map, so nothing is copied per record
+# and memory use doesn't depend on the size of the file. Packets decoded from
+# the records (and their data) keep referring to the map; the map is only
+# unmapped by close() once none of them are left. A truncated or corrupt
+# record or block ends the records, as if the capture ended there.
+class Reader():
+    LINKTYPE_NULL = 0
+    LINKTYPE_ETHERNET = 1
+    LINKTYPE_RAW = 101
+    LINKTYPE_LINUX_SLL = 113
+    LINKTYPE_IPV4 = 228
+    LINKTYPE_IPV6 = 229
+    LINKTYPE_LINUX_SLL2 = 276
+    # DLT_RAW as written by some BSDs
+    LINKTYPE_RAW_BSD = (12, 14)
+
+    ETHERTYPE_IPV4 = 0x0800
+    ETHERTYPE_IPV6 = 0x86dd
+    ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+
+    PCAP_MAGIC = 0xa1b2c3d4
+    PCAP_MAGIC_NANOSECOND = 0xa1b23c4d
+    PCAPNG_SECTION_HEADER = 0x0a0d0d0a
+    PCAPNG_BYTE_ORDER_MAGIC = 0x1a2b3c4d
+
+    PCAPNG_INTERFACE_DESCRIPTION = 1
+    PCAPNG_PACKET = 2
+    PCAPNG_SIMPLE_PACKET = 3
+    PCAPNG_ENHANCED_PACKET = 6
+    PCAPNG_OPTION_IF_TSRESOL = 9
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            self._file.close()
+            raise RuntimeError('Not a pcap or pcapng file: ' + str(path))
+        self._buf = memoryview(self._map)
+
+        # frames without an IP packet and IP packets that failed to decode
+        self.skipped = 0
+        self.errors = 0
+
+        # the shortest capture is a pcap file header of 24 bytes
+        if len(self._buf) < 24:
+            self.close()
+            raise RuntimeError('Not a pcap or pcapng file: ' + str(path))
+        (magic,) = struct.unpack_from('<I', self._buf)
+        if magic == Reader.PCAPNG_SECTION_HEADER:
+            self._records = self._pcapng_records
+            self._positions = self._pcapng_positions
+        elif magic in (Reader.PCAP_MAGIC, Reader.PCAP_MAGIC_NANOSECOND):
+            self._records = self._pcap_records
+            self._positions = self._pcap_positions
+            self._order = '<'
+        elif magic in (Reader._swap(Reader.PCAP_MAGIC), Reader._swap(Reader.PCAP_MAGIC_NANOSECOND)):
+            self._records = self._pcap_records
+            self._positions = self._pcap_positions
+            self._order = '>'
+        else:
+            self.close()
+            raise RuntimeError('Not a pcap or pcapng file: ' + str(path))
+
+    @staticmethod
+    def _swap(value):
+        return int.from_bytes(value.to_bytes(4, 'little'), 'big')
+
+    def close(self):
+        self._buf.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # packets still refer to the map; it's unmapped when they're gone
+            logger.debug('Leaving capture mapped while packets refer to it')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        return self.packets()
+
+    def records(self, start=0, stop=None, position=None):
+        # yields (timestamp, link type, frame) for every packet record, or for
+        # those from index start up to stop. position, one returned by split(),
+        # makes reading begin at the record there rather than the first one,
+        # with start and stop counting from it.
+        records = self._records(position)
+        if start or stop is not None:
+            return itertools.islice(records, start, stop)
+        return records
+
+    def split(self, shards):
+        # splits the packet records into up to shards runs of consecutive
+        # records of nearly equal count, in one pass over the file that
+        # doesn't read the packets, and returns (position, count) for each run
+        # to read with records(0, count, position)
+        offsets = array.array('q')
+        states = []
+        for offset, state in self._positions():
+            offsets.append(offset)
+            if not states or states[-1][1] is not state:
+                states.append((len(offsets) - 1, state))
+
+        count = len(offsets)
+        shards = max(1, min(count, shards))
+        if count == 0:
+            return [(None, 0)]
+        indexes = [index for index, state in states]
+        runs = []
+        for i in range(shards):
+            start = count * i // shards
+            stop = count * (i + 1) // shards
+            state = states[bisect.bisect_right(indexes, start) - 1][1]
+            runs.append(((offsets[start], state), stop - start))
+        return runs
+
+    def frames(self, start=0, stop=None, position=None):
+        # yields (timestamp, IP packet bytes) for records that carry IP
+        for timestamp, linktype, frame in self.records(start, stop, position):
+            ip = Reader.strip_link_layer(linktype, frame)
+            if ip is None:
+                self.skipped += 1
+                continue
+            yield timestamp, ip
+
+    def packets(self, lazy=False, start=0, stop=None, position=None):
+        # yields (timestamp, packet) decoded with net.ip.from_bytes, or with
+        # net.ip.view if lazy is True
+        decode = net.ip.view if lazy else net.ip.from_bytes
+        for timestamp, ip in self.frames(start, stop, position):
+            try:
+                pkt = decode(ip)
+            except (RuntimeError, NotImplementedError, IndexError) as e:
+                logger.debug('Skipping undecodable packet: %s', e)
+                self.errors += 1
+                continue
+            yield timestamp, pkt
+
+    @staticmethod
+    def strip_link_layer(linktype, frame):
+        # returns the IP packet inside a frame, or None if it doesn't carry one
+        if linktype == Reader.LINKTYPE_ETHERNET:
+            offset = 12
+            while True:
+                if len(frame) < offset + 2:
+                    return None
+                ethertype = (frame[offset] << 8) | frame[offset + 1]
+                if ethertype in Reader.ETHERTYPE_VLAN:
+                    offset += 4
+                    continue
+                offset += 2
+                break
+        elif linktype == Reader.LINKTYPE_LINUX_SLL:
+            if len(frame) < 16:
+                return None
+            ethertype = (frame[14] << 8) | frame[15]
+            offset = 16
+        elif linktype == Reader.LINKTYPE_LINUX_SLL2:
+            if len(frame) < 20:
+                return None
+            ethertype = (frame[0] << 8) | frame[1]
+            offset = 20
+        elif linktype == Reader.LINKTYPE_NULL:
+            if len(frame) < 4:
+                return None
+            # address family in the byte order of the capturing host
+            family = frame[0] | frame[3]
+            if family == 2:
+                ethertype = Reader.ETHERTYPE_IPV4
+            elif family in (24, 28, 30):
+                ethertype = Reader.ETHERTYPE_IPV6
+            else:
+                return None
+            offset = 4
+        elif linktype in (Reader.LINKTYPE_RAW, Reader.LINKTYPE_IPV4, Reader.LINKTYPE_IPV6) \
+            or linktype in Reader.LINKTYPE_RAW_BSD:
+            return frame if len(frame) > 0 else None
+        else:
+            return None
+
+        if ethertype != Reader.ETHERTYPE_IPV4 and ethertype != Reader.ETHERTYPE_IPV6:
+            return None
+        return frame[offset:]
+
+    # Positions of records are (offset, state) pairs of the file offset of the
+    # record and what else is needed to read from there: None for pcap, and
+    # (byte order, interfaces) for pcapng, where the same state object is
+    # given for the records until a block changes it
+
+    def _pcap_positions(self):
+        buf = self._buf
+        unpack_from = struct.Struct(self._order + '8xI').unpack_from
+        offset = 24
+        end = len(buf)
+        while offset + 16 <= end:
+            (caplen,) = unpack_from(buf, offset)
+            if offset + 16 + caplen > end:
+                break
+            yield offset, None
+            offset += 16 + caplen
+
+    def _pcap_records(self, position=None):
+        buf = self._buf
+        order = self._order
+        (magic, major, minor, zone, sigfigs, snaplen, linktype) = struct.unpack_from(order + 'IHHiIII', buf)
+        resolution = 1e-9 if magic == Reader.PCAP_MAGIC_NANOSECOND else 1e-6
+        linktype &= 0xffff
+        header = struct.Struct(order + 'IIII')
+        unpack_from = header.unpack_from
+
+        offset = 24 if position is None else position[0]
+        end = len(buf)
+        while offset + 16 <= end:
+            (seconds, fraction, caplen, length) = unpack_from(buf, offset)
+            offset += 16
+            if offset + caplen > end:
+                logger.debug('Truncated pcap record at offset %d', offset - 16)
+                break
+            yield seconds + fraction * resolution, linktype, buf[offset:offset + caplen]
+            offset += caplen
+
+    def _pcapng_positions(self):
+        buf = self._buf
+        end = len(buf)
+        offset = 0
+        order = '<'
+        interfaces = []
+        state = (order, ())
+        while offset + 12 <= end:
+            (block_type,) = struct.unpack_from(order + 'I', buf, offset)
+            if block_type == Reader.PCAPNG_SECTION_HEADER:
+                order = self._pcapng_order(buf, offset)
+                if order is None:
+                    break
+                interfaces = []
+                state = (order, ())
+
+            (block_type, length) = struct.unpack_from(order + 'II', buf, offset)
+            if length < 12 or offset + length > end:
+                break
+
+            if block_type in (Reader.PCAPNG_ENHANCED_PACKET, Reader.PCAPNG_SIMPLE_PACKET, Reader.PCAPNG_PACKET):
+                if self._pcapng_corrupt(buf, order, offset, block_type, length, interfaces) is not None:
+                    break
+                yield offset, state
+            elif block_type == Reader.PCAPNG_INTERFACE_DESCRIPTION:
+                interfaces.append(self._pcapng_interface(buf, order, offset, length))
+                state = (order, tuple(interfaces))
+
+            offset += length
+
+    def _pcapng_order(self, buf, offset):
+        # byte order of the section whose header block is at offset, or None
+        # if its byte order magic is bad
+        (magic,) = struct.unpack_from('<I', buf, offset + 8)
+        if magic == Reader.PCAPNG_BYTE_ORDER_MAGIC:
+            return '<'
+        elif magic == Reader._swap(Reader.PCAPNG_BYTE_ORDER_MAGIC):
+            return '>'
+        logger.debug('Bad pcapng byte order magic at offset %d', offset)
+        return None
+
+    def _pcapng_corrupt(self, buf, order, offset, block_type, length, interfaces):
+        # why the packet block at offset can't be read, or None if it can
+        if block_type == Reader.PCAPNG_SIMPLE_PACKET:
+            if length < 16:
+                return 'block too short'
+            interface = 0
+        else:
+            if length < 32:
+                return 'block too short'
+            if block_type == Reader.PCAPNG_ENHANCED_PACKET:
+                (interface, caplen) = struct.unpack_from(order + 'I8xI', buf, offset + 8)
+            else:
+                (interface, caplen) = struct.unpack_from(order + 'H10xI', buf, offset + 8)
+            if caplen > length - 32:
+                return 'captured length past the end of the block'
+        if interface >= len(interfaces):
+            return 'undefined interface ' + str(interface)
+        return None
+
+    def _pcapng_records(self, position=None):
+        buf = self._buf
+        end = len(buf)
+        if position is None:
+            offset = 0
+            order = '<'
+            interfaces = []
+        else:
+            offset, (order, interfaces) = position
+            interfaces = list(interfaces)
+        while offset + 12 <= end:
+            (block_type,) = struct.unpack_from(order + 'I', buf, offset)
+            if block_type == Reader.PCAPNG_SECTION_HEADER:
+                order = self._pcapng_order(buf, offset)
+                if order is None:
+                    break
+                # interface ids are per section
+                interfaces = []
+
+            (block_type, length) = struct.unpack_from(order + 'II', buf, offset)
+            if length < 12 or offset + length > end:
+                logger.debug('Truncated pcapng block at offset %d', offset)
+                break
+
+            if block_type in (Reader.PCAPNG_ENHANCED_PACKET, Reader.PCAPNG_SIMPLE_PACKET, Reader.PCAPNG_PACKET):
+                corrupt = self._pcapng_corrupt(buf, order, offset, block_type, length, interfaces)
+                if corrupt is not None:
+                    logger.debug('Corrupt pcapng block at offset %d: %s', offset, corrupt)
+                    break
+
+            if block_type == Reader.PCAPNG_ENHANCED_PACKET:
+                (interface, high, low, caplen, origlen) = struct.unpack_from(order + 'IIIII', buf, offset + 8)
+                linktype, resolution = interfaces[interface]
+                yield ((high << 32) | low) * resolution, linktype, buf[offset + 28:offset + 28 + caplen]
+            elif block_type == Reader.PCAPNG_SIMPLE_PACKET:
+                (origlen,) = struct.unpack_from(order + 'I', buf, offset + 8)
+                linktype, resolution = interfaces[0]
+                caplen = min(origlen, length - 16)
+                yield None, linktype, buf[offset + 12:offset + 12 + caplen]
+            elif block_type == Reader.PCAPNG_PACKET:
+                (interface, drops, high, low, caplen, origlen) = struct.unpack_from(order + 'HHIIII', buf, offset + 8)
+                linktype, resolution = interfaces[interface]
+                yield ((high << 32) | low) * resolution, linktype, buf[offset + 28:offset + 28 + caplen]
+            elif block_type == Reader.PCAPNG_INTERFACE_DESCRIPTION:
+                interfaces.append(self._pcapng_interface(buf, order, offset, length))
+
+            offset += length
+
+    def _pcapng_interface(self, buf, order, offset, length):
+        (linktype, reserved, snaplen) = struct.unpack_from(order + 'HHI', buf, offset + 8)
+        resolution = 1e-6
+
+        option = offset + 16
+        end = offset + length - 4
+        while option + 4 <= end:
+            (code, option_length) = struct.unpack_from(order + 'HH', buf, option)
+            if code == 0:
+                break
+            if code == Reader.PCAPNG_OPTION_IF_TSRESOL and option_length >= 1:
+                value = buf[option + 4]
+                if value & 0x80:
+                    resolution = 2.0 ** -(value & 0x7f)
+                else:
+                    resolution = 10.0 ** -value
+            option += 4 + ((option_length + 3) & ~3)
+
+        return linktype, resolution
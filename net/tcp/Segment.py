@@ -0,0 +1,104 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from net.Structure import Structure
+
+logger = logging.getLogger(__name__)
+class Segment(Structure):
+    _FORMAT = (
+        ('source_port', 'uint:16'),
+        ('destination_port', 'uint:16'),
+        ('sequence_number', 'uint:32'),
+        ('acknowledgment_number', 'uint:32'),
+        ('data_offset', 'uint:4'),
+        ('reserved', 'pad:3'),
+        ('flag_ns', 'bool'),
+        ('flag_cwr', 'bool'),
+        ('flag_ece', 'bool'),
+        ('flag_urg', 'bool'),
+        ('flag_ack', 'bool'),
+        ('flag_psh', 'bool'),
+        ('flag_rst', 'bool'),
+        ('flag_syn', 'bool'),
+        ('flag_fin', 'bool'),
+        ('window', 'uint:16'),
+        ('checksum', 'uint:16'),
+        ('urgent_pointer', 'uint:16'),
+    )
+    # options are kept as the raw bytes between the fixed header and data
+    _SLOTS = ('options', 'data')
+
+    @classmethod
+    def from_bytes(cls, buf, fields=None):
+        seg = super(cls, cls).from_bytes(buf, fields)
+        header_length = seg._header_length(buf)
+        seg.options = buf[20:header_length]
+        seg.data = buf[header_length:]
+        return seg
+
+    @classmethod
+    def view(cls, buf, offset=0):
+        buf = memoryview(buf)
+        seg = super(cls, cls).view(buf, offset)
+        header_length = seg._header_length(buf[offset:])
+        seg.options = buf[(offset + 20):(offset + header_length)]
+        seg.data = buf[(offset + header_length):]
+        return seg
+
+    def _header_length(self, buf):
+        if self.data_offset < 5:
+            raise RuntimeError('Invalid data offset value for segment: ' + str(self.data_offset))
+        if len(buf) < self.data_offset * 4:
+            raise IndexError('Buffer too short for segment options: ' + str(len(buf)) + ' < ' + str(self.data_offset * 4) + ' bytes')
+        return self.data_offset * 4
+
+    def pack_into(self, buf, offset=0):
+        options = getattr(self, 'options', b'')
+        header_length = self.__class__._CODEC.size + len(options)
+        length = header_length + len(self.data)
+        if len(buf) - offset < length:
+            raise IndexError('Buffer too short for segment: ' + str(len(buf) - offset) + ' < ' + str(length) + ' bytes')
+        if len(options) % 4:
+            raise ValueError('Options of segment must be a multiple of 4 bytes: ' + str(len(options)))
+        if header_length > 60:
+            raise ValueError('Options too long for segment: ' + str(len(options)) + ' > 40 bytes')
+        # keep data_offset in step with the options actually written
+        if self.data_offset != header_length // 4:
+            self.data_offset = header_length // 4
+
+        super().pack_into(buf, offset)
+        view = memoryview(buf)
+        view[(offset + 20):(offset + header_length)] = options
+        view[(offset + header_length):(offset + length)] = self.data
+        return length
+
+    def to_bytes(self):
+        buf = bytearray(self.__class__._CODEC.size + len(getattr(self, 'options', b'')) + len(self.data))
+        self.pack_into(buf)
+        return bytes(buf)
+
+    def __str__(self):
+        return 'TCP Segment Source Port: ' + str(self.source_port) \
+            + ', Destination Port: ' + str(self.destination_port) \
+            + ', Sequence Number: ' + str(self.sequence_number) \
+            + ', Acknowledgment Number: ' + str(self.acknowledgment_number) \
+            + ', Data Offset: ' + str(self.data_offset) \
+            + ', Flags: [' + ','.join(name[5:].upper() for name in self.__class__._CODEC.names
+                if name.startswith('flag_') and getattr(self, name)) + ']' \
+            + ', Window: ' + str(self.window)
@@ -0,0 +1,75 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from net.Structure import Structure
+
+logger = logging.getLogger(__name__)
+class Datagram(Structure):
+    _FORMAT = (
+        ('source_port', 'uint:16'),
+        ('destination_port', 'uint:16'),
+        ('length', 'uint:16'),
+        ('checksum', 'uint:16'),
+    )
+    _SLOTS = ('data',)
+
+    @classmethod
+    def from_bytes(cls, buf, fields=None):
+        dgram = super(cls, cls).from_bytes(buf, fields)
+        dgram.data = buf[8:dgram._data_end(buf)]
+        return dgram
+
+    @classmethod
+    def view(cls, buf, offset=0):
+        buf = memoryview(buf)
+        dgram = super(cls, cls).view(buf, offset)
+        dgram.data = buf[(offset + 8):(offset + dgram._data_end(buf[offset:]))]
+        return dgram
+
+    def _data_end(self, buf):
+        # the data ends where length says, before any link layer padding, or
+        # at the end of buf when that holds less, as for the first fragment of
+        # a datagram or a packet truncated by the capture; a length of 0 is an
+        # IPv6 jumbogram's (RFC 2675), which runs to the end
+        length = self.length
+        if length == 0:
+            return len(buf)
+        if length < 8:
+            raise RuntimeError('Invalid length value for datagram: ' + str(length))
+        return min(length, len(buf))
+
+    def pack_into(self, buf, offset=0):
+        length = self.__class__._CODEC.size + len(self.data)
+        if len(buf) - offset < length:
+            raise IndexError('Buffer too short for datagram: ' + str(len(buf) - offset) + ' < ' + str(length) + ' bytes')
+
+        super().pack_into(buf, offset)
+        memoryview(buf)[(offset + 8):(offset + length)] = self.data
+        return length
+
+    def to_bytes(self):
+        buf = bytearray(self.__class__._CODEC.size + len(self.data))
+        self.pack_into(buf)
+        return bytes(buf)
+
+    def __str__(self):
+        return 'UDP Datagram Source Port: ' + str(self.source_port) \
+            + ', Destination Port: ' + str(self.destination_port) \
+            + ', Length: ' + str(self.length) \
+            + ', Checksum: ' + hex(self.checksum)
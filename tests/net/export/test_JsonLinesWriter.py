@@ -0,0 +1,60 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+import io
+import json
+
+import net.ip
+from net.export.JsonLinesWriter import JsonLinesWriter
+from net.Structure import Structure
+from net.dcerpc.ndr.FormatLabel import FormatLabel
+
+class Header(Structure):
+    _FORMAT = (
+        ('kind', 'uint:4'),
+        ('urgent', 'bool'),
+        ('reserved', 'pad:3'),
+        ('length', 'uint:24'),
+        ('tag', 'bytes:2'),
+    )
+
+HEADER = b'\x45\x00\x01\x94\x4f\x92\x00\x00\x80\x11\x77\xcc\xac\x16\xb2\xea\x0a\x0a\x08\xf0'
+
+def test_write():
+    out = io.StringIO()
+    with JsonLinesWriter(out, chunk_size=2) as writer:
+        writer.write_all([net.ip.from_bytes(HEADER), net.ip.view(HEADER), Header.from_bytes(b'\x5a\x01\x02\x03AB')])
+    lines = out.getvalue().split('\n')
+    assert(lines[-1] == '')
+    assert(writer.count == 3)
+    assert(json.loads(lines[0]) == net.ip.from_bytes(HEADER).to_dict())
+    assert(json.loads(lines[1])['destination'] == 0x0a0a08f0)
+    assert(json.loads(lines[2]) == {'kind': 5, 'urgent': True, 'length': 0x010203, 'tag': '4142'})
+
+def test_path(tmp_path):
+    path = str(tmp_path / 'labels.jsonl')
+    with JsonLinesWriter(path) as writer:
+        writer.write(FormatLabel.from_bytes(b'\x10\x02\x00\x00'))
+    with open(path) as f:
+        assert(f.read() == '{"int_repr":1,"char_repr":0,"float_repr":2}\n')
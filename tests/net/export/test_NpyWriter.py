@@ -0,0 +1,73 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+import net.ip
+from net.ip.v4.Packet import Packet
+from net.ip.v6.Packet import Packet as IPv6Packet
+from net.export.NpyWriter import NpyWriter
+from tests.packets import ipv4
+
+def headers(count):
+    return [ipv4(i & 0xffff, source=0x0a000000 | i, destination='192.168.0.1', data=b'') for i in range(count)]
+
+def test_write(tmp_path):
+    numpy = pytest.importorskip('numpy')
+    path = str(tmp_path / 'packets.npy')
+    bufs = headers(100)
+    with NpyWriter(path, Packet, chunk_size=16) as writer:
+        for buf in bufs[:50]:
+            writer.write(Packet.from_bytes(buf))
+        pkt = Packet.view(bufs[50])
+        pkt.time_to_live = 1
+        writer.write(pkt)
+        writer.write_buffers(bufs[51:])
+    assert(writer.count == 100)
+
+    rows = numpy.load(path)
+    assert(rows.dtype == Packet._CODEC.dtype())
+    assert(len(rows) == 100)
+    assert(list(rows['ident']) == list(range(100)))
+    assert(list(rows['time_to_live']) == [64] * 50 + [1] + [64] * 49)
+    assert((rows == Packet.decode_batch(bufs[:50] + [pkt.to_bytes(update_checksum=False)] + bufs[51:])).all())
+
+def test_empty(tmp_path):
+    numpy = pytest.importorskip('numpy')
+    path = str(tmp_path / 'empty.npy')
+    NpyWriter(path, Packet).close()
+    assert(len(numpy.load(path)) == 0)
+
+def test_wide_fields(tmp_path):
+    numpy = pytest.importorskip('numpy')
+    import ipaddress
+    path = str(tmp_path / 'ipv6.npy')
+    buf = b'\x60\x00\x00\x00\x00\x00\x3b\x40' + ipaddress.IPv6Address('2001:db8::1').packed \
+        + ipaddress.IPv6Address('2001:db8::2').packed
+    with NpyWriter(path, IPv6Packet) as writer:
+        writer.write(IPv6Packet.from_bytes(buf))
+        writer.write_array(IPv6Packet.decode_batch([buf]))
+        with pytest.raises(ValueError):
+            writer.write_array(Packet.decode_batch(headers(1)))
+    rows = numpy.load(path)
+    assert(len(rows) == 2)
+    assert(bytes(rows['destination'][1]) == ipaddress.IPv6Address('2001:db8::2').packed)
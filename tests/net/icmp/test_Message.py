@@ -0,0 +1,44 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+from net.icmp.Message import Message
+
+# echo request, identifier 1, sequence 2
+TEST1 = b'\x08\x00\xf7\xfc\x00\x01\x00\x02ping'
+
+def test_from_bytes():
+    msg = Message.from_bytes(TEST1)
+    assert(msg.type == Message.TYPE_ECHO_REQUEST)
+    assert(msg.code == 0)
+    assert(msg.checksum == 0xf7fc)
+    assert(msg.rest_of_header == b'\x00\x01\x00\x02')
+    assert(msg.data == b'ping')
+    assert(msg.to_bytes() == TEST1)
+
+def test_view():
+    msg = Message.view(TEST1)
+    assert(msg.type == Message.TYPE_ECHO_REQUEST)
+    assert(msg.data == b'ping')
+    msg.type = Message.TYPE_ECHO_REPLY
+    assert(msg.to_bytes() == b'\x00' + TEST1[1:])
@@ -0,0 +1,67 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import ipaddress
+import random
+
+import net.ip
+from net.ip.Classifier import Classifier
+
+BLOCKS = [value for name, value in vars(net.ip).items() if name.startswith('IPV4_BLOCK_')]
+
+def slow_classify(address):
+    return tuple(block for block in BLOCKS if ipaddress.IPv4Address(address) in ipaddress.ip_network(block))
+
+def test_classify():
+    assert(net.ip.classify(ipaddress.IPv4Address('10.1.2.3')) == (net.ip.IPV4_BLOCK_PRIVATE_CLASS_A,))
+    assert(net.ip.classify(0x7f000001) == (net.ip.IPV4_BLOCK_LOOPBACK,))
+    assert(net.ip.classify(ipaddress.IPv4Address('8.8.8.8')) == ())
+    assert(net.ip.classify(0) == (net.ip.IPV4_BLOCK_CURRENT,))
+    assert(set(net.ip.classify(0xffffffff)) == set([net.ip.IPV4_BLOCK_RESERVED, net.ip.IPV4_BLOCK_BROADCAST]))
+
+def test_boundaries():
+    c = Classifier.default()
+    for block in BLOCKS:
+        network = ipaddress.ip_network(block)
+        for address in (int(network.network_address) - 1, int(network.network_address),
+                int(network.broadcast_address), int(network.broadcast_address) + 1):
+            if 0 <= address <= 0xffffffff:
+                assert(c.classify(address) == slow_classify(address))
+
+def test_overlap():
+    c = Classifier(['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24'])
+    assert(c.classify(0x0a010203) == ('10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24'))
+    assert(c.classify(0x0a010303) == ('10.0.0.0/8', '10.1.0.0/16'))
+    assert(c.classify(0x0a020303) == ('10.0.0.0/8',))
+    assert(c.classify(0x0b000000) == ())
+
+def test_classify_batch():
+    numpy = pytest.importorskip('numpy')
+    c = Classifier.default()
+    random.seed(0)
+    addresses = [random.getrandbits(32) for i in range(1000)] + [0, 0x0a000001, 0xc0a80101, 0xffffffff]
+    codes = c.classify_batch(numpy.array(addresses, dtype=numpy.uint32))
+    assert([c.labels[code] for code in codes] == [c.classify(address) for address in addresses])
+
+    mask = c.contains_batch(addresses, net.ip.IPV4_BLOCK_PRIVATE_CLASS_A)
+    assert(list(mask) == [net.ip.IPV4_BLOCK_PRIVATE_CLASS_A in c.classify(address) for address in addresses])
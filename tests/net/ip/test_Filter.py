@@ -0,0 +1,92 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import ipaddress
+import random
+
+import net.ip
+from tests.packets import ipv4
+
+DATA = b'\x04\xd2\x00\x35\x00\x0c\x00\x00abcd'
+UDP = ipv4(protocol=17, source='192.168.1.1', destination='10.1.2.3', data=DATA, ttl=3)
+TCP = ipv4(protocol=6, source='192.168.1.1', destination='8.8.8.8', data=DATA, flags=0x4000)
+
+def test_compile_filter():
+    match = net.ip.compile_filter('protocol == 17 and destination in 10.0.0.0/8 and ttl < 5')
+    assert(match(UDP))
+    assert(not match(TCP))
+    assert(not match(ipv4(protocol=17, source='192.168.1.1', destination='10.1.2.3', data=DATA, ttl=5)))
+    assert(not match(ipv4(protocol=17, source='192.168.1.1', destination='11.1.2.3', data=DATA, ttl=3)))
+
+def test_offset():
+    match = net.ip.compile_filter('dst == 10.1.2.3')
+    buf = bytearray(b'\x00' * 3 + UDP)
+    assert(match(buf, 3))
+    assert(match(memoryview(buf), 3))
+    assert(not match(buf, 0))
+
+def test_operators():
+    for expression, udp, tcp in (
+            ('proto == 6 or proto == 17', True, True),
+            ('not protocol == 6', True, False),
+            ('protocol != 6 and (ttl >= 64 or ttl <= 3)', True, False),
+            ('source in 192.168.0.0/16 and destination not in 10.0.0.0/8', False, True),
+            ('flag_dont_fragment', False, True),
+            ('not flag_dont_fragment and not flag_more_fragments', True, False),
+            ('flag_dont_fragment == true', False, True),
+            ('ttl > 0x10', False, True),
+            ('src == 192.168.1.1 and id == 1', True, True),
+            ('total_length == 32 and ihl == 5 and version == 4', True, True)):
+        match = net.ip.compile_filter(expression)
+        assert(match(UDP) == udp)
+        assert(match(TCP) == tcp)
+
+def test_rejects_others():
+    match = net.ip.compile_filter('protocol == 17')
+    assert(not match(UDP[:19]))
+    assert(not match(b''))
+    assert(not match(b'\x65' + UDP[1:]))
+
+def test_ipv6():
+    buf = b'\x60\x00\x00\x00\x00\x0c\x11\x40' + ipaddress.IPv6Address('2001:db8::1').packed \
+        + ipaddress.IPv6Address('2001:db8::2').packed + UDP[20:]
+    match = net.ip.compile_filter('next_header == 17 and destination in 2001:db8::/32 and hop_limit > 1', version=6)
+    assert(match(buf))
+    assert(not match(UDP))
+    assert(not net.ip.compile_filter('src == 2001:db8::2', version=6)(buf))
+
+def test_matches_decode():
+    random.seed(0)
+    match = net.ip.compile_filter('(protocol == 17 or protocol == 6) and source in 10.0.0.0/8 and ttl < 128')
+    network = ipaddress.ip_network('10.0.0.0/8')
+    for i in range(200):
+        buf = ipv4(protocol=random.choice([1, 6, 17]), source=random.choice(['10.0.0.1', '10.200.3.4', '11.0.0.1']),
+            destination='1.2.3.4', data=DATA, ttl=random.randrange(256))
+        pkt = net.ip.from_bytes(buf)
+        assert(match(buf) == (pkt.protocol in (6, 17) and pkt.source_address in network and pkt.time_to_live < 128))
+
+def test_invalid():
+    for expression in ('protocol ==', 'protocl == 17', 'protocol == 17 and', '(protocol == 17',
+            'protocol == 17)', 'destination in 10.0.0.0/33', 'ttl < five', 'protocol $ 17', 'ttl not 5'):
+        with pytest.raises(ValueError):
+            net.ip.compile_filter(expression)
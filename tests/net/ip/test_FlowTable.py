@@ -0,0 +1,97 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import ipaddress
+
+import net.ip
+from net.ip.FlowTable import FlowTable
+from net.ip.Flow import Flow
+from tests.packets import ipv4
+
+def ipv6(source, destination, protocol, data):
+    return b'\x60\x00\x00\x00' + len(data).to_bytes(2, 'big') + bytes((protocol,)) + b'\x40' \
+        + ipaddress.IPv6Address(source).packed + ipaddress.IPv6Address(destination).packed + data
+
+UDP = b'\x04\xd2\x00\x35\x00\x0c\x00\x00abcd'
+
+def test_add():
+    table = FlowTable()
+    a = net.ip.from_bytes(ipv4(data=UDP))
+    b = net.ip.from_bytes(ipv4(protocol=1, data=b'\x08\x00\x00\x00'))
+    flow = table.add(a, now=1)
+    assert(table.add(a, now=2) is flow)
+    table.add(b, now=3)
+    assert(len(table) == 2)
+    assert(flow.key == (0x0a000001, 0x0a000002, 17, 1234, 53))
+    assert(flow.packets == 2)
+    assert(flow.bytes == 64)
+    assert(flow.first_seen == 1)
+    assert(flow.last_seen == 2)
+    assert(table[(b.source, b.destination, 1, None, None)].packets == 1)
+
+def test_fragment():
+    table = FlowTable()
+    table.add(net.ip.from_bytes(ipv4(data=UDP, flags=1)), now=0)
+    assert((0x0a000001, 0x0a000002, 17, None, None) in table)
+
+def test_ipv6():
+    table = FlowTable()
+    pkt = net.ip.view(ipv6('2001:db8::1', '2001:db8::2', 17, UDP))
+    table.add(pkt, now=0)
+    flow = table.add(pkt, now=0)
+    assert(flow.key == (0x20010db8000000000000000000000001, 0x20010db8000000000000000000000002, 17, 1234, 53))
+    assert(flow.bytes == 104)
+
+def test_expire():
+    table = FlowTable(timeout=10)
+    a = net.ip.from_bytes(ipv4(data=UDP))
+    b = net.ip.from_bytes(ipv4(source='10.0.0.3', data=UDP))
+    table.add(a, now=0)
+    table.add(b, now=5)
+    table.add(a, now=8)
+    assert(table.expire(now=12) == [])
+    expired = table.expire(now=15)
+    assert([flow.source for flow in expired] == [b.source])
+    assert(len(table) == 1)
+
+def test_max_flows():
+    table = FlowTable(max_flows=2)
+    for i in range(1, 4):
+        table.add(net.ip.from_bytes(ipv4(source='10.0.0.' + str(i), destination='10.0.0.9', data=UDP)), now=i)
+    assert(len(table) == 2)
+    assert(table.expired[0].source == 0x0a000001)
+
+def test_export():
+    table = FlowTable(timeout=10)
+    a = net.ip.from_bytes(ipv4(data=UDP))
+    b = net.ip.from_bytes(ipv4(protocol=6, source='10.0.0.3', data=UDP))
+    table.add(a, now=0)
+    table.add(b, now=20)
+    table.expire(now=20)
+    rows = table.export(active=False)
+    assert(rows == [(a.source, a.destination, 17, 1234, 53, 1, 32, 0, 0)])
+    assert(len(table) == 1)
+    rows = table.export()
+    assert(rows == [(b.source, b.destination, 6, 1234, 53, 1, 32, 20, 20)])
+    assert(len(table) == 0)
+    assert(dict(zip(Flow.FIELDS, rows[0]))['protocol'] == 6)
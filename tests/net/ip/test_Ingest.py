@@ -0,0 +1,98 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import asyncio
+
+from net.ip.Ingest import Ingest
+from tests.packets import ipv4
+
+BUFFERS = [ipv4(i) for i in range(20)]
+
+def test_datagram_endpoint():
+    async def main():
+        loop = asyncio.get_running_loop()
+        ingest = Ingest(batch_size=8)
+        transport, protocol = await loop.create_datagram_endpoint(lambda: ingest, local_addr=('127.0.0.1', 0))
+        sender, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=transport.get_extra_info('sockname'))
+
+        idents = []
+        async def consume():
+            async for pkt in ingest.packets():
+                idents.append(pkt.ident)
+                if len(idents) == 20:
+                    break
+
+        consumer = asyncio.ensure_future(consume())
+        for buf in BUFFERS[:10] + [b'\x70'] + BUFFERS[10:]:
+            sender.sendto(buf)
+        await asyncio.wait_for(consumer, 5)
+        sender.close()
+        transport.close()
+
+        assert(sorted(idents) == list(range(20)))
+        assert(ingest.received == 21)
+        assert(ingest.errors == 1)
+        assert(ingest.dropped == 0)
+
+    asyncio.run(main())
+
+def test_drop():
+    async def main():
+        ingest = Ingest(queue_size=2, batch_size=5, lazy=True)
+        for buf in BUFFERS + [b'\x70']:
+            ingest.datagram_received(buf, None)
+        await asyncio.sleep(0)
+        # dropped datagrams aren't decoded
+        assert(ingest.dropped == 11)
+        assert(ingest.errors == 0)
+        ingest.close()
+        ingest.close()
+        batches = [batch async for batch in ingest.batches()]
+        assert([[pkt.ident for pkt in batch] for batch in batches] == [[0, 1, 2, 3, 4], [5, 6, 7, 8, 9]])
+        await asyncio.sleep(0)
+        assert(ingest.queue.empty())
+        assert(ingest.dropped == 11)
+
+    asyncio.run(main())
+
+def test_feed_from():
+    async def source():
+        for buf in BUFFERS:
+            yield buf
+
+    async def main():
+        ingest = Ingest(queue_size=1, batch_size=3)
+        idents = []
+        async def consume():
+            async for pkt in ingest.packets():
+                idents.append(pkt.ident)
+
+        consumer = asyncio.ensure_future(consume())
+        await ingest.feed_from(source())
+        ingest.close()
+        await consumer
+
+        assert(idents == list(range(20)))
+        assert(ingest.dropped == 0)
+
+    asyncio.run(main())
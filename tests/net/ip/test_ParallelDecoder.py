@@ -0,0 +1,82 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import collections
+import struct
+from multiprocessing import shared_memory
+
+from net.ip.ParallelDecoder import ParallelDecoder
+from tests.packets import ipv4
+
+def write_pcap(path, frames):
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 101))
+        for i, frame in enumerate(frames):
+            f.write(struct.pack('<IIII', 1000 + i, 0, len(frame), len(frame)))
+            f.write(frame)
+
+def idents(packets):
+    return [(key, pkt.ident) for key, pkt in packets]
+
+def count_protocols(packets):
+    return collections.Counter(pkt.protocol for key, pkt in packets)
+
+BUFFERS = [ipv4(i, 6 if i % 3 == 0 else 17) for i in range(100)]
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_buffers(processes):
+    decoder = ParallelDecoder(processes)
+    results = decoder.map(idents, BUFFERS)
+    assert(len(results) == min(100, processes * 4))
+    assert([pair for result in results for pair in result] == [(i, i) for i in range(100)])
+    counts = decoder.reduce(count_protocols, lambda a, b: a + b, BUFFERS)
+    assert(counts == {6: 34, 17: 66})
+
+def test_file(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, BUFFERS[:50] + [b'\x00'] + BUFFERS[50:])
+    decoder = ParallelDecoder(2, lazy=False)
+    results = decoder.map(idents, path)
+    assert([pair for result in results for pair in result] == [(1000 + i + (i >= 50), i) for i in range(100)])
+    assert(decoder.errors == 1)
+
+def test_shared_memory():
+    block = shared_memory.SharedMemory(create=True, size=24 * 10)
+    try:
+        for i in range(10):
+            block.buf[i * 24:(i + 1) * 24] = ipv4(i)
+        offsets = [i * 24 for i in range(0, 10, 2)]
+        decoder = ParallelDecoder(2)
+        results = decoder.map(idents, block, offsets, [24] * 5)
+        assert([pair for result in results for pair in result] == [(i, i * 2) for i in range(5)])
+        with pytest.raises(ValueError):
+            decoder.map(idents, block, offsets)
+    finally:
+        block.close()
+        block.unlink()
+
+def test_errors():
+    decoder = ParallelDecoder(1)
+    results = decoder.map(idents, [BUFFERS[0], b'\x45\x00', b'\x75' + BUFFERS[1][1:], BUFFERS[2]])
+    assert([pair for result in results for pair in result] == [(0, 0), (3, 2)])
+    assert(decoder.errors == 2)
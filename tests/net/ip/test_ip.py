@@ -0,0 +1,81 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+import net.ip
+from net.Structure import Structure
+from net.ip.v4.Packet import Packet as IPv4Packet
+from net.ip.v6.Packet import Packet as IPv6Packet
+
+class Experiment(Structure):
+    _FORMAT = (
+        ('kind', 'uint:8'),
+        ('value', 'uint:24'),
+    )
+
+def test_builtin():
+    assert(net.ip.DECODERS[4] is IPv4Packet)
+    assert(net.ip.DECODERS[6] is IPv6Packet)
+    with pytest.raises(NotImplementedError):
+        net.ip.from_bytes(b'\x55' + bytes(19))
+    with pytest.raises(NotImplementedError):
+        net.ip.view(b'\x55' + bytes(19))
+
+def test_register():
+    class Version5(Experiment):
+        pass
+    try:
+        net.ip.register(5, Version5)
+        obj = net.ip.from_bytes(b'\x55\x00\x00\x01')
+        assert(isinstance(obj, Version5))
+        assert(obj.value == 1)
+        assert(net.ip.view(b'\x00\x55\x00\x00\x02', 1).value == 2)
+    finally:
+        assert(net.ip.unregister(5) is Version5)
+    assert(5 not in net.ip.DECODERS)
+    with pytest.raises(NotImplementedError):
+        net.ip.from_bytes(b'\x55\x00\x00\x01')
+    with pytest.raises(NotImplementedError):
+        net.ip.view(b'\x55\x00\x00\x01')
+    with pytest.raises(ValueError):
+        net.ip.unregister(5)
+    with pytest.raises(ValueError):
+        net.ip.register(16, Version5)
+
+def test_register_protocol():
+    assert(net.ip.decode_payload(253, b'\x01\x00\x00\x02') is None)
+    try:
+        net.ip.register_protocol(253, Experiment)
+        assert(net.ip.PROTOCOL_DECODERS[253] is Experiment)
+        obj = net.ip.decode_payload(253, b'\xff\x01\x00\x00\x02', 1)
+        assert(obj.kind == 1)
+        assert(obj.value == 2)
+        assert(net.ip.decode_payload(253, b'\xff\x01\x00\x00\x03', 1, lazy=True).value == 3)
+    finally:
+        assert(net.ip.unregister_protocol(253) is Experiment)
+    assert(net.ip.decode_payload(253, b'\x01\x00\x00\x02') is None)
+    assert(net.ip.decode_payload(253, b'\x01\x00\x00\x02', lazy=True) is None)
+    with pytest.raises(ValueError):
+        net.ip.unregister_protocol(253)
+    with pytest.raises(ValueError):
+        net.ip.register_protocol(256, Experiment)
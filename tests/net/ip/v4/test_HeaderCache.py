@@ -0,0 +1,53 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+from net.ip.v4.HeaderCache import HeaderCache
+
+HEADER = b'\x46\x00\x00\x18\x12\x34\x00\x00\x40\x11\xab\xcd\x0a\x00\x00\x01\x0a\x00\x00\x02\x01\x01\x01\x00'
+
+def test_key():
+    key = HeaderCache.key(HEADER + b'data')
+    assert(key == HEADER[:4] + HEADER[6:10] + HEADER[12:])
+    assert(HeaderCache.key(memoryview(HEADER)) == key)
+    assert(HeaderCache.key(bytearray(HEADER)) == key)
+    assert(HeaderCache.key(HEADER[:4] + b'\x00\x00' + HEADER[6:10] + b'\x00\x00' + HEADER[12:]) == key)
+    assert(len(HeaderCache.key(HEADER[:20])) < len(key))
+
+def test_lru():
+    cache = HeaderCache(2)
+    assert(cache.get(b'a') is None)
+    cache.put(b'a', 1)
+    cache.put(b'b', 2)
+    assert(cache.get(b'a') == 1)
+    cache.put(b'c', 3)
+    assert(cache.get(b'b') is None)
+    assert(cache.get(b'c') == 3)
+    assert(len(cache) == 2)
+    assert((cache.hits, cache.misses, cache.evictions) == (2, 2, 1))
+    cache.clear()
+    assert(len(cache) == 0)
+
+def test_size():
+    with pytest.raises(ValueError):
+        HeaderCache(0)
@@ -0,0 +1,71 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+from net.ip.v4.Option import Option
+
+# record route with room for 2 addresses, a no-op, then end of list & padding
+OPTIONS = b'\x07\x0b\x04\x0a\x00\x00\x01\x00\x00\x00\x00\x01\x00\x00\x00\x00'
+
+def test_decode_all():
+    options = Option.decode_all(OPTIONS)
+    assert(len(options) == 3)
+    assert(options[0].type == Option.TYPE_RECORD_ROUTE)
+    assert(options[0].name == 'Record Route')
+    assert(not options[0].copied)
+    assert(options[0].option_class == Option.CLASS_CONTROL)
+    assert(options[0].number == Option.NUMBER_RECORD_ROUTE)
+    assert(options[0].data == b'\x04\x0a\x00\x00\x01\x00\x00\x00\x00')
+    assert(options[1].type == Option.TYPE_NO_OPERATION)
+    assert(options[2].type == Option.TYPE_END_OF_OPTION_LIST)
+
+def test_encode_all():
+    assert(Option.encode_all(Option.decode_all(OPTIONS)) == OPTIONS)
+    assert(Option.encode_all([Option(Option.TYPE_NO_OPERATION)]) == b'\x01\x00\x00\x00')
+
+def test_from_bytes():
+    option = Option.from_bytes(b'\x94\x04\x00\x00')
+    assert(option == Option(Option.TYPE_ROUTER_ALERT, b'\x00\x00'))
+    assert(option.copied)
+    assert(option.to_bytes() == b'\x94\x04\x00\x00')
+
+def test_unknown():
+    option = Option.from_bytes(b'\x9e\x03\xaa')
+    assert(option.name == 'Unknown')
+    assert(option.data == b'\xaa')
+    assert(option.to_bytes() == b'\x9e\x03\xaa')
+
+def test_slots():
+    option = Option(Option.TYPE_NO_OPERATION)
+    with pytest.raises(AttributeError):
+        option.foo = 1
+
+def test_invalid():
+    with pytest.raises(RuntimeError):
+        Option.decode_all(b'\x07')
+    with pytest.raises(RuntimeError):
+        Option.decode_all(b'\x07\x01\x00\x00')
+    with pytest.raises(RuntimeError):
+        Option.decode_all(b'\x07\x08\x04\x00')
+    with pytest.raises(RuntimeError):
+        Option.decode_all(b'\x94\x05\x00\x00\x00')
@@ -67,9 +67,310 @@ def test_from_bytes():
     assert(pkt.fragment_offset == 0)
     assert(pkt.time_to_live == 128)
     assert(pkt.header_checksum == 0x77cc)
-    assert(pkt.source == ipaddress.IPv4Address('172.22.178.234'))
-    assert(pkt.destination == ipaddress.IPv4Address('10.10.8.240'))
+    assert(pkt.source == 0xac16b2ea)
+    assert(pkt.destination == 0x0a0a08f0)
+    assert(pkt.source_address == ipaddress.IPv4Address('172.22.178.234'))
+    assert(pkt.destination_address == ipaddress.IPv4Address('10.10.8.240'))
 
 def test_to_bytes():
     pkt = net.ip.from_bytes(TEST1)
     assert(pkt.to_bytes() == TEST1)
+
+def test_view():
+    buf = bytearray(b'\x00\x00' + TEST1)
+    pkt = net.ip.view(buf, 2)
+    assert(isinstance(pkt, net.ip.v4.Packet.Packet))
+    assert(pkt.protocol == 17)
+    buf[11] = 6
+    assert(pkt.protocol == 17)
+    assert(pkt.destination_address == ipaddress.IPv4Address('10.10.8.240'))
+    assert(isinstance(pkt.data, memoryview))
+    assert(pkt.data.obj is buf)
+    assert(pkt.data == TEST1[20:])
+    buf[11] = 17
+    assert(pkt.to_bytes() == TEST1)
+
+def test_view_short():
+    with pytest.raises(IndexError):
+        net.ip.view(TEST1[:19])
+
+def test_decode_batch():
+    numpy = pytest.importorskip('numpy')
+    batch = net.ip.v4.Packet.Packet.decode_batch([TEST1, TEST1[:20], bytearray(TEST1)])
+    assert(len(batch) == 3)
+    assert(list(batch['version']) == [4, 4, 4])
+    assert(list(batch['ihl']) == [5, 5, 5])
+    assert(batch['total_length'][0] == 404)
+    assert(batch['ident'][1] == 0x4f92)
+    assert(not batch['flag_dont_fragment'][2])
+    assert(batch['time_to_live'][0] == 128)
+    assert(batch['protocol'][0] == 17)
+    assert(batch['header_checksum'][0] == 0x77cc)
+    assert(batch['source'][0] == int(ipaddress.IPv4Address('172.22.178.234')))
+    assert(batch['destination'][2] == int(ipaddress.IPv4Address('10.10.8.240')))
+
+def slow_checksum(buf):
+    if len(buf) % 2:
+        buf += b'\x00'
+    s = 0
+    for i in range(0, len(buf), 2):
+        s += (buf[i] << 8) | buf[i + 1]
+        s = (s & 0xffff) + (s >> 16)
+    return ~s & 0xffff
+
+def test_checksum():
+    assert(net.ip.checksum(TEST1[:20]) == 0)
+    header = TEST1[:10] + b'\x00\x00' + TEST1[12:20]
+    assert(net.ip.checksum(header) == 0x77cc)
+    for buf in (b'', b'\x00\x00', b'\xff\xff', b'\x01', b'\xff\xfe\x00\x01', TEST1, TEST1[:-1]):
+        assert(net.ip.checksum(buf) == slow_checksum(buf))
+
+def test_verify_checksum():
+    pkt = net.ip.v4.Packet.Packet.from_bytes(TEST1, verify_checksum=True)
+    assert(pkt.verify_checksum())
+    bad = TEST1[:8] + b'\x7f' + TEST1[9:]
+    with pytest.raises(RuntimeError):
+        net.ip.v4.Packet.Packet.from_bytes(bad, verify_checksum=True)
+    with pytest.raises(RuntimeError):
+        net.ip.v4.Packet.Packet.view(bad, verify_checksum=True)
+    assert(not net.ip.v4.Packet.Packet.from_bytes(bad).verify_checksum())
+
+def test_to_bytes_updates_checksum():
+    pkt = net.ip.from_bytes(TEST1)
+    pkt.time_to_live = 64
+    buf = pkt.to_bytes()
+    assert(net.ip.checksum(buf[:20]) == 0)
+    assert(pkt.header_checksum == int.from_bytes(buf[10:12], 'big'))
+    pkt.header_checksum = 0x1234
+    assert(pkt.to_bytes(update_checksum=False)[10:12] == b'\x12\x34')
+
+def test_update_field():
+    pkt = net.ip.from_bytes(TEST1)
+    for name, value in (
+            ('time_to_live', 127),
+            ('source', 0xc0a80101),
+            ('destination', 0xffff0000),
+            ('flag_dont_fragment', True),
+            ('fragment_offset', 0x1fff),
+            ('dscp', 0x2e),
+            ('ident', 0)):
+        pkt.update_field(name, value)
+        assert(getattr(pkt, name) == value)
+        assert(pkt.verify_checksum())
+
+def test_verify_checksums():
+    numpy = pytest.importorskip('numpy')
+    Packet = net.ip.v4.Packet.Packet
+    bad_checksum = TEST1[:8] + b'\x7f' + TEST1[9:]
+    not_ipv4 = b'\x65' + TEST1[1:]
+    with_options = b'\x46' + TEST1[1:10] + b'\x00\x00' + TEST1[12:20] + b'\x01\x01\x01\x00' + TEST1[20:]
+    with_options = with_options[:10] + net.ip.checksum(with_options[:24]).to_bytes(2, 'big') + with_options[12:]
+    bufs = [TEST1, bad_checksum, not_ipv4, TEST1[:19], with_options, with_options[:23]]
+    assert(list(Packet.verify_checksums(bufs)) == [False, True, True, True, False, True])
+
+    buf = b''.join(bufs[:3] + bufs[4:5])
+    offsets = [0, len(TEST1), 2 * len(TEST1), 3 * len(TEST1)]
+    assert(list(Packet.verify_checksums(buf, offsets)) == [False, True, True, False])
+    assert(list(Packet.verify_checksums(buf[:-10], offsets[-1:])) == [False])
+    assert(list(Packet.verify_checksums(buf[:offsets[-1] + 22], offsets[-1:])) == [True])
+
+    assert(list(Packet.compute_checksums([TEST1, bad_checksum, with_options])) \
+        == [0x77cc, 0x77cc + 0x0100, int.from_bytes(with_options[10:12], 'big')])
+
+def test_pack_into():
+    pkt = net.ip.from_bytes(TEST1)
+    pkt.time_to_live -= 1
+    pkt.destination_address = '192.168.0.1'
+    assert(pkt.dirty_fields() == ['time_to_live', 'destination'])
+    buf = bytearray(len(TEST1) + 4)
+    assert(pkt.pack_into(buf, 4) == len(TEST1))
+    assert(buf[4:] == pkt.to_bytes())
+    assert(net.ip.checksum(buf[4:24]) == 0)
+    assert(buf[4:12] == TEST1[:8])
+    assert(buf[28:] == TEST1[24:])
+    copy = net.ip.from_bytes(bytes(buf[4:]))
+    assert(copy.time_to_live == 127)
+    assert(copy.destination == 0xc0a80001)
+    assert(copy.destination_address == ipaddress.IPv4Address('192.168.0.1'))
+    with pytest.raises(IndexError):
+        pkt.pack_into(buf, 5)
+
+def test_options():
+    from net.ip.v4.Option import Option
+    options = b'\x07\x07\x04\x00\x00\x00\x00\x00'
+    header = bytearray(TEST1[:20])
+    header[0] = 0x47
+    header[10:12] = b'\x00\x00'
+    buf = bytes(header) + options + TEST1[20:]
+    buf = buf[:10] + net.ip.checksum(buf[:28]).to_bytes(2, 'big') + buf[12:]
+
+    pkt = net.ip.v4.Packet.Packet.from_bytes(buf, verify_checksum=True)
+    assert(pkt.ihl == 7)
+    assert(pkt.options == [Option(Option.TYPE_RECORD_ROUTE, b'\x04\x00\x00\x00\x00'), Option(Option.TYPE_END_OF_OPTION_LIST)])
+    assert(pkt.data == TEST1[20:])
+    assert(pkt.to_bytes() == buf)
+    assert(net.ip.view(buf).options == pkt.options)
+
+    # changing the options changes ihl and the checksum
+    pkt.options = [Option(Option.TYPE_ROUTER_ALERT, b'\x00\x00')]
+    out = pkt.to_bytes()
+    assert(pkt.ihl == 6)
+    assert(out[20:24] == b'\x94\x04\x00\x00')
+    assert(net.ip.checksum(out[:24]) == 0)
+    assert(out[24:] == TEST1[20:])
+
+def test_options_padding():
+    # the padding after an end of option list option is written back
+    header = bytearray(TEST1[:20])
+    header[0] = 0x47
+    header[2:4] = (8 + len(TEST1)).to_bytes(2, 'big')
+    for options in (b'\x01\x00' + bytes(6), b'\x00' + bytes(7), b'\x01\x00\x00\xff\x00\x00\x00\x00'):
+        buf = bytes(header) + options + TEST1[20:]
+        buf = buf[:10] + b'\x00\x00' + buf[12:]
+        buf = buf[:10] + net.ip.checksum(buf[:28]).to_bytes(2, 'big') + buf[12:]
+        for pkt in (net.ip.v4.Packet.Packet.from_bytes(buf), net.ip.view(buf)):
+            assert(pkt.to_bytes() == buf)
+            assert(pkt.ihl == 7)
+
+    # total_length follows ihl when the options change the header length
+    from net.ip.v4.Option import Option
+    pkt = net.ip.v4.Packet.Packet.from_bytes(buf)
+    pkt.options = [Option(Option.TYPE_ROUTER_ALERT, b'\x00\x00')]
+    out = pkt.to_bytes()
+    assert(pkt.ihl == 6)
+    assert(pkt.total_length == len(out) == len(buf) - 4)
+    pkt.options = None
+    out = pkt.to_bytes()
+    assert(pkt.ihl == 5)
+    assert(pkt.total_length == len(out) == len(buf) - 8)
+
+def test_addresses():
+    pkt = net.ip.from_bytes(TEST1)
+    assert(isinstance(pkt.source, int))
+    assert(net.ip.in_network(pkt.source, net.ip.IPV4_BLOCK_PRIVATE_CLASS_B))
+    assert(not net.ip.in_network(pkt.destination, net.ip.IPV4_BLOCK_PRIVATE_CLASS_B))
+    assert(net.ip.network_mask(net.ip.IPV4_BLOCK_PRIVATE_CLASS_A) == (0x0a000000, 0xff000000))
+    assert(net.ip.address_to_int('10.10.8.240') == pkt.destination)
+    assert(net.ip.address_to_int(ipaddress.IPv4Address('10.10.8.240')) == pkt.destination)
+
+    # address objects can still be assigned
+    pkt.source = ipaddress.IPv4Address('192.168.1.1')
+    assert(pkt.to_bytes()[12:16] == b'\xc0\xa8\x01\x01')
+    pkt.source_address = '192.168.1.2'
+    assert(pkt.source == 0xc0a80102)
+
+def test_from_bytes_fields():
+    pkt = net.ip.from_bytes(TEST1, fields=('protocol', 'destination'))
+    assert(pkt.protocol == 17)
+    assert(pkt.destination == 0x0a0a08f0)
+    assert(sorted(pkt.__dict__) == ['destination', 'ihl', 'protocol'])
+    assert(pkt.time_to_live == 128)
+    assert(pkt.to_bytes() == TEST1)
+
+def test_from_bytes_into():
+    Packet = net.ip.v4.Packet.Packet
+    pkt = Packet.acquire()
+    for i in range(3):
+        buf = TEST1[:8] + bytes((i,)) + TEST1[9:]
+        assert(Packet.from_bytes_into(pkt, buf) is pkt)
+        assert(pkt.time_to_live == i)
+        assert(pkt.data == TEST1[20:])
+        assert(pkt.to_bytes(update_checksum=False) == buf)
+    pkt.release()
+    assert(pkt.data is None)
+    assert(Packet.acquire() is pkt)
+
+    buf = memoryview(TEST1)
+    Packet.from_bytes_into(pkt, buf)
+    assert(pkt.data.obj is TEST1)
+
+    # the header is copied out of a buffer that may be reused
+    buf = bytearray(TEST1)
+    Packet.from_bytes_into(pkt, memoryview(buf))
+    buf[:20] = bytes(20)
+    assert(pkt.dirty_fields() == [])
+    assert(pkt.to_bytes(update_checksum=False) == TEST1)
+
+def test_payload():
+    from net.udp.Datagram import Datagram
+    pkt = net.ip.from_bytes(TEST1)
+    dgram = pkt.payload
+    assert(isinstance(dgram, Datagram))
+    assert(pkt.payload is dgram)
+    assert(dgram.source_port == 67)
+    assert(dgram.destination_port == 67)
+    assert(dgram.length == 0x0180)
+    assert(dgram.data == TEST1[28:])
+    assert(dgram.data.obj is pkt.data)
+
+    pkt = net.ip.view(TEST1)
+    assert(pkt.payload.destination_port == 67)
+    assert(pkt.payload.data.obj is TEST1)
+
+    # only the first fragment starts with the UDP header
+    assert(net.ip.from_bytes(TEST1[:6] + b'\x00\x10' + TEST1[8:]).payload is None)
+    # no decoder
+    assert(net.ip.from_bytes(TEST1[:9] + b'\x2f' + TEST1[10:]).payload is None)
+
+def test_str():
+    s = str(net.ip.from_bytes(TEST1))
+    assert('Header Checksum: 0x77cc' in s)
+    assert('Source IP Address: 172.22.178.234' in s)
+    assert('Destination IP Address: 10.10.8.240' in s)
+
+def test_cache():
+    Packet = net.ip.v4.Packet.Packet
+    plain = Packet.from_bytes(TEST1)
+    cache = Packet.enable_cache(2)
+    try:
+        assert(Packet.from_bytes(TEST1).to_tuple() == plain.to_tuple())
+        assert((cache.hits, cache.misses) == (0, 1))
+
+        # a different ident and checksum still hit
+        buf = TEST1[:4] + b'\x12\x34' + TEST1[6:10] + b'\xab\xcd' + TEST1[12:]
+        pkt = net.ip.from_bytes(buf)
+        assert((cache.hits, cache.misses) == (1, 1))
+        assert(pkt.ident == 0x1234)
+        assert(pkt.header_checksum == 0xabcd)
+        assert(pkt.source == plain.source)
+        assert(pkt.data == TEST1[20:])
+        assert(pkt.dirty_fields() == [])
+        assert(pkt.to_bytes(update_checksum=False) == buf)
+        with pytest.raises(RuntimeError):
+            Packet.from_bytes(buf, verify_checksum=True)
+
+        # fields set on one packet don't show in the next
+        pkt.time_to_live = 1
+        assert(Packet.from_bytes(TEST1).time_to_live == plain.time_to_live)
+
+        with pytest.raises(IndexError):
+            Packet.from_bytes(TEST1[:16])
+        Packet.from_bytes(TEST1[:8] + b'\x01' + TEST1[9:])
+        Packet.from_bytes(TEST1[:8] + b'\x02' + TEST1[9:])
+        assert(len(cache) == 2)
+        assert(cache.evictions == 1)
+    finally:
+        Packet.disable_cache()
+    assert(Packet.from_bytes(TEST1).to_tuple() == plain.to_tuple())
+    assert(cache.hits == 3)
+
+def test_cache_options():
+    from net.ip.v4.Option import Option
+    Packet = net.ip.v4.Packet.Packet
+    header = bytearray(TEST1[:20])
+    header[0] = 0x46
+    buf = bytes(header) + b'\x94\x04\x00\x00' + TEST1[20:]
+    options = [Option(Option.TYPE_ROUTER_ALERT, b'\x00\x00')]
+    Packet.enable_cache()
+    try:
+        first = Packet.from_bytes(memoryview(buf))
+        first.options.append(Option(Option.TYPE_NO_OPERATION))
+        second = Packet.from_bytes(buf)
+        assert(second.options == options)
+        second.options[0].data = b'\xff\xff'
+        third = Packet.from_bytes(buf)
+        assert(third.options == options)
+        assert(third.options is not second.options)
+        assert(Packet._CACHE.hits == 2)
+    finally:
+        Packet.disable_cache()
@@ -0,0 +1,193 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+import net.ip
+from net.ip.v4.Packet import Packet
+from net.ip.v4.Reassembler import Reassembler
+
+DATA = bytes(range(256)) * 4
+
+def datagram(data=DATA, ident=0x1234):
+    header = b'\x45\x00' + (20 + len(data)).to_bytes(2, 'big') + ident.to_bytes(2, 'big') \
+        + b'\x00\x00\x40\x11\x00\x00\xc0\xa8\x00\x01\xc0\xa8\x00\x02'
+    pkt = Packet.from_bytes(header + data)
+    return Packet.from_bytes(pkt.to_bytes())
+
+def fragments(pkt, size):
+    frags = []
+    for start in range(0, len(pkt.data), size):
+        frag = Packet.from_bytes(pkt.to_bytes())
+        frag.data = pkt.data[start:(start + size)]
+        frag.fragment_offset = start // 8
+        frag.flag_more_fragments = start + size < len(pkt.data)
+        frag.total_length = 20 + len(frag.data)
+        frags.append(Packet.from_bytes(frag.to_bytes()))
+    return frags
+
+def test_not_fragment():
+    r = Reassembler()
+    pkt = datagram()
+    assert(r.add(pkt) is pkt)
+    assert(len(r) == 0)
+
+def test_in_order():
+    r = Reassembler()
+    pkt = datagram()
+    frags = fragments(pkt, 256)
+    for frag in frags[:-1]:
+        assert(r.add(frag, now=0) is None)
+    out = r.add(frags[-1], now=0)
+    assert(out.to_bytes() == pkt.to_bytes())
+    assert(out.verify_checksum())
+    assert(len(r) == 0)
+    assert(r.bytes == 0)
+    assert(r.reassembled == 1)
+
+def test_out_of_order():
+    r = Reassembler()
+    pkt = datagram()
+    frags = fragments(pkt, 136)
+    order = [frags[-1]] + frags[1:-1][::-1] + [frags[0]]
+    for frag in order[:-1]:
+        assert(r.add(frag, now=0) is None)
+    assert(r.add(order[-1], now=0).to_bytes() == pkt.to_bytes())
+
+def test_overlap():
+    r = Reassembler()
+    pkt = datagram()
+    frags = fragments(pkt, 256)
+    assert(r.add(fragments(pkt, 512)[0], now=0) is None)
+    for frag in frags[:-1]:
+        assert(r.add(frag, now=0) is None)
+    assert(r.add(frags[-1], now=0).data == DATA)
+
+def test_overlapping_last():
+    # a last fragment overlapping the end of data already received
+    r = Reassembler()
+    pkt = datagram(DATA[:16])
+    first = fragments(pkt, 16)[0]
+    first.flag_more_fragments = True
+    first = Packet.from_bytes(first.to_bytes())
+    last = fragments(pkt, 8)[1]
+    assert(r.add(first, now=0) is None)
+    out = r.add(last, now=0)
+    assert(out is not None)
+    assert(out.to_bytes() == pkt.to_bytes())
+    assert(len(r) == 0)
+
+def test_view():
+    r = Reassembler()
+    pkt = datagram()
+    for frag in fragments(pkt, 512):
+        out = r.add(Packet.view(frag.to_bytes()), now=0)
+    assert(out.to_bytes() == pkt.to_bytes())
+
+def test_interleaved():
+    r = Reassembler()
+    a = fragments(datagram(ident=1), 512)
+    b = fragments(datagram(DATA[:600], ident=2), 512)
+    assert(r.add(a[0], now=0) is None)
+    assert(r.add(b[0], now=0) is None)
+    assert(len(r) == 2)
+    assert(r.add(b[1], now=0).data == DATA[:600])
+    assert(r.add(a[1], now=0).data == DATA)
+
+def test_timeout():
+    r = Reassembler(timeout=30)
+    frags = fragments(datagram(), 512)
+    assert(r.add(frags[0], now=0) is None)
+    assert(r.add(frags[1], now=31) is None)
+    assert(r.timed_out == 1)
+    assert(len(r) == 1)
+    r.expire(now=62)
+    assert(len(r) == 0)
+    assert(r.bytes == 0)
+
+def test_memory_cap():
+    r = Reassembler(max_bytes=2048)
+    for ident in range(10):
+        assert(r.add(fragments(datagram(ident=ident), 512)[0], now=0) is None)
+        assert(r.bytes <= 2048)
+    assert(len(r) == 4)
+    assert(r.evicted == 6)
+
+def test_max_datagrams():
+    r = Reassembler(max_datagrams=3)
+    for ident in range(5):
+        r.add(fragments(datagram(ident=ident), 512)[0], now=0)
+    assert(len(r) == 3)
+    assert(r.evicted == 2)
+
+def test_invalid():
+    r = Reassembler()
+    frags = fragments(datagram(), 512)
+    # not a multiple of 8 bytes with more fragments to follow
+    frag = Packet.from_bytes(frags[0].to_bytes())
+    frag.data = frag.data[:100]
+    frag.total_length = 120
+    assert(r.add(frag, now=0) is None)
+    assert(r.dropped == 1)
+    assert(len(r) == 0)
+
+    # runs past the end given by the last fragment
+    assert(r.add(frags[1], now=0) is None)
+    frag = Packet.from_bytes(frags[1].to_bytes())
+    frag.fragment_offset = 128
+    frag.flag_more_fragments = True
+    assert(r.add(frag, now=0) is None)
+    assert(r.dropped == 2)
+    assert(len(r) == 0)
+
+    # ends past the largest datagram
+    frag = Packet.from_bytes(frags[1].to_bytes())
+    frag.fragment_offset = 8189
+    assert(r.add(frag, now=0) is None)
+    assert(r.dropped == 3)
+
+def test_padded():
+    # link layer padding after total_length isn't fragment data
+    r = Reassembler()
+    pkt = datagram(DATA[:20])
+    frags = [Packet.from_bytes(frag.to_bytes() + bytes(22)) for frag in fragments(pkt, 16)]
+    assert(len(frags[-1].data) == 26)
+    assert(r.add(frags[0], now=0) is None)
+    out = r.add(frags[1], now=0)
+    assert(out.total_length == 40)
+    assert(out.to_bytes() == pkt.to_bytes())
+    assert(r.dropped == 0)
+
+    # a total_length beyond the buffer or short of the header
+    for total_length in (20 + 16 + 1, 19):
+        frag = Packet.from_bytes(frags[0].to_bytes())
+        frag.total_length = total_length
+        assert(r.add(Packet.from_bytes(frag.to_bytes()[:36]), now=0) is None)
+    assert(r.dropped == 2)
+    assert(len(r) == 0)
+
+def test_max_holes():
+    r = Reassembler(max_holes=4)
+    frags = fragments(datagram(), 8)
+    for frag in frags[1:12:2]:
+        r.add(frag, now=0)
+    assert(r.dropped == 1)
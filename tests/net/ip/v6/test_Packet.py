@@ -0,0 +1,108 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import ipaddress
+
+import net.ip
+from net.ip.v6.Packet import Packet
+
+# hop-by-hop options (padding only), fragment header, then 12 bytes of UDP
+TEST1 = b'\x60\x12\x34\x56\x00\x1c\x00\x40' \
+    + ipaddress.IPv6Address('2001:db8::1').packed \
+    + ipaddress.IPv6Address('2001:db8::2').packed \
+    + b'\x2c\x00\x01\x04\x00\x00\x00\x00' \
+    + b'\x11\x00\x00\x01\x12\x34\x56\x78' \
+    + b'\x04\xd2\x00\x35\x00\x0c\x00\x00abcd'
+
+def test_from_bytes():
+    pkt = net.ip.from_bytes(TEST1)
+    assert(isinstance(pkt, Packet))
+    assert(pkt.version == 6)
+    assert(pkt.traffic_class == 0x01)
+    assert(pkt.flow_label == 0x23456)
+    assert(pkt.payload_length == 28)
+    assert(pkt.next_header == 0)
+    assert(pkt.hop_limit == 64)
+    assert(pkt.source == 0x20010db8000000000000000000000001)
+    assert(pkt.destination == 0x20010db8000000000000000000000002)
+    assert(pkt.source_address == ipaddress.IPv6Address('2001:db8::1'))
+    assert(pkt.destination_address == ipaddress.IPv6Address('2001:db8::2'))
+    assert(pkt.protocol == 17)
+    assert(pkt.payload_offset == 56)
+    assert(pkt.extension_headers == TEST1[40:56])
+    assert(pkt.data == TEST1[56:])
+
+def test_to_bytes():
+    pkt = net.ip.from_bytes(TEST1)
+    assert(pkt.to_bytes() == TEST1)
+    pkt.hop_limit = 63
+    assert(pkt.to_bytes() == TEST1[:7] + b'\x3f' + TEST1[8:])
+
+def test_view():
+    buf = bytearray(b'\x00\x00' + TEST1)
+    pkt = net.ip.view(buf, 2)
+    assert(isinstance(pkt, Packet))
+    assert(pkt.protocol == 17)
+    assert(pkt.hop_limit == 64)
+    assert(pkt.data == TEST1[56:])
+    assert(pkt.to_bytes() == TEST1)
+
+def test_walk():
+    assert(Packet.walk(TEST1) == (17, 56))
+    assert(Packet.walk(b'\x00' + TEST1, 1) == (17, 56))
+    # no extension headers
+    assert(Packet.walk(TEST1[:6] + b'\x06' + TEST1[7:40]) == (6, 40))
+    # authentication header is sized in 32 bit words
+    ah = TEST1[:6] + b'\x33' + TEST1[7:40] + b'\x3a\x04' + bytes(22)
+    assert(Packet.walk(ah) == (58, 64))
+
+def test_walk_truncated():
+    with pytest.raises(IndexError):
+        Packet.walk(TEST1[:39])
+    with pytest.raises(IndexError):
+        Packet.walk(TEST1[:44])
+    # header length runs past the end of the buffer
+    with pytest.raises(IndexError):
+        Packet.walk(TEST1[:40] + b'\x11\x01' + bytes(6))
+
+def test_extension_header():
+    pkt = Packet.from_bytes(TEST1)
+    assert(pkt.extension_header(0) == TEST1[40:48])
+    assert(pkt.extension_header(44) == TEST1[48:56])
+    assert(pkt.extension_header(43) is None)
+
+def test_from_bytes_into():
+    pkt = Packet.acquire()
+    assert(Packet.from_bytes_into(pkt, TEST1) is pkt)
+    assert(pkt.protocol == 17)
+    assert(pkt.to_bytes() == TEST1)
+    pkt.release()
+    assert(pkt.data is None)
+
+def test_payload():
+    # the fragment header in TEST1 is the first fragment
+    pkt = Packet.from_bytes(TEST1)
+    assert(pkt.payload.source_port == 1234)
+    assert(pkt.payload.data == b'abcd')
+    later = TEST1[:50] + b'\x00\x11' + TEST1[52:]
+    assert(Packet.from_bytes(later).payload is None)
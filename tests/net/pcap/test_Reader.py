@@ -0,0 +1,181 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import struct
+
+from net.pcap.Reader import Reader
+from tests.packets import ipv4
+
+ETHERNET = b'\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb'
+
+def write_pcap(path, frames, linktype, order='<'):
+    with open(path, 'wb') as f:
+        f.write(struct.pack(order + 'IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, linktype))
+        for i, frame in enumerate(frames):
+            f.write(struct.pack(order + 'IIII', 1000 + i, 500000, len(frame), len(frame)))
+            f.write(frame)
+
+def block(block_type, body):
+    body += b'\x00' * (-len(body) % 4)
+    return struct.pack('<II', block_type, len(body) + 12) + body + struct.pack('<I', len(body) + 12)
+
+def write_pcapng(path, frames, linktype):
+    with open(path, 'wb') as f:
+        f.write(block(0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1)))
+        # if_tsresol of 10^-3
+        f.write(block(1, struct.pack('<HHI', linktype, 0, 65535) + struct.pack('<HHB3x', 9, 1, 3) + struct.pack('<HH', 0, 0)))
+        for i, frame in enumerate(frames):
+            f.write(block(6, struct.pack('<IIIII', 0, 0, 2000 + i, len(frame), len(frame)) + frame))
+
+def test_pcap_ethernet(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    frames = [
+        ETHERNET + b'\x08\x00' + ipv4(1),
+        ETHERNET + b'\x08\x06' + bytes(28),
+        ETHERNET + b'\x81\x00\x00\x05\x08\x00' + ipv4(2),
+    ]
+    write_pcap(path, frames, Reader.LINKTYPE_ETHERNET)
+    with Reader(path) as reader:
+        pkts = list(reader)
+        assert(reader.skipped == 1)
+    assert([pkt.ident for ts, pkt in pkts] == [1, 2])
+    assert(pkts[0][0] == 1000.5)
+    assert(pkts[1][1].protocol == 17)
+    assert(bytes(pkts[1][1].data) == b'\x00\x35\x00\x35')
+
+def test_pcap_big_endian_raw(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, [ipv4(7), ipv4(8)], Reader.LINKTYPE_RAW, '>')
+    reader = Reader(path)
+    pkts = [pkt for ts, pkt in reader.packets(lazy=True)]
+    assert([pkt.ident for pkt in pkts] == [7, 8])
+    assert(isinstance(pkts[0].data, memoryview))
+    del pkts
+    reader.close()
+
+def test_pcap_linux_sll(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, [bytes(14) + b'\x08\x00' + ipv4(3)], Reader.LINKTYPE_LINUX_SLL)
+    with Reader(path) as reader:
+        assert([pkt.ident for ts, pkt in reader] == [3])
+
+def test_pcapng(tmp_path):
+    path = str(tmp_path / 'test.pcapng')
+    write_pcapng(path, [ETHERNET + b'\x08\x00' + ipv4(4), ETHERNET + b'\x08\x00' + ipv4(5)], Reader.LINKTYPE_ETHERNET)
+    with Reader(path) as reader:
+        pkts = list(reader)
+    assert([pkt.ident for ts, pkt in pkts] == [4, 5])
+    assert(pkts[1][0] == pytest.approx(2.001))
+
+def test_records_are_views(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, [ipv4(1)], Reader.LINKTYPE_RAW)
+    with Reader(path) as reader:
+        for ts, linktype, frame in reader.records():
+            assert(isinstance(frame, memoryview))
+            assert(linktype == Reader.LINKTYPE_RAW)
+            assert(frame == ipv4(1))
+            frame.release()
+
+def test_not_a_capture(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    with open(path, 'wb') as f:
+        f.write(b'not a capture')
+    with pytest.raises(RuntimeError):
+        Reader(path)
+
+def test_packets_range(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, [ipv4(i) for i in range(10)], Reader.LINKTYPE_RAW)
+    with Reader(path) as reader:
+        assert([pkt.ident for ts, pkt in reader.packets(start=3, stop=6)] == [3, 4, 5])
+        assert(len(list(reader.records(8))) == 2)
+
+def test_split(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, [ipv4(i) for i in range(10)], Reader.LINKTYPE_RAW)
+    with Reader(path) as reader:
+        shards = reader.split(3)
+        assert([count for position, count in shards] == [3, 3, 4])
+        idents = [[pkt.ident for ts, pkt in reader.packets(position=position, stop=count)] for position, count in shards]
+        assert(idents == [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]])
+        assert(len(reader.split(20)) == 10)
+
+    # a second section with its own interface; shards carry the interfaces
+    # in effect where they start
+    path = str(tmp_path / 'test.pcapng')
+    write_pcapng(path, [ETHERNET + b'\x08\x00' + ipv4(i) for i in range(3)], Reader.LINKTYPE_ETHERNET)
+    with open(path, 'ab') as f:
+        f.write(block(0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1)))
+        f.write(block(1, struct.pack('<HHI', Reader.LINKTYPE_RAW, 0, 65535)))
+        for i in range(3, 6):
+            f.write(block(6, struct.pack('<IIIII', 0, 0, 2000 + i, 24, 24) + ipv4(i)))
+    with Reader(path) as reader:
+        shards = reader.split(4)
+        assert([count for position, count in shards] == [1, 2, 1, 2])
+        idents = [pkt.ident for position, count in shards for ts, pkt in reader.packets(position=position, stop=count)]
+        assert(idents == list(range(6)))
+
+    path = str(tmp_path / 'empty.pcap')
+    write_pcap(path, [], Reader.LINKTYPE_RAW)
+    with Reader(path) as reader:
+        assert(reader.split(4) == [(None, 0)])
+        assert(list(reader.records(0, 0, None)) == [])
+
+def test_pcapng_caplen(tmp_path):
+    # a captured length running into the next block
+    path = str(tmp_path / 'test.pcapng')
+    write_pcapng(path, [ipv4(1), ipv4(2)], Reader.LINKTYPE_RAW)
+    with open(path, 'rb') as f:
+        buf = bytearray(f.read())
+    first = buf.index(struct.pack('<II', 6, 56))
+    buf[first + 20:first + 24] = struct.pack('<I', 40)
+    with open(path, 'wb') as f:
+        f.write(buf)
+    with Reader(path) as reader:
+        assert(list(reader.records()) == [])
+        assert(reader.split(4) == [(None, 0)])
+
+def test_pcapng_corrupt(tmp_path):
+    # blocks of an undefined interface, or in a section with a bad byte
+    # order magic, end the records
+    path = str(tmp_path / 'test.pcapng')
+    write_pcapng(path, [ipv4(1)], Reader.LINKTYPE_RAW)
+    with open(path, 'ab') as f:
+        f.write(block(6, struct.pack('<IIIII', 1, 0, 0, 24, 24) + ipv4(2)))
+        f.write(block(6, struct.pack('<IIIII', 0, 0, 0, 24, 24) + ipv4(3)))
+    with Reader(path) as reader:
+        assert([pkt.ident for ts, pkt in reader.packets()] == [1])
+        assert([count for position, count in reader.split(4)] == [1])
+
+    with open(path, 'wb') as f:
+        f.write(block(0x0a0d0d0a, struct.pack('<IHHq', 0x12345678, 1, 0, -1)))
+    with Reader(path) as reader:
+        assert(list(reader.records()) == [])
+
+def test_short_pcap(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHH', 0xa1b2c3d4, 2, 4))
+    with pytest.raises(RuntimeError):
+        Reader(path)
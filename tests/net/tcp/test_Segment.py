@@ -0,0 +1,80 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+from net.tcp.Segment import Segment
+
+# SYN from port 1234 to 80 with a maximum segment size option
+TEST1 = b'\x04\xd2\x00\x50\x00\x00\x00\x64\x00\x00\x00\x00\x60\x02\xff\xff\x12\x34\x00\x00' \
+    + b'\x02\x04\x05\xb4' + b'data'
+
+def test_from_bytes():
+    seg = Segment.from_bytes(TEST1)
+    assert(seg.source_port == 1234)
+    assert(seg.destination_port == 80)
+    assert(seg.sequence_number == 100)
+    assert(seg.acknowledgment_number == 0)
+    assert(seg.data_offset == 6)
+    assert(seg.flag_syn)
+    assert(not seg.flag_ack)
+    assert(not seg.flag_fin)
+    assert(seg.window == 0xffff)
+    assert(seg.checksum == 0x1234)
+    assert(seg.options == b'\x02\x04\x05\xb4')
+    assert(seg.data == b'data')
+
+def test_to_bytes():
+    seg = Segment.from_bytes(TEST1)
+    assert(seg.to_bytes() == TEST1)
+    seg.flag_ack = True
+    assert(seg.to_bytes() == TEST1[:13] + b'\x12' + TEST1[14:])
+
+def test_view():
+    seg = Segment.view(b'\x00' + TEST1, 1)
+    assert(seg.flag_syn)
+    assert(seg.options == b'\x02\x04\x05\xb4')
+    assert(seg.data == b'data')
+    assert(seg.to_bytes() == TEST1)
+
+def test_invalid():
+    with pytest.raises(RuntimeError):
+        Segment.from_bytes(TEST1[:12] + b'\x40' + TEST1[13:])
+    with pytest.raises(IndexError):
+        Segment.from_bytes(TEST1[:22])
+
+def test_options():
+    # data_offset follows the options written
+    seg = Segment.from_bytes(TEST1)
+    seg.options = b''
+    assert(seg.to_bytes() == TEST1[:12] + b'\x50' + TEST1[13:20] + b'data')
+    assert(seg.data_offset == 5)
+    seg.options = b'\x02\x04\x05\xb4\x01\x01\x04\x02'
+    out = seg.to_bytes()
+    assert(Segment.from_bytes(out).options == seg.options)
+    assert(out[12] == 0x70)
+    seg.options = b'\x01\x01\x01'
+    with pytest.raises(ValueError):
+        seg.to_bytes()
+    seg.options = bytes(44)
+    with pytest.raises(ValueError):
+        seg.to_bytes()
@@ -0,0 +1,115 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import random
+
+from net.Codec import Codec
+from net.Structure import Structure
+from net.ip.v4.Packet import Packet
+from net.dcerpc.ndr.FormatLabel import FormatLabel
+
+class Mixed(Structure):
+    _FORMAT = (
+        ('a', 'uint:3'),
+        ('b', 'bool'),
+        ('c', 'pad:4'),
+        ('d', 'uint:24'),
+        ('e', 'bytes:3'),
+        ('f', 'pad:8'),
+        ('g', 'uint:12'),
+        ('h', 'uint:36'),
+    )
+
+def test_compile():
+    assert(Packet._CODEC is not None)
+    assert(Packet._CODEC.size == 20)
+    assert(FormatLabel._CODEC.size == 4)
+    assert(Mixed._CODEC.size == 14)
+    assert(Codec.compile((('a', 'uint:4'),)) is None)
+    assert(Codec.compile((('a', 'float:32'),)) is None)
+    assert(Codec.compile((('a', 'uint:4'), ('b', 'bytes:1'), ('c', 'uint:4'))) is None)
+
+@pytest.mark.parametrize('cls', [Packet, FormatLabel, Mixed])
+def test_matches_bitstring(cls):
+    rnd = random.Random(1)
+    for i in range(200):
+        buf = bytes(rnd.getrandbits(8) for j in range(cls._CODEC.size))
+        fast = super(cls, cls).from_bytes(buf)
+        slow = cls._from_bytes_bitstring(buf)
+        for name in cls._CODEC.names:
+            assert(getattr(fast, name) == getattr(slow, name))
+        assert(cls._CODEC.pack([fast._get_field_value(name) for name in cls._CODEC.names]) == slow._to_bytes_bitstring())
+        # re-encoding a decoded structure keeps its original pad bits
+        assert(Structure.to_bytes(fast) == buf)
+
+@pytest.mark.parametrize('cls', [Packet, FormatLabel, Mixed])
+def test_expression(cls):
+    codec = cls._CODEC
+    rnd = random.Random(2)
+    for i in range(50):
+        buf = bytes(rnd.getrandbits(8) for j in range(codec.size + 2))
+        values = codec.unpack(buf, 2)
+        for name, value in zip(codec.names, values):
+            if value is not None:
+                assert(eval(codec.expression(name), dict(Codec.EXPRESSION_NAMESPACE), {'buf': buf, 'offset': 2}) == value)
+
+def test_from_bytes_short():
+    with pytest.raises(IndexError):
+        Mixed.from_bytes(b'\x00' * 13)
+
+def test_to_bytes_out_of_range():
+    obj = Mixed.from_bytes(b'\x00' * 14)
+    obj.a = 8
+    with pytest.raises(ValueError):
+        obj.to_bytes()
+    obj.a = 7
+    obj.e = b'\x00'
+    with pytest.raises(ValueError):
+        obj.to_bytes()
+
+def test_unpack_batch():
+    numpy = pytest.importorskip('numpy')
+    rnd = random.Random(2)
+    bufs = [bytes(rnd.getrandbits(8) for j in range(14)) for i in range(50)]
+    batch = Mixed.decode_batch(bufs)
+    assert(batch.dtype.names == ('a', 'b', 'd', 'e', 'g', 'h'))
+    for row, buf in zip(batch, bufs):
+        obj = Mixed.from_bytes(buf)
+        for name in batch.dtype.names:
+            if name == 'e':
+                assert(bytes(row[name]) == obj.e)
+            else:
+                assert(row[name] == getattr(obj, name))
+
+def test_unpack_batch_offsets():
+    numpy = pytest.importorskip('numpy')
+    buf = b'\x00' + b''.join(bytes(range(i, i + 14)) for i in range(10))
+    batch = Mixed.decode_batch(buf, offsets=range(1, 141, 14))
+    for i, row in enumerate(batch):
+        obj = Mixed.from_bytes(bytes(range(i, i + 14)))
+        assert(row['d'] == obj.d)
+        assert(row['h'] == obj.h)
+    with pytest.raises(IndexError):
+        Mixed.decode_batch(buf, offsets=[130])
+    with pytest.raises(IndexError):
+        Mixed.decode_batch([buf[:13]])
@@ -0,0 +1,80 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+import struct
+
+import net.ip
+from net.Metrics import Metrics
+from net.ip.v4.Packet import Packet
+from net.udp.Datagram import Datagram
+from tests.packets import ipv4
+
+PACKET = ipv4(data=struct.pack('>HHHH', 53, 53, 8, 0))
+
+def test_enable():
+    from_bytes = Packet.from_bytes
+    with Metrics() as metrics:
+        assert(Packet.from_bytes is not from_bytes)
+        for i in range(3):
+            pkt = net.ip.from_bytes(PACKET)
+        assert(pkt.payload.source_port == 53)
+        net.ip.view(PACKET)
+        pkt.to_bytes()
+        with pytest.raises(IndexError):
+            net.ip.from_bytes(PACKET[:10])
+        with pytest.raises(RuntimeError):
+            net.ip.from_bytes(b'\x44' + PACKET[1:])
+
+        assert(metrics.count(Packet, 'decode') == 3)
+        assert(metrics.count(Packet, 'view') == 1)
+        assert(metrics.count(Packet, 'encode') == 1)
+        assert(metrics.count(Datagram, 'view') == 1)
+        assert(metrics.count(Datagram, 'decode') == 0)
+        assert(metrics.error_count(Packet, 'decode') == 2)
+        assert(metrics.error_count(Packet, 'decode', 'IndexError') == 1)
+        assert(metrics.percentile(Packet, 'decode', 50) > 0)
+        assert(metrics.percentile(Datagram, 'decode', 50) is None)
+        report = metrics.report()
+        assert(len(report) == 4)
+        assert(report[0].startswith('net.ip.v4.Packet.Packet decode: 3 calls, p50 <= '))
+        assert(report[0].endswith(', 1 IndexError, 1 RuntimeError'))
+        assert(report[3].startswith('net.udp.Datagram.Datagram view: 1 calls'))
+
+    assert(Packet.from_bytes == from_bytes)
+    assert('from_bytes' in Packet.__dict__)
+    assert(net.ip._FROM_BYTES[4] == from_bytes)
+    net.ip.from_bytes(PACKET)
+    assert(metrics.count(Packet, 'decode') == 3)
+
+def test_instrument():
+    metrics = Metrics()
+    metrics.instrument(Datagram)
+    with pytest.raises(RuntimeError):
+        Metrics().instrument(Datagram)
+    Datagram.from_bytes(PACKET[20:]).to_bytes()
+    assert(metrics.count(Datagram, 'decode') == 1)
+    assert(metrics.count(Datagram, 'encode') == 1)
+    metrics.reset()
+    assert(metrics.count(Datagram, 'decode') == 0)
+    metrics.uninstrument(Datagram)
+    assert(not hasattr(Datagram.from_bytes, '__wrapped__'))
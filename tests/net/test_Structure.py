@@ -0,0 +1,194 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+from net.Structure import Structure
+from net.dcerpc.ndr.FormatLabel import FormatLabel
+
+class Header(Structure):
+    _FORMAT = (
+        ('kind', 'uint:4'),
+        ('urgent', 'bool'),
+        ('reserved', 'pad:3'),
+        ('length', 'uint:24'),
+        ('tag', 'bytes:2'),
+    )
+
+TEST1 = b'\x5a\x01\x02\x03AB'
+
+def test_view():
+    buf = bytearray(b'\xff' + TEST1)
+    hdr = Header.view(memoryview(buf), 1)
+    assert(isinstance(hdr, Header))
+    assert(hdr.length == 0x010203)
+    # fields are decoded on first access and cached after that
+    buf[1] = 0x50
+    buf[2:5] = b'\x00\x00\x00'
+    assert(hdr.length == 0x010203)
+    assert(hdr.kind == 5)
+    assert(not hdr.urgent)
+    assert(hdr.reserved is None)
+    assert(hdr.tag == b'AB')
+    hdr.tag = b'CD'
+    assert(hdr.to_bytes() == b'\x50\x01\x02\x03CD')
+
+def test_slots():
+    hdr = Header.from_bytes(TEST1)
+    assert(not hasattr(hdr, '__dict__'))
+    with pytest.raises(AttributeError):
+        hdr.missing = 1
+
+    class Extra(Header):
+        _SLOTS = ('extra',)
+    hdr = Extra.from_bytes(TEST1)
+    hdr.extra = 1
+    assert(Extra.__slots__ == ('extra',))
+    assert(not hasattr(hdr, '__dict__'))
+
+def test_view_missing_attribute():
+    hdr = Header.view(TEST1)
+    with pytest.raises(AttributeError):
+        hdr.missing
+    assert(not hasattr(Header(), 'kind'))
+
+def test_view_not_compiled():
+    class Unaligned(Structure):
+        _FORMAT = (
+            ('a', 'uint:3'),
+        )
+    with pytest.raises(NotImplementedError):
+        Unaligned.view(b'\x00')
+
+def test_view_format_label():
+    lbl = FormatLabel.view(b'\x10\x01\x00\x00')
+    assert(lbl.int_repr == 1)
+    assert(lbl.float_repr == 1)
+
+def test_dirty_fields():
+    hdr = Header.from_bytes(TEST1)
+    assert(hdr.dirty_fields() == [])
+    hdr.length = 7
+    hdr.urgent = False
+    assert(hdr.dirty_fields() == ['urgent', 'length'])
+    hdr = Header.view(TEST1)
+    hdr.kind
+    hdr.tag = b'CD'
+    assert(hdr.dirty_fields() == ['tag'])
+    hdr = Header()
+    assert(hdr.dirty_fields() == ['kind', 'urgent', 'length', 'tag'])
+
+def test_from_bytes_reused_buffer():
+    # from_bytes keeps its own copy of the encoding, not the caller's buffer
+    buf = bytearray(b'\x5f' + TEST1[1:] + bytes(100))
+    for hdr in (Header.from_bytes(buf), Header.from_bytes(memoryview(buf), fields=('kind',)), Header.from_bytes_into(Header(), buf)):
+        assert(hdr._buf == b'\x5f' + TEST1[1:])
+    buf[:6] = bytes(6)
+    assert(hdr.dirty_fields() == [])
+    assert(hdr.to_bytes() == b'\x5f' + TEST1[1:])
+    hdr = Header.from_bytes(TEST1)
+    assert(hdr._buf is TEST1)
+
+def test_pack_into():
+    # reserved bits are kept when re-encoding a decoded structure
+    original = b'\x5f' + TEST1[1:]
+    hdr = Header.from_bytes(original)
+    buf = bytearray(10)
+    assert(hdr.pack_into(buf, 2) == 6)
+    assert(buf == b'\x00\x00' + original + b'\x00\x00')
+    hdr.kind = 6
+    hdr.tag = b'CD'
+    assert(hdr.pack_into(buf, 2) == 6)
+    assert(buf == b'\x00\x00\x6f\x01\x02\x03CD\x00\x00')
+    assert(hdr.to_bytes() == b'\x6f\x01\x02\x03CD')
+    with pytest.raises(IndexError):
+        hdr.pack_into(buf, 5)
+
+    hdr = Header()
+    hdr.kind = 1
+    hdr.urgent = True
+    hdr.reserved = None
+    hdr.length = 2
+    hdr.tag = b'EF'
+    hdr.pack_into(buf)
+    assert(buf[:6] == b'\x18\x00\x00\x02EF')
+
+def test_from_bytes_fields():
+    hdr = Header.from_bytes(TEST1, fields=('tag', 'kind'))
+    assert(isinstance(hdr, Header))
+    assert(hdr.__dict__ == {'tag': b'AB', 'kind': 5})
+    # the other fields are still there, decoded when read
+    assert(hdr.length == 0x010203)
+    assert(hdr.urgent)
+    hdr.kind = 6
+    assert(hdr.to_bytes() == b'\x6a' + TEST1[1:])
+    with pytest.raises(IndexError):
+        Header.from_bytes(TEST1[:5], fields=('kind',))
+    with pytest.raises(ValueError):
+        Header.from_bytes(TEST1, fields=('reserved',))
+
+def test_from_bytes_fields_format_label():
+    from net.dcerpc.ndr.Boolean import Boolean
+    label = FormatLabel.from_bytes(b'\x01\x02\x00\x00', fields=('char_repr',))
+    assert(label.char_repr == FormatLabel.CHAR_FORMAT_EBCDIC)
+    assert(label.float_repr == 2)
+    assert(Boolean.from_bytes(b'\x01', fields=('value',)).value is True)
+
+def test_from_bytes_into():
+    hdr = Header.from_bytes(TEST1)
+    assert(Header.from_bytes_into(hdr, b'\x30\x00\x00\x07CD') is hdr)
+    assert(hdr.kind == 3)
+    assert(hdr.length == 7)
+    assert(hdr.tag == b'CD')
+    assert(hdr.dirty_fields() == [])
+    with pytest.raises(IndexError):
+        Header.from_bytes_into(hdr, b'\x30')
+
+def test_pool():
+    hdr = Header.acquire()
+    assert(isinstance(hdr, Header))
+    Header.from_bytes_into(hdr, TEST1)
+    hdr.release()
+    with pytest.raises(RuntimeError):
+        hdr.release()
+    assert(len(Header._POOL) == 1)
+    assert(Header.acquire() is hdr)
+    assert(hdr._buf is None)
+    assert(Header.acquire() is not hdr)
+    hdr.release()
+    assert(FormatLabel._POOL is not Header._POOL)
+
+    view = Header.view(TEST1)
+    assert(view.kind == 5)
+    view.release()
+    assert(view.__dict__ == {})
+    assert(Header._VIEW.acquire() is view)
+
+def test_to_dict():
+    hdr = Header.from_bytes(TEST1)
+    assert(hdr.to_dict() == {'kind': 5, 'urgent': True, 'length': 0x010203, 'tag': b'AB'})
+    assert(hdr.to_tuple() == (5, True, 0x010203, b'AB'))
+    assert(Header.view(TEST1).to_tuple() == hdr.to_tuple())
+    copy = Header()
+    Header._CODEC.set_tuple(copy, hdr.to_tuple())
+    assert(copy.to_tuple() == hdr.to_tuple())
+    assert(FormatLabel.from_bytes(b'\x10\x02\x00\x00').to_dict() == {'int_repr': 1, 'char_repr': 0, 'float_repr': 2})
@@ -0,0 +1,81 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath("."))
+import logging
+logging.basicConfig(level=logging.DEBUG)
+import pytest
+
+from net.udp.Datagram import Datagram
+
+TEST1 = b'\x04\xd2\x00\x35\x00\x0c\x12\x34abcd'
+
+def test_from_bytes():
+    dgram = Datagram.from_bytes(TEST1)
+    assert(dgram.source_port == 1234)
+    assert(dgram.destination_port == 53)
+    assert(dgram.length == 12)
+    assert(dgram.checksum == 0x1234)
+    assert(dgram.data == b'abcd')
+
+def test_to_bytes():
+    dgram = Datagram.from_bytes(TEST1)
+    assert(dgram.to_bytes() == TEST1)
+    dgram.destination_port = 5353
+    assert(dgram.to_bytes() == TEST1[:2] + b'\x14\xe9' + TEST1[4:])
+
+def test_view():
+    buf = bytearray(b'\x00' + TEST1)
+    dgram = Datagram.view(buf, 1)
+    assert(dgram.destination_port == 53)
+    assert(isinstance(dgram.data, memoryview))
+    assert(dgram.data.obj is buf)
+    assert(dgram.data == b'abcd')
+    with pytest.raises(IndexError):
+        Datagram.view(TEST1[:7])
+
+def test_padding():
+    # data ends where the length field says
+    dgram = Datagram.from_bytes(TEST1 + bytes(6))
+    assert(dgram.data == b'abcd')
+    assert(Datagram.view(TEST1 + bytes(6)).data == b'abcd')
+    assert(dgram.to_bytes() == TEST1)
+    # a length of 0 runs to the end, as for IPv6 jumbograms
+    assert(Datagram.from_bytes(TEST1[:4] + b'\x00\x00' + TEST1[6:]).data == b'abcd')
+    with pytest.raises(RuntimeError):
+        Datagram.from_bytes(TEST1[:4] + b'\x00\x07' + TEST1[6:])
+
+def test_truncated():
+    # a datagram cut short by the capture's snaplen keeps what there is
+    dgram = Datagram.from_bytes(TEST1[:4] + b'\x00\xd0' + TEST1[6:])
+    assert(dgram.length == 208)
+    assert(dgram.data == b'abcd')
+    assert(Datagram.view(TEST1[:4] + b'\x00\xd0' + TEST1[6:]).data == b'abcd')
+
+def test_first_fragment():
+    # the length of a fragmented datagram covers every fragment
+    import net.ip
+    from net.ip.v4.Packet import Packet
+    udp = TEST1[:4] + b'\x00\x6c' + TEST1[6:] + bytes(20)
+    header = b'\x45\x00\x00\x30\x00\x01\x20\x00\x40\x11\x00\x00\x0a\x00\x00\x01\x0a\x00\x00\x02'
+    pkt = Packet.from_bytes(header + udp)
+    assert(pkt.flag_more_fragments)
+    assert(pkt.payload.length == 108)
+    assert(pkt.payload.data == b'abcd' + bytes(20))
+    assert(net.ip.view(header + udp).payload.data == b'abcd' + bytes(20))
@@ -0,0 +1,33 @@
+# Copyright 2016 Casey Jaymes
+
+# This file is part of NetPy.
+#
+# NetPy is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# NetPy is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with NetPy.  If not, see <http://www.gnu.org/licenses/>.
+
+# Packets for the tests and benchmarks to decode.
+
+import ipaddress
+import struct
+
+import net.ip
+
+def ipv4(ident=1, protocol=17, source='10.0.0.1', destination='10.0.0.2', data=b'\x00\x35\x00\x35', ttl=64, flags=0, options=b'', checksum=False):
+    # an IPv4 packet carrying data; flags is the whole flags and fragment
+    # offset field, and ihl and total_length follow from options and data
+    ihl = 5 + len(options) // 4
+    header = struct.pack('>BBHHHBBHII', 0x40 | ihl, 0, ihl * 4 + len(data), ident, flags, ttl, protocol, 0,
+        int(ipaddress.IPv4Address(source)), int(ipaddress.IPv4Address(destination))) + options
+    if checksum:
+        header = header[:10] + struct.pack('>H', net.ip.checksum(header)) + header[12:]
+    return header + data